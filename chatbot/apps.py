@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ChatbotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chatbot'
+
+    def ready(self):
+        # Opt-in per process (STYLEMATCH_CLIP_WARMUP=1) for inference workers only
+        if getattr(settings, 'CLIP_WARMUP', False):
+            from .clip_utils import warm_up
+            warm_up()
@@ -0,0 +1,101 @@
+"""Attributes derived once from an item's description and stored on the row.
+
+WardrobeItem and ClothingItem fill these in when they are created (and
+``manage.py backfill_item_attributes`` fills older rows), so outfit
+generation reads indexed fields instead of scanning description text.
+Both apps use it, so it lives here rather than in ``wardrobe``, which
+already depends on ``chatbot``.
+"""
+
+# Colour name -> words in an item description that imply it
+COLOR_KEYWORDS = {
+    'red': ['red', 'crimson', 'scarlet', 'burgundy', 'maroon'],
+    'blue': ['blue', 'navy', 'denim', 'sky blue', 'royal blue', 'light blue'],
+    'green': ['green', 'emerald', 'olive', 'forest', 'mint'],
+    'yellow': ['yellow', 'gold', 'mustard', 'lemon'],
+    'pink': ['pink', 'rose', 'fuchsia', 'hot pink'],
+    'purple': ['purple', 'violet', 'lavender', 'lilac'],
+    'orange': ['orange', 'coral', 'peach'],
+    'brown': ['brown', 'tan', 'beige', 'khaki', 'taupe'],
+    'black': ['black', 'ebony', 'onyx'],
+    'white': ['white', 'ivory', 'cream', 'off-white'],
+    'gray': ['gray', 'grey', 'charcoal', 'silver'],
+    'multicolor': ['floral', 'print', 'pattern', 'striped', 'checkered', 'polka dot']
+}
+UNKNOWN_COLOR = 'unknown'
+
+# Checked in order: the first pattern whose keywords appear wins
+PATTERN_KEYWORDS = {
+    'floral': ['floral', 'flower'],
+    'striped': ['striped', 'stripe'],
+    'checked': ['checked', 'checkered', 'check', 'plaid', 'tartan'],
+    'polka': ['polka dot', 'polka'],
+    'embroidered': ['embroidered', 'embroidery', 'zari', 'sequin'],
+    'printed': ['print', 'pattern', 'graphic', 'ikat', 'bandhani'],
+}
+SOLID_PATTERN = 'solid'
+
+FORMALITY_KEYWORDS = {
+    'festive': ['banarasi', 'kanjeevaram', 'silk saree', 'lehenga', 'anarkali', 'sherwani', 'zari', 'embroidered', 'sequin'],
+    'formal': ['formal', 'blazer', 'suit', 'evening', 'gown', 'trouser', 'oxford', 'heel', 'pump', 'loafer'],
+    # Before 'smart' so a t-shirt is not taken for a shirt
+    'casual': ['t-shirt', 'tshirt', 'tee', 'jean', 'hoodie', 'short', 'jogger', 'sneaker', 'flip flop'],
+    'smart': ['shirt', 'blouse', 'chino', 'midi', 'kurta', 'kurti', 'cardigan', 'boot'],
+}
+CASUAL_FORMALITY = 'casual'
+
+# Footwear style, only derived for the 'shoes' category
+FOOTWEAR_KEYWORDS = {
+    'indian': ['juttis', 'mojaris', 'kolhapuris', 'ethnic'],
+    'heels': ['heel', 'pump', 'stiletto', 'wedge'],
+    'sneakers': ['sneaker', 'sports shoe', 'running', 'trainer'],
+    'boots': ['boot'],
+    'sandals': ['sandal', 'slipper', 'flip flop'],
+    'flats': ['flat', 'ballerina', 'loafer', 'moccasin'],
+    'formal': ['formal', 'oxford', 'derby', 'brogue'],
+}
+OTHER_FOOTWEAR = 'other'
+# Words that make an uncategorised (catalog) item footwear
+FOOTWEAR_WORDS = ['shoe', 'sandal', 'heel', 'sneaker', 'boot', 'pump', 'loafer', 'flat', 'slipper', 'flip flop',
+                  'juttis', 'mojaris', 'kolhapuris']
+
+ATTRIBUTE_FIELDS = ['color', 'pattern', 'formality', 'footwear_style']
+
+
+def extract_color(description):
+    """First colour whose keywords appear in ``description``, else 'unknown'"""
+    description_lower = description.lower()
+    for color, keywords in COLOR_KEYWORDS.items():
+        if any(keyword in description_lower for keyword in keywords):
+            return color
+    return UNKNOWN_COLOR
+
+
+def first_match(description_lower, keywords, default):
+    for value, words in keywords.items():
+        if any(word in description_lower for word in words):
+            return value
+    return default
+
+
+def derive_attributes(description, category=None):
+    """Return ``{'color', 'pattern', 'formality', 'footwear_style'}`` for one item"""
+    description_lower = (description or '').lower()
+    if category:
+        is_footwear = category == 'shoes'
+    else:
+        # Catalog items have no category: look for any footwear word instead
+        is_footwear = any(word in description_lower for word in FOOTWEAR_WORDS)
+    return {
+        'color': extract_color(description_lower),
+        'pattern': first_match(description_lower, PATTERN_KEYWORDS, SOLID_PATTERN),
+        'formality': first_match(description_lower, FORMALITY_KEYWORDS, CASUAL_FORMALITY),
+        'footwear_style': first_match(description_lower, FOOTWEAR_KEYWORDS, OTHER_FOOTWEAR) if is_footwear else '',
+    }
+
+
+def set_attributes(item, category=None):
+    """Fill ``item``'s attribute fields from its description"""
+    for field, value in derive_attributes(item.description, category).items():
+        setattr(item, field, value)
+    return item
@@ -0,0 +1,297 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+
+from .ann import DEFAULT_RERANK, IVFIndex
+from .models import ClothingItem
+
+BUNDLE_FORMAT = 1
+CURRENT_POINTER = 'CURRENT'
+SEARCH_MODES = ('text', 'image', 'fused')
+
+
+def normalize_rows(matrix):
+    """L2-normalise each row of a 2-d float32 matrix (zero rows stay zero)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class CatalogIndex:
+    """Every ClothingItem embedding held as one normalised float32 matrix.
+
+    Row ``i`` of ``embeddings`` belongs to the item ``ids[i]`` whose text is
+    ``descriptions[i]``, so a top-k lookup is one matrix-vector product.
+    When an IVF ``ann`` index is attached, lookups only score the rows in
+    the probed lists instead.
+
+    ``image_embeddings`` optionally holds the CLIP embedding of each item's
+    catalog photo (zero rows where ``has_image`` is False), which enables
+    the ``image`` and ``fused`` search modes.
+
+    ``version`` names the exported bundle (or the database build) so
+    anything cached from search results can tell when the catalog changed.
+    """
+
+    def __init__(self, embeddings, ids, descriptions, ann=None, image_embeddings=None, has_image=None, version=None):
+        self.embeddings = embeddings
+        self.ids = ids
+        self.descriptions = descriptions
+        self.ann = ann
+        self.image_embeddings = image_embeddings
+        self.has_image = has_image
+        self.version = version or 'db-' + datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S%f')
+
+    @classmethod
+    def from_queryset(cls, queryset=None):
+        """Build the index from the database, skipping unreadable embeddings"""
+        if queryset is None:
+            queryset = ClothingItem.objects.all()
+
+        vectors, image_vectors, ids, descriptions = [], [], [], []
+        rows = queryset.values_list('id', 'description', 'embedding', 'image_embedding').iterator()
+        for item_id, description, embedding, image_embedding in rows:
+            if embedding is None or embedding.size == 0:
+                continue
+            vector = embedding.astype(np.float32, copy=False)
+            if vectors and vector.shape != vectors[0].shape:
+                continue
+            vectors.append(vector)
+            if image_embedding is not None and image_embedding.shape == vector.shape:
+                image_vectors.append(image_embedding.astype(np.float32, copy=False))
+            else:
+                image_vectors.append(None)
+            ids.append(item_id)
+            descriptions.append(description)
+
+        image_embeddings = has_image = None
+        if vectors:
+            embeddings = normalize_rows(np.vstack(vectors))
+            has_image = np.array([vector is not None for vector in image_vectors], dtype=bool)
+            if has_image.any():
+                image_embeddings = np.zeros_like(embeddings)
+                image_embeddings[has_image] = normalize_rows(np.vstack([v for v in image_vectors if v is not None]))
+            else:
+                has_image = None
+        else:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+
+        return cls(
+            embeddings,
+            np.asarray(ids, dtype=np.int64),
+            np.asarray(descriptions, dtype=str),
+            image_embeddings=image_embeddings,
+            has_image=has_image,
+        )
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Open an exported bundle; arrays are memory-mapped by default"""
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported catalog bundle format: {manifest.get('format')}")
+
+        ann = None
+        if manifest.get('ann'):
+            ann = IVFIndex.load(os.path.join(path, 'ann'), mmap_mode=mmap_mode)
+
+        image_embeddings = has_image = None
+        if manifest.get('image_embeddings'):
+            image_embeddings = np.load(os.path.join(path, 'image_embeddings.npy'), mmap_mode=mmap_mode)
+            has_image = np.load(os.path.join(path, 'has_image.npy'))
+
+        index = cls(
+            np.load(os.path.join(path, 'embeddings.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, 'ids.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, 'descriptions.npy'), mmap_mode=mmap_mode),
+            ann=ann,
+            image_embeddings=image_embeddings,
+            has_image=has_image,
+            version=manifest.get('version'),
+        )
+        if len(index) != manifest['count']:
+            raise ValueError(f"Catalog bundle {path} is incomplete")
+        return index
+
+    def save(self, path, version):
+        """Write the index as a bundle of plain .npy files plus a manifest"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'embeddings.npy'), np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        np.save(os.path.join(path, 'ids.npy'), np.asarray(self.ids, dtype=np.int64))
+        np.save(os.path.join(path, 'descriptions.npy'), np.asarray(self.descriptions, dtype=str))
+        if self.image_embeddings is not None:
+            np.save(os.path.join(path, 'image_embeddings.npy'),
+                    np.ascontiguousarray(self.image_embeddings, dtype=np.float32))
+            np.save(os.path.join(path, 'has_image.npy'), np.asarray(self.has_image, dtype=bool))
+        if self.ann is not None:
+            self.ann.save(os.path.join(path, 'ann'))
+
+        # Manifest goes last: a bundle without one is never loaded
+        manifest = {
+            'format': BUNDLE_FORMAT,
+            'version': version,
+            'count': len(self),
+            'dim': int(self.embeddings.shape[1]) if len(self) else 0,
+            'ann': self.ann is not None,
+            'image_embeddings': self.image_embeddings is not None,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        }
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    def search(self, query_embedding, k=1, nprobe=None, exact=False, mode=None):
+        """Return the ``k`` closest items as dicts, best first.
+
+        ``mode`` picks what the query is compared with: ``text`` (catalog
+        descriptions), ``image`` (catalog photos) or ``fused`` (a weighted
+        blend, see settings.CATALOG_FUSION_WEIGHT). It defaults to
+        settings.CATALOG_SEARCH_MODE and falls back to ``text`` when the
+        catalog has no image embeddings.
+
+        ``nprobe`` overrides settings.CATALOG_ANN_NPROBE for the ANN path
+        (text mode only); ``exact`` forces a brute-force scan.
+        """
+        if len(self) == 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        if query.shape[0] != self.embeddings.shape[1]:
+            raise ValueError(
+                f"Query has {query.shape[0]} dimensions, catalog has {self.embeddings.shape[1]}"
+            )
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        mode = self.resolve_mode(mode)
+        if mode == 'text' and self.ann is not None and not exact:
+            if nprobe is None:
+                nprobe = getattr(settings, 'CATALOG_ANN_NPROBE', 16)
+            rerank = getattr(settings, 'CATALOG_ANN_RERANK', DEFAULT_RERANK)
+            rows, similarities = self.ann.search(query, self.embeddings, k=k, nprobe=nprobe, rerank=rerank)
+        else:
+            rows, similarities = self.exact_search(query, k, mode)
+
+        return [
+            {
+                'id': int(self.ids[row]),
+                'description': str(self.descriptions[row]),
+                'similarity': float(similarity),
+            }
+            for row, similarity in zip(rows, similarities)
+        ]
+
+    def resolve_mode(self, mode=None):
+        if mode is None:
+            mode = getattr(settings, 'CATALOG_SEARCH_MODE', 'text')
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+        if self.image_embeddings is None:
+            return 'text'
+        return mode
+
+    def scores(self, query, mode='text'):
+        """Similarity of a normalised query to every row under ``mode``"""
+        if mode == 'text':
+            return self.embeddings @ query
+
+        image_scores = self.image_embeddings @ query
+        if mode == 'image':
+            # Items without a photo can never win an image-to-image search
+            return np.where(self.has_image, image_scores, -1.0).astype(np.float32)
+
+        weight = getattr(settings, 'CATALOG_FUSION_WEIGHT', 0.5)
+        text_scores = self.embeddings @ query
+        fused = weight * image_scores + (1 - weight) * text_scores
+        return np.where(self.has_image, fused, text_scores).astype(np.float32)
+
+    def exact_search(self, query, k, mode='text'):
+        """Brute-force ``(rows, similarities)`` for a normalised query"""
+        similarities = self.scores(query, mode)
+
+        k = min(k, len(self))
+        if k < len(self):
+            top = np.argpartition(-similarities, k - 1)[:k]
+        else:
+            top = np.arange(len(self))
+        top = top[np.argsort(-similarities[top])]
+        return top, similarities[top]
+
+
+def get_bundle_dir():
+    return getattr(settings, 'CATALOG_INDEX_DIR', os.path.join(settings.BASE_DIR, 'catalog_index'))
+
+
+def current_bundle_path(bundle_dir=None):
+    """Path of the bundle version named in the CURRENT pointer, if any"""
+    bundle_dir = bundle_dir or get_bundle_dir()
+    try:
+        with open(os.path.join(bundle_dir, CURRENT_POINTER)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(bundle_dir, version)
+    return path if os.path.exists(os.path.join(path, 'manifest.json')) else None
+
+
+def publish_bundle(index, bundle_dir=None):
+    """Save ``index`` as a new bundle version and point CURRENT at it"""
+    bundle_dir = bundle_dir or get_bundle_dir()
+    version = 'v' + datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S%f')
+    path = os.path.join(bundle_dir, version)
+    index.save(path, version)
+
+    # Atomic swap so running workers never see a half-written pointer
+    pointer_tmp = os.path.join(bundle_dir, CURRENT_POINTER + '.tmp')
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(bundle_dir, CURRENT_POINTER))
+    return path
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_catalog_index():
+    """Return the process-wide catalog index, loading it on first use.
+
+    An exported bundle is preferred because it is memory-mapped (one
+    page-cache copy shared by every worker); without one the index is
+    built from the database.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                start_time = time.time()
+                bundle_path = current_bundle_path()
+                index = None
+                if bundle_path:
+                    try:
+                        index = CatalogIndex.load(bundle_path)
+                        print(f"✅ Catalog index mapped from {bundle_path}: {len(index)} items in {time.time() - start_time:.2f}s")
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"⚠️ Could not load catalog bundle {bundle_path}: {e}")
+                if index is None:
+                    index = CatalogIndex.from_queryset()
+                    print(f"✅ Catalog index built: {len(index)} items in {time.time() - start_time:.2f}s")
+                _index = index
+    return _index
+
+
+def invalidate_catalog_index():
+    """Drop the cached index so the next lookup reloads it"""
+    global _index
+    with _index_lock:
+        _index = None
@@ -1,19 +1,112 @@
-import clip
-import torch
+import io
+import threading
+import time
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model, preprocess = clip.load("ViT-B/32", device=device)
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+MODEL_NAME = "ViT-B/32"
+DEFAULT_BATCH_SIZE = 32
+
+# torch and clip are only imported when the model is first needed, so
+# management commands, migrations and tests never pay for them
+_model = None
+_preprocess = None
+_device = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """Return ``(model, preprocess, device)``, loading CLIP on first use"""
+    global _model, _preprocess, _device
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import clip
+                import torch
+                
+                start_time = time.time()
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+                model, preprocess = clip.load(MODEL_NAME, device=device)
+                model.eval()
+                _preprocess, _device = preprocess, device
+                _model = model
+                print(f"✅ CLIP {MODEL_NAME} loaded on {device} in {time.time() - start_time:.2f}s")
+    return _model, _preprocess, _device
+
+def is_model_loaded():
+    return _model is not None
+
+def warm_up():
+    """Load the model and run one forward pass so the first request is not cold"""
+    start_time = time.time()
+    encode_texts(["warm up"])
+    print(f"🔥 CLIP warm-up finished in {time.time() - start_time:.2f}s")
+
+def get_batch_size(batch_size=None):
+    """Micro-batch size for a forward pass (settings.CLIP_BATCH_SIZE by default)"""
+    if batch_size is None:
+        batch_size = getattr(settings, 'CLIP_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    return max(1, int(batch_size))
+
+def load_image(source):
+    """Decode a path, bytes, file-like object (e.g. an UploadedFile) or PIL image.
+
+    The image is fully loaded so the source can be closed or deleted, and
+    file-like sources are rewound so they can still be saved afterwards.
+    """
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    
+    rewind = hasattr(source, 'seek')
+    if rewind:
+        source.seek(0)
+    try:
+        image = Image.open(source)
+        image.load()
+    finally:
+        if rewind:
+            source.seek(0)
+    return image
+
+def encode_texts(texts, batch_size=None):
+    """Encode a list of strings into an (N, D) float32 array in micro-batches"""
+    import clip
+    import torch
+    
+    model, _, device = get_model()
+    batch_size = get_batch_size(batch_size)
+    blocks = []
+    for start in range(0, len(texts), batch_size):
+        text_input = clip.tokenize(list(texts[start:start + batch_size]), truncate=True).to(device)
+        with torch.no_grad():
+            text_features = model.encode_text(text_input)
+        blocks.append(text_features.cpu().numpy().astype(np.float32, copy=False))
+    if not blocks:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(blocks)
+
+def encode_images(images, batch_size=None):
+    """Encode images (anything load_image accepts) into an (N, D) float32 array in micro-batches"""
+    import torch
+    
+    model, preprocess, device = get_model()
+    batch_size = get_batch_size(batch_size)
+    blocks = []
+    for start in range(0, len(images), batch_size):
+        batch = [preprocess(load_image(image)) for image in images[start:start + batch_size]]
+        image_input = torch.stack(batch).to(device)
+        with torch.no_grad():
+            image_features = model.encode_image(image_input)
+        blocks.append(image_features.cpu().numpy().astype(np.float32, copy=False))
+    if not blocks:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(blocks)
 
 def encode_text(text):
-    text_input = clip.tokenize([text]).to(device)
-    with torch.no_grad():
-        text_features = model.encode_text(text_input)
-    return text_features.cpu().numpy()
-
-def encode_image(image_path):
-    from PIL import Image
-    image = Image.open(image_path)
-    image_input = preprocess(image).unsqueeze(0).to(device)
-    with torch.no_grad():
-        image_features = model.encode_image(image_input)
-    return image_features.cpu().numpy()
\ No newline at end of file
+    return encode_texts([text])
+
+def encode_image(image):
+    return encode_images([image])
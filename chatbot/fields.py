@@ -0,0 +1,58 @@
+import base64
+import json
+
+import numpy as np
+from django.db import models
+
+
+class EmbeddingField(models.BinaryField):
+    """Stores a 1-d NumPy vector as raw little-endian bytes.
+
+    Values come back from the database as read-only arrays decoded with
+    ``np.frombuffer``, so reading an embedding costs no parsing at all.
+    Lists, arrays of any shape and legacy JSON strings are accepted on write.
+    """
+
+    description = "NumPy embedding vector"
+
+    def __init__(self, *args, dtype='float32', **kwargs):
+        self.dtype = np.dtype(dtype).newbyteorder('<')
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.dtype != np.dtype('<f4'):
+            kwargs['dtype'] = self.dtype.name
+        return name, path, args, kwargs
+
+    def to_array(self, value):
+        """Coerce any supported representation to a 1-d array of ``dtype``"""
+        if value is None:
+            return None
+        if isinstance(value, np.ndarray):
+            return value.astype(self.dtype, copy=False).ravel()
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return np.frombuffer(value, dtype=self.dtype)
+        if isinstance(value, str):
+            if value.lstrip().startswith('['):
+                return np.asarray(json.loads(value), dtype=self.dtype).ravel()
+            return np.frombuffer(base64.b64decode(value.encode('ascii')), dtype=self.dtype)
+        return np.asarray(value, dtype=self.dtype).ravel()
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_array(value)
+
+    def to_python(self, value):
+        return self.to_array(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = self.to_array(value)
+        if value is not None:
+            value = value.tobytes()
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def value_to_string(self, obj):
+        value = self.value_from_object(obj)
+        if value is None:
+            return None
+        return base64.b64encode(self.to_array(value).tobytes()).decode('ascii')
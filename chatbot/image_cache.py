@@ -0,0 +1,109 @@
+"""Content-addressed cache of what CLIP made of an uploaded photo.
+
+Uploads are keyed by the SHA-256 of their bytes. The CLIP embedding is
+cached per model, and the top ``IMAGE_MATCH_TOP_K`` catalog matches per
+catalog version and search mode, so re-uploading the same photo (to the
+chatbot or the wardrobe) skips CLIP inference, and after a catalog
+export only the cheap search is redone. Entries live in the shared
+Django cache settings.IMAGE_MATCH_CACHE_ALIAS, which bounds their number.
+"""
+import hashlib
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+from .catalog_index import get_catalog_index
+from .clip_utils import MODEL_NAME, encode_images
+
+IMAGE_CACHE_PREFIX = 'image:'
+DEFAULT_TOP_K = 5
+DEFAULT_TTL = 30 * 24 * 60 * 60
+
+
+def get_image_cache():
+    """The shared cache image results live in (settings.IMAGE_MATCH_CACHE_ALIAS)"""
+    alias = getattr(settings, 'IMAGE_MATCH_CACHE_ALIAS', 'default')
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def get_top_k():
+    return getattr(settings, 'IMAGE_MATCH_TOP_K', DEFAULT_TOP_K)
+
+
+def image_digest(source):
+    """SHA-256 hex digest of an upload, file-like object or bytes; file positions are restored"""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+        return digest.hexdigest()
+    if hasattr(source, 'chunks'):
+        # UploadedFile.chunks() seeks to the start itself
+        for chunk in source.chunks():
+            digest.update(chunk)
+        source.seek(0)
+        return digest.hexdigest()
+    position = source.tell()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(1024 * 1024), b''):
+        digest.update(chunk)
+    source.seek(position)
+    return digest.hexdigest()
+
+
+def embedding_key(digest):
+    return f'{IMAGE_CACHE_PREFIX}{MODEL_NAME}:{digest}:embedding'
+
+
+def matches_key(digest, index):
+    return f'{IMAGE_CACHE_PREFIX}{MODEL_NAME}:{digest}:matches:{index.version}:{index.resolve_mode()}:{get_top_k()}'
+
+
+def match_images(images, digests):
+    """``(embedding, matches)`` for each image, computing only what the cache lacks.
+
+    ``images`` are anything ``encode_images`` accepts and ``digests`` their
+    ``image_digest``. ``matches`` is None when the catalog search failed.
+    """
+    cache = get_image_cache()
+    ttl = getattr(settings, 'IMAGE_MATCH_CACHE_TTL', DEFAULT_TTL)
+    try:
+        index = get_catalog_index()
+    except Exception as e:
+        print(f"❌ Catalog index unavailable: {e}")
+        index = None
+    keys = [(embedding_key(digest), matches_key(digest, index) if index is not None else None) for digest in digests]
+    cached = cache.get_many([key for pair in keys for key in pair if key])
+
+    embeddings = [cached.get(key) for key, _ in keys]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        encoded = encode_images([images[i] for i in missing])
+        for i, embedding in zip(missing, encoded):
+            embeddings[i] = embedding
+        cache.set_many({keys[i][0]: np.asarray(embeddings[i], dtype=np.float32) for i in missing}, ttl)
+        print(f"🖼️ CLIP encoded {len(missing)} of {len(digests)} images (the rest were cached)")
+
+    results = []
+    new_matches = {}
+    for (_, key), embedding in zip(keys, embeddings):
+        matches = cached.get(key) if key else None
+        if matches is None and index is not None:
+            try:
+                matches = index.search(embedding, k=get_top_k())
+                new_matches[key] = matches
+            except Exception as e:
+                print(f"❌ Catalog search failed: {e}")
+        results.append((embedding, matches))
+    if new_matches:
+        cache.set_many(new_matches, ttl)
+    return results
+
+
+def match_image(image, digest=None):
+    """``match_images`` for one image"""
+    return match_images([image], [digest or image_digest(image)])[0]
@@ -0,0 +1,83 @@
+"""Worker-side helpers for the catalog ingest.
+
+Kept free of model imports so spawned pool processes can unpickle these
+functions without setting up Django's app registry.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .clip_utils import encode_images, encode_texts, get_batch_size, get_model
+
+# CLIP's input resolution; decoding straight to it keeps the workers' memory flat
+DECODE_SIZE = 224
+
+
+def init_worker(threads):
+    """Pool initializer: pin torch threads and load CLIP once per worker process"""
+    import torch
+    torch.set_num_threads(threads)
+    get_model()
+
+
+def decode_image(path, size=DECODE_SIZE):
+    """Decode and shrink a catalog photo so its short side is ``size``; None if unreadable"""
+    try:
+        with Image.open(path) as image:
+            # JPEG draft mode decodes at a reduced scale, far cheaper than a full decode
+            image.draft('RGB', (size, size))
+            image = image.convert('RGB')
+        scale = size / min(image.size)
+        if scale < 1:
+            image = image.resize(
+                (max(size, round(image.width * scale)), max(size, round(image.height * scale))),
+                Image.BICUBIC,
+            )
+        return image
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def encode_image_paths(paths, batch_size=None, decode_threads=4):
+    """Encode catalog photos; returns one float32 vector (or None if undecodable) per path.
+
+    A thread pool decodes and resizes the next micro-batches while the
+    current one runs through CLIP (PIL releases the GIL while decoding).
+    """
+    batch_size = get_batch_size(batch_size)
+    results = [None] * len(paths)
+    with ThreadPoolExecutor(max(1, decode_threads)) as pool:
+        pending = deque()
+        position = 0
+        batch, batch_positions = [], []
+        while position < len(paths) or pending:
+            # Keep two micro-batches of decodes ahead of the encoder
+            while position < len(paths) and len(pending) < batch_size * 2:
+                pending.append((position, pool.submit(decode_image, paths[position])))
+                position += 1
+
+            index, future = pending.popleft()
+            image = future.result()
+            if image is not None:
+                batch.append(image)
+                batch_positions.append(index)
+
+            if len(batch) == batch_size or (not pending and position == len(paths) and batch):
+                for index, embedding in zip(batch_positions, encode_images(batch, batch_size=batch_size)):
+                    results[index] = embedding
+                batch, batch_positions = [], []
+    return results
+
+
+def encode_block(descriptions, batch_size, image_paths=None, decode_threads=4):
+    """Encode one chunk; returns ``(text_embeddings, image_embeddings)``.
+
+    ``image_embeddings`` is None unless ``image_paths`` is given, in which
+    case it is a per-row list (None where the photo could not be decoded).
+    """
+    text_embeddings = encode_texts(descriptions, batch_size=batch_size)
+    image_embeddings = None
+    if image_paths is not None:
+        image_embeddings = encode_image_paths(image_paths, batch_size, decode_threads)
+    return text_embeddings, image_embeddings
@@ -0,0 +1,220 @@
+"""Client for the Ollama LLM backend.
+
+Every call goes through one pooled keep-alive session per process, with
+separate connect and read timeouts (settings.OLLAMA_*). ``agenerate`` is
+the asyncio variant for async views: it uses an httpx client per call when
+httpx is installed, and otherwise runs the pooled session in a thread.
+``stream``/``astream`` yield the text as Ollama generates it.
+"""
+import asyncio
+import json
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # optional: agenerate and astream fall back to a thread
+    httpx = None
+
+DEFAULT_URL = 'http://localhost:11434'
+DEFAULT_MODEL = 'gemma:2b'
+DEFAULT_CONNECT_TIMEOUT = 3.05
+# Non-streamed generations on CPU can take minutes
+DEFAULT_READ_TIMEOUT = 300
+DEFAULT_POOL_SIZE = 10
+
+
+class LLMError(Exception):
+    """The LLM backend failed or answered with something unexpected"""
+
+
+class LLMConnectionError(LLMError):
+    """The LLM backend could not be reached"""
+
+
+class LLMTimeout(LLMError):
+    """The LLM backend took longer than the configured timeouts"""
+
+
+def generate_url():
+    return getattr(settings, 'OLLAMA_URL', DEFAULT_URL).rstrip('/') + '/api/generate'
+
+
+def get_timeouts():
+    """``(connect, read)`` timeouts in seconds"""
+    return (
+        getattr(settings, 'OLLAMA_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT),
+        getattr(settings, 'OLLAMA_READ_TIMEOUT', DEFAULT_READ_TIMEOUT),
+    )
+
+
+def build_payload(prompt, model=None, options=None, stream=False):
+    return {
+        "model": model or getattr(settings, 'OLLAMA_MODEL', DEFAULT_MODEL),
+        "prompt": prompt,
+        "stream": stream,
+        "options": options or {},
+    }
+
+
+def parse_result(data):
+    try:
+        return data['response']
+    except (KeyError, TypeError):
+        raise LLMError("Unexpected response format from Ollama")
+
+
+def parse_stream_line(line):
+    """``(text, done)`` for one NDJSON line of a streamed generation"""
+    try:
+        chunk = json.loads(line)
+    except ValueError:
+        raise LLMError("Unexpected stream format from Ollama")
+    if not isinstance(chunk, dict):
+        raise LLMError("Unexpected stream format from Ollama")
+    if chunk.get('error'):
+        raise LLMError(chunk['error'])
+    return chunk.get('response', ''), bool(chunk.get('done'))
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """The process-wide keep-alive session, created on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = getattr(settings, 'OLLAMA_POOL_SIZE', DEFAULT_POOL_SIZE)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def generate(prompt, model=None, options=None):
+    """Generate a completion for ``prompt`` and return its text"""
+    try:
+        response = get_session().post(
+            generate_url(), json=build_payload(prompt, model, options), timeout=get_timeouts()
+        )
+        response.raise_for_status()
+        return parse_result(response.json())
+    except requests.exceptions.ConnectionError as e:
+        raise LLMConnectionError(str(e)) from e
+    except requests.exceptions.Timeout as e:
+        raise LLMTimeout(str(e)) from e
+    except (requests.exceptions.RequestException, ValueError) as e:
+        raise LLMError(str(e)) from e
+
+
+def stream(prompt, model=None, options=None):
+    """Yield the completion for ``prompt`` piece by piece as it is generated"""
+    try:
+        with get_session().post(
+            generate_url(), json=build_payload(prompt, model, options, stream=True),
+            timeout=get_timeouts(), stream=True,
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                text, done = parse_stream_line(line)
+                if text:
+                    yield text
+                if done:
+                    return
+    except requests.exceptions.ConnectionError as e:
+        raise LLMConnectionError(str(e)) from e
+    except requests.exceptions.Timeout as e:
+        raise LLMTimeout(str(e)) from e
+    except requests.exceptions.RequestException as e:
+        raise LLMError(str(e)) from e
+
+
+def async_client():
+    """A new httpx client; use it with ``async with`` so its connections are closed.
+
+    httpx clients are tied to the event loop they were created on, and
+    under WSGI every async view runs on a loop of its own, so clients are
+    scoped to one call rather than cached.
+    """
+    connect_timeout, read_timeout = get_timeouts()
+    pool_size = getattr(settings, 'OLLAMA_POOL_SIZE', DEFAULT_POOL_SIZE)
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+    )
+
+
+async def agenerate(prompt, model=None, options=None):
+    """``generate`` for async code: awaits the backend without holding a worker thread"""
+    if httpx is None:
+        return await asyncio.to_thread(generate, prompt, model, options)
+    try:
+        async with async_client() as client:
+            response = await client.post(generate_url(), json=build_payload(prompt, model, options))
+        response.raise_for_status()
+        return parse_result(response.json())
+    except httpx.ConnectError as e:
+        raise LLMConnectionError(str(e)) from e
+    except httpx.TimeoutException as e:
+        raise LLMTimeout(str(e)) from e
+    except (httpx.HTTPError, ValueError) as e:
+        raise LLMError(str(e)) from e
+
+
+def close_after(future, pieces):
+    if not future.cancelled():
+        future.exception()  # nobody awaits it any more; do not log it as unretrieved
+    pieces.close()
+
+
+async def astream(prompt, model=None, options=None):
+    """``stream`` for async code; close it (e.g. with ``contextlib.aclosing``) to stop early"""
+    if httpx is None:
+        pieces = stream(prompt, model, options)
+        finished = object()
+        pending = None
+        try:
+            while True:
+                pending = asyncio.ensure_future(asyncio.to_thread(next, pieces, finished))
+                # Shielded, so cancelling the wait leaves ``pending`` tracking the thread
+                text = await asyncio.shield(pending)
+                if text is finished:
+                    return
+                yield text
+        finally:
+            if pending is None or pending.done():
+                pieces.close()
+            else:
+                # Closing a generator that is running in another thread raises
+                # ValueError; close it once that next() call returns
+                pending.add_done_callback(lambda future: close_after(future, pieces))
+
+    try:
+        async with async_client() as client, client.stream(
+            'POST', generate_url(), json=build_payload(prompt, model, options, stream=True)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                text, done = parse_stream_line(line)
+                if text:
+                    yield text
+                if done:
+                    return
+    except httpx.ConnectError as e:
+        raise LLMConnectionError(str(e)) from e
+    except httpx.TimeoutException as e:
+        raise LLMTimeout(str(e)) from e
+    except httpx.HTTPError as e:
+        raise LLMError(str(e)) from e
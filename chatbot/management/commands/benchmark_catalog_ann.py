@@ -0,0 +1,72 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from chatbot.ann import DEFAULT_RERANK, IVFIndex, recall_at_k
+from chatbot.catalog_index import CatalogIndex, current_bundle_path, normalize_rows
+
+class Command(BaseCommand):
+    help = 'Measures recall@k and latency of the IVF ANN index against exact catalog search'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help='Benchmark N random vectors instead of the exported catalog bundle')
+        parser.add_argument('--dim', type=int, default=512, help='Dimensions of synthetic vectors')
+        parser.add_argument('--queries', type=int, default=200, help='Number of queries to run')
+        parser.add_argument('-k', type=int, default=10, help='Neighbours per query')
+        parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32, 64])
+        parser.add_argument('--lists', type=int, default=None, help='IVF lists when building an index here')
+        parser.add_argument('--pq-subvectors', type=int, default=0, help='PQ sub-vectors when building an index here')
+        parser.add_argument('--rerank', type=int, default=DEFAULT_RERANK,
+                            help='PQ candidates re-ranked exactly, as a multiple of k')
+        parser.add_argument('--noise', type=float, default=0.5,
+                            help='Relative noise added to catalog vectors to form queries')
+        parser.add_argument('--seed', type=int, default=0)
+    
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        
+        if options['synthetic']:
+            # Clustered data is closer to real embeddings than uniform noise
+            centers = rng.standard_normal((max(options['synthetic'] // 500, 1), options['dim']))
+            labels = rng.integers(len(centers), size=options['synthetic'])
+            vectors = normalize_rows(centers[labels] + 0.6 * rng.standard_normal((options['synthetic'], options['dim'])))
+            index = CatalogIndex(vectors, np.arange(len(vectors)), np.array([''] * len(vectors)))
+            self.stdout.write(f"📊 Synthetic catalog: {len(index)} x {options['dim']}")
+        else:
+            bundle_path = current_bundle_path()
+            if bundle_path:
+                index = CatalogIndex.load(bundle_path)
+                self.stdout.write(f"📊 Loaded bundle {bundle_path}: {len(index)} items")
+            else:
+                index = CatalogIndex.from_queryset()
+                self.stdout.write(f"📊 Built catalog from database: {len(index)} items")
+        
+        if len(index) == 0:
+            self.stdout.write(self.style.ERROR("Catalog is empty, nothing to benchmark"))
+            return
+        
+        if index.ann is None or options['lists'] or options['pq_subvectors']:
+            start_time = time.time()
+            index.ann = IVFIndex.build(index.embeddings, n_lists=options['lists'],
+                                       pq_subvectors=options['pq_subvectors'])
+            self.stdout.write(f"🧭 Built IVF index ({index.ann.n_lists} lists) in {time.time() - start_time:.2f}s")
+        
+        # Queries are perturbed catalog vectors so each has a meaningful neighbourhood
+        sample = rng.choice(len(index), size=min(options['queries'], len(index)), replace=False)
+        base = np.asarray(index.embeddings[np.sort(sample)])
+        queries = normalize_rows(base + options['noise'] * rng.standard_normal(base.shape) / np.sqrt(base.shape[1]))
+        k = options['k']
+        
+        start_time = time.time()
+        exact = [index.exact_search(query, k)[0] for query in queries]
+        exact_ms = (time.time() - start_time) * 1000 / len(queries)
+        self.stdout.write(f"\n{'mode':<12}{'recall@' + str(k):>12}{'ms/query':>12}{'speedup':>10}")
+        self.stdout.write(f"{'exact':<12}{1.0:>12.3f}{exact_ms:>12.3f}{1.0:>10.1f}")
+        
+        for nprobe in options['nprobe']:
+            start_time = time.time()
+            approx = [index.ann.search(query, index.embeddings, k=k, nprobe=nprobe, rerank=options['rerank'])[0] for query in queries]
+            ann_ms = (time.time() - start_time) * 1000 / len(queries)
+            recall = np.mean([recall_at_k(e, a) for e, a in zip(exact, approx)])
+            speedup = exact_ms / ann_ms if ann_ms else float('inf')
+            self.stdout.write(f"{'nprobe=' + str(nprobe):<12}{recall:>12.3f}{ann_ms:>12.3f}{speedup:>10.1f}")
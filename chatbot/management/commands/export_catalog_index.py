@@ -0,0 +1,59 @@
+import os
+import shutil
+import time
+from django.core.management.base import BaseCommand
+from chatbot.ann import IVFIndex
+from chatbot.catalog_index import CatalogIndex, get_bundle_dir, publish_bundle, CURRENT_POINTER
+
+class Command(BaseCommand):
+    help = 'Exports ClothingItem embeddings to a versioned memory-mappable catalog bundle'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None,
+                            help='Bundle directory (defaults to settings.CATALOG_INDEX_DIR)')
+        parser.add_argument('--keep', type=int, default=3,
+                            help='Number of bundle versions to keep on disk')
+        parser.add_argument('--ann', action='store_true',
+                            help='Also build an IVF approximate nearest-neighbour index')
+        parser.add_argument('--ann-lists', type=int, default=None,
+                            help='Number of IVF lists (default: 4 * sqrt(items))')
+        parser.add_argument('--ann-pq-subvectors', type=int, default=0,
+                            help='Product-quantization sub-vectors per embedding (0 disables PQ)')
+        parser.add_argument('--ann-iterations', type=int, default=20,
+                            help='k-means iterations used to train the ANN index')
+    
+    def handle(self, *args, **options):
+        bundle_dir = options['output_dir'] or get_bundle_dir()
+        
+        start_time = time.time()
+        index = CatalogIndex.from_queryset()
+        self.stdout.write(f"📊 Read {len(index)} embeddings in {time.time() - start_time:.2f}s")
+        
+        if len(index) == 0:
+            self.stdout.write(self.style.WARNING("No embeddings to export!"))
+            return
+        
+        if options['ann']:
+            start_time = time.time()
+            index.ann = IVFIndex.build(
+                index.embeddings,
+                n_lists=options['ann_lists'],
+                n_iter=options['ann_iterations'],
+                pq_subvectors=options['ann_pq_subvectors'],
+            )
+            pq_note = f", PQ x{options['ann_pq_subvectors']}" if index.ann.uses_pq else ""
+            self.stdout.write(f"🧭 Built IVF index ({index.ann.n_lists} lists{pq_note}) in {time.time() - start_time:.2f}s")
+        
+        path = publish_bundle(index, bundle_dir)
+        self.stdout.write(self.style.SUCCESS(f"✅ Published catalog bundle: {path}"))
+        
+        # Prune old versions; version names sort chronologically
+        versions = sorted(
+            name for name in os.listdir(bundle_dir)
+            if name.startswith('v') and os.path.isdir(os.path.join(bundle_dir, name))
+        )
+        for name in versions[:-max(options['keep'], 1)]:
+            shutil.rmtree(os.path.join(bundle_dir, name), ignore_errors=True)
+            self.stdout.write(f"🗑️ Removed old bundle {name}")
+        
+        self.stdout.write(f"ℹ️ Restart workers (or let them start fresh) to pick up the new {CURRENT_POINTER} bundle")
@@ -1,102 +1,300 @@
+import json
+import multiprocessing
 import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import pandas as pd
-import json
-from django.core.management.base import BaseCommand
+from django.conf import settings
 from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from chatbot.models import ClothingItem
-from chatbot.clip_utils import encode_text
+from chatbot.clip_utils import get_batch_size
+from chatbot.ingest import encode_block, encode_image_paths, init_worker
+from chatbot.thumbnails import make_thumbnails
+from chatbot.attributes import set_attributes
+
+# FILTER OUT NON-CLOTHING ITEMS
+CLOTHING_CATEGORIES = [
+    'Apparel', 'Clothing', 'Topwear', 'Bottomwear', 'Footwear',
+    'Dress', 'Innerwear', 'Socks', 'Loungewear and Nightwear'
+]
+
+# Also exclude specific non-clothing categories
+EXCLUDE_CATEGORIES = [
+    'Watches', 'Perfume', 'Jewellery', 'Accessories', 'Personal Care',
+    'Beauty and Personal Care', 'Home', 'Sports', 'Toys'
+]
+
+def filter_clothing(df):
+    """Keep clothing rows only, using the dataset's category columns"""
+    clothing_df = df[
+        df['masterCategory'].isin(CLOTHING_CATEGORIES) |
+        df['subCategory'].isin(CLOTHING_CATEGORIES) |
+        df['articleType'].str.contains('shirt|dress|pant|jean|top|skirt|jacket|shoe', case=False, na=False)
+    ]
+
+    # Exclude non-clothing items
+    return clothing_df[
+        ~clothing_df['masterCategory'].isin(EXCLUDE_CATEGORIES) &
+        ~clothing_df['subCategory'].isin(EXCLUDE_CATEGORIES) &
+        ~clothing_df['articleType'].str.contains('watch|perfume|jewel', case=False, na=False)
+    ]
 
 class Command(BaseCommand):
     help = 'Loads fashion product images dataset with clothing-only filtering'
-    
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset-dir', default=getattr(settings, 'FASHION_DATASET_DIR', None),
+                            help='Directory holding styles.csv and images/ (defaults to settings.FASHION_DATASET_DIR)')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='CSV rows read, encoded and written per chunk')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Descriptions per CLIP forward pass (defaults to settings.CLIP_BATCH_SIZE)')
+        parser.add_argument('--checkpoint', default=None,
+                            help='Progress file used to resume an interrupted load')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore any existing checkpoint and start from the first row')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes encoding chunks in parallel (each loads its own CLIP model)')
+        parser.add_argument('--threads-per-worker', type=int, default=None,
+                            help='torch threads per worker (defaults to CPU count / workers)')
+        parser.add_argument('--with-images', action='store_true',
+                            help='Also encode each product photo for image and fused catalog search')
+        parser.add_argument('--decode-threads', type=int, default=4,
+                            help='Threads decoding and resizing photos ahead of the encoder')
+        parser.add_argument('--backfill-images', action='store_true',
+                            help='Only encode photos of items already loaded without an image embedding')
+        parser.add_argument('--no-thumbnails', action='store_true',
+                            help='Skip making thumbnails (run `manage.py backfill_thumbnails` later)')
+
     def handle(self, *args, **options):
-        base_dir = 'C:\\Users\\DELL\\Documents\\StyleMatch_data\\fashion_product_images'
+        if options['backfill_images']:
+            self.backfill_images(get_batch_size(options['batch_size']), options['chunk_size'], options['decode_threads'])
+            return
+
+        base_dir = options['dataset_dir']
+        if not base_dir:
+            raise CommandError('Pass --dataset-dir or set FASHION_DATASET_DIR')
+
         csv_path = os.path.join(base_dir, 'styles.csv')
         images_dir = os.path.join(base_dir, 'images')
-        
+
         if not os.path.exists(csv_path):
             self.stdout.write(self.style.ERROR(f'CSV file not found at: {csv_path}'))
             return
-            
+
         if not os.path.exists(images_dir):
             self.stdout.write(self.style.ERROR(f'Images directory not found at: {images_dir}'))
             return
-        
+
+        checkpoint_path = options['checkpoint'] or os.path.join(
+            settings.CATALOG_INDEX_DIR, 'load_fashion_data.checkpoint.json'
+        )
+        checkpoint = self.read_checkpoint(checkpoint_path, csv_path, options['restart'])
+        rows_done = checkpoint['rows_done']
+        if rows_done:
+            self.stdout.write(f"⏩ Resuming after row {rows_done} ({checkpoint['added']} items added so far)")
+
+        # EXCLUDE ITEMS ALREADY IN DATABASE
+        existing_descriptions = set(ClothingItem.objects.values_list('description', flat=True))
+        self.stdout.write(f"📚 {len(existing_descriptions)} items already in database")
+
+        batch_size = get_batch_size(options['batch_size'])
+        image_field = ClothingItem._meta.get_field('image')
+        self.thumbnail_threads = 0 if options['no_thumbnails'] else max(1, options['decode_threads'])
+        success_count = checkpoint['added']
+        rows_written = rows_done
+        start_time = time.time()
+
+        chunks = self.prepare_chunks(csv_path, images_dir, options['chunk_size'], rows_done, existing_descriptions)
         try:
-            df = pd.read_csv(csv_path, on_bad_lines='skip', encoding='utf-8')
-            self.stdout.write(f"✅ Successfully read CSV with {len(df)} rows")
-        except Exception as e:
+            for rows_seen, rows, (embeddings, image_embeddings) in self.encode_chunks(chunks, batch_size, options):
+                added = self.write_chunk(rows, embeddings, image_embeddings, image_field)
+                success_count += added
+                rows_written = rows_seen
+
+                checkpoint.update(rows_done=rows_seen, added=success_count)
+                self.write_checkpoint(checkpoint_path, checkpoint)
+
+                elapsed = time.time() - start_time
+                rate = (rows_written - rows_done) / elapsed if elapsed else 0
+                self.stdout.write(self.style.SUCCESS(
+                    f'[{rows_seen} rows] +{added} items ({success_count} total, {rate:.0f} rows/s)'
+                ))
+        except pd.errors.ParserError as e:
             self.stdout.write(self.style.ERROR(f"Failed to read CSV: {e}"))
             return
-        
-        # FILTER OUT NON-CLOTHING ITEMS
-        clothing_categories = [
-            'Apparel', 'Clothing', 'Topwear', 'Bottomwear', 'Footwear', 
-            'Dress', 'Innerwear', 'Socks', 'Loungewear and Nightwear'
-        ]
-        
-        # Also exclude specific non-clothing categories
-        exclude_categories = [
-            'Watches', 'Perfume', 'Jewellery', 'Accessories', 'Personal Care',
-            'Beauty and Personal Care', 'Home', 'Sports', 'Toys'
-        ]
-        
-        # Filter for clothing only
-        clothing_df = df[
-            df['masterCategory'].isin(clothing_categories) | 
-            df['subCategory'].isin(clothing_categories) |
-            df['articleType'].str.contains('shirt|dress|pant|jean|top|skirt|jacket|shoe', case=False, na=False)
-        ]
-        
-        # Exclude non-clothing items
-        clothing_df = clothing_df[
-            ~clothing_df['masterCategory'].isin(exclude_categories) &
-            ~clothing_df['subCategory'].isin(exclude_categories) &
-            ~clothing_df['articleType'].str.contains('watch|perfume|jewel', case=False, na=False)
-        ]
-        
-        self.stdout.write(f"📊 After filtering: {len(clothing_df)} clothing items found")
-        
-        # EXCLUDE ITEMS ALREADY IN DATABASE
-        existing_descriptions = set(ClothingItem.objects.values_list('description', flat=True))
-        new_items_df = clothing_df[~clothing_df['productDisplayName'].isin(existing_descriptions)]
-        
-        self.stdout.write(f"🆕 New items to add: {len(new_items_df)} (excluding {len(existing_descriptions)} existing items)")
-        
-        if len(new_items_df) == 0:
-            self.stdout.write(self.style.WARNING("No new items to add!"))
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Load complete: {success_count} new clothing items added by this load!'))
+        self.stdout.write("ℹ️ Run `manage.py export_catalog_index` to publish them to the search index")
+
+    def prepare_chunks(self, csv_path, images_dir, chunk_size, rows_done, existing_descriptions):
+        """Yield ``(rows_seen, rows)`` for each CSV chunk past the checkpoint"""
+        rows_seen = 0
+        reader = pd.read_csv(csv_path, on_bad_lines='skip', encoding='utf-8', chunksize=chunk_size)
+        for chunk in reader:
+            chunk_start = rows_seen
+            rows_seen += len(chunk)
+            if rows_seen <= rows_done:
+                continue
+            if chunk_start < rows_done:
+                chunk = chunk.iloc[rows_done - chunk_start:]
+            yield rows_seen, self.select_rows(chunk, images_dir, existing_descriptions)
+
+    def encode_chunks(self, chunks, batch_size, options):
+        """Yield ``(rows_seen, rows, (embeddings, image_embeddings))`` in CSV order.
+
+        With ``--workers`` > 1 chunks are encoded by a process pool, keeping
+        a couple of chunks per worker in flight while the parent writes.
+        """
+        workers = max(1, options['workers'])
+        decode_threads = options['decode_threads']
+
+        def block_args(rows):
+            image_paths = [row[2] for row in rows] if options['with_images'] else None
+            return [row[0] for row in rows], batch_size, image_paths, decode_threads
+
+        if workers == 1:
+            for rows_seen, rows in chunks:
+                yield rows_seen, rows, encode_block(*block_args(rows)) if rows else ([], None)
             return
-        
-        # Process new items
-        success_count = 0
-        for index, row in new_items_df.iterrows():
-            try:
-                description = row['productDisplayName']
-                
-                # Skip if description is too generic or short
-                if len(description) < 10:
-                    continue
-                
-                text_embedding = encode_text(description)
-                
-                item = ClothingItem(
-                    description=description,
-                    embedding=json.dumps(text_embedding.tolist())
-                )
-                
-                image_filename = f"{row['id']}.jpg"
-                image_path = os.path.join(images_dir, image_filename)
-                
-                if os.path.exists(image_path):
+
+        threads = options['threads_per_worker'] or max(1, (os.cpu_count() or 1) // workers)
+        self.stdout.write(f"🧵 Encoding with {workers} workers x {threads} torch threads")
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker, initargs=(threads,)) as pool:
+            pending = deque()
+            for rows_seen, rows in chunks:
+                future = pool.submit(encode_block, *block_args(rows)) if rows else None
+                pending.append((rows_seen, rows, future))
+                if len(pending) >= workers * 2:
+                    rows_seen, rows, future = pending.popleft()
+                    yield rows_seen, rows, future.result() if future else ([], None)
+            while pending:
+                rows_seen, rows, future = pending.popleft()
+                yield rows_seen, rows, future.result() if future else ([], None)
+
+    def select_rows(self, chunk, images_dir, existing_descriptions):
+        """Filter one CSV chunk down to ``(description, image_filename, image_path)`` rows to load"""
+        clothing_df = filter_clothing(chunk)
+
+        rows = []
+        for index, row in clothing_df.iterrows():
+            description = row['productDisplayName']
+
+            # Skip if description is missing, too generic or short, or already loaded
+            if not isinstance(description, str) or len(description) < 10:
+                continue
+            if description in existing_descriptions:
+                continue
+
+            image_filename = f"{row['id']}.jpg"
+            image_path = os.path.join(images_dir, image_filename)
+            if not os.path.exists(image_path):
+                self.stdout.write(self.style.WARNING(f'Image not found: {image_filename}'))
+                continue
+
+            existing_descriptions.add(description)
+            rows.append((description, image_filename, image_path))
+        return rows
+
+    def write_chunk(self, rows, embeddings, image_embeddings, image_field):
+        """Copy images and bulk-insert one encoded chunk; returns rows added"""
+        if image_embeddings is None:
+            image_embeddings = [None] * len(rows)
+
+        items = []
+        copied = []
+        try:
+            for (description, image_filename, image_path), embedding, image_embedding in zip(rows, embeddings, image_embeddings):
+                try:
                     with open(image_path, 'rb') as f:
-                        item.image.save(image_filename, File(f))
-                    item.save()
-                    success_count += 1
-                    self.stdout.write(self.style.SUCCESS(f'[{success_count}] Added: {description}'))
-                else:
-                    self.stdout.write(self.style.WARNING(f'Image not found: {image_filename}'))
-                    
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Error with row {index}: {str(e)}'))
-        
-        self.stdout.write(self.style.SUCCESS(f'✅ Successfully loaded {success_count} new clothing items!'))
\ No newline at end of file
+                        image_name = image_field.storage.save(
+                            image_field.generate_filename(None, image_filename), File(f)
+                        )
+                except OSError as e:
+                    self.stdout.write(self.style.ERROR(f'Error copying {image_filename}: {e}'))
+                    continue
+                copied.append((image_path, image_name))
+                items.append(set_attributes(ClothingItem(
+                    description=description, image=image_name,
+                    embedding=embedding, image_embedding=image_embedding,
+                )))
+
+            if items:
+                with transaction.atomic():
+                    ClothingItem.objects.bulk_create(items, batch_size=500)
+        except BaseException:
+            # The chunk is loaded again on resume, so no row would ever point at these copies
+            for _, image_name in copied:
+                image_field.storage.delete(image_name)
+            raise
+        self.write_thumbnails(copied, image_field.storage)
+        return len(items)
+
+    def write_thumbnails(self, copied, storage):
+        """Make thumbnails for ``(image_path, image_name)`` pairs from the source photos"""
+        if not self.thumbnail_threads or not copied:
+            return
+        # PIL releases the GIL while decoding and encoding, so threads scale here
+        with ThreadPoolExecutor(self.thumbnail_threads) as pool:
+            list(pool.map(lambda pair: make_thumbnails(pair[0], pair[1], storage), copied))
+
+    def backfill_images(self, batch_size, chunk_size, decode_threads):
+        """Encode the stored photo of every item that has no image embedding yet"""
+        pending = ClothingItem.objects.filter(image_embedding__isnull=True).exclude(image='')
+        total = pending.count()
+        self.stdout.write(f"🖼️ {total} items need an image embedding")
+
+        done = 0
+        start_time = time.time()
+        # Walk by id so photos that fail to decode are not retried forever
+        last_id = 0
+        while True:
+            items = list(pending.filter(id__gt=last_id).order_by('id').only('id', 'image')[:chunk_size])
+            if not items:
+                break
+            last_id = items[-1].id
+
+            image_embeddings = encode_image_paths([item.image.path for item in items], batch_size, decode_threads)
+            updated = []
+            for item, image_embedding in zip(items, image_embeddings):
+                if image_embedding is None:
+                    self.stdout.write(self.style.WARNING(f'Could not decode {item.image.name}'))
+                    continue
+                item.image_embedding = image_embedding
+                updated.append(item)
+
+            with transaction.atomic():
+                ClothingItem.objects.bulk_update(updated, ['image_embedding'], batch_size=500)
+            done += len(updated)
+            elapsed = time.time() - start_time
+            self.stdout.write(self.style.SUCCESS(
+                f'[{done}/{total}] image embeddings ({done / elapsed if elapsed else 0:.0f} items/s)'
+            ))
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Backfill complete: {done} image embeddings added!'))
+        self.stdout.write("ℹ️ Run `manage.py export_catalog_index` to publish them to the search index")
+
+    def read_checkpoint(self, checkpoint_path, csv_path, restart):
+        fresh = {'csv': os.path.abspath(csv_path), 'rows_done': 0, 'added': 0}
+        if restart or not os.path.exists(checkpoint_path):
+            return fresh
+        try:
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return fresh
+        if checkpoint.get('csv') != fresh['csv']:
+            self.stdout.write(self.style.WARNING("Checkpoint belongs to a different dataset, starting over"))
+            return fresh
+        return checkpoint
+
+    def write_checkpoint(self, checkpoint_path, checkpoint):
+        os.makedirs(os.path.dirname(checkpoint_path) or '.', exist_ok=True)
+        tmp_path = checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, checkpoint_path)
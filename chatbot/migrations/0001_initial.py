@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClothingItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.TextField()),
+                ('image', models.ImageField(upload_to='clothing_images/')),
+                ('embedding', models.TextField(blank=True, null=True)),
+            ],
+        ),
+    ]
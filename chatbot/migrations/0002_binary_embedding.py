@@ -0,0 +1,64 @@
+import json
+
+import numpy as np
+from django.db import migrations
+
+import chatbot.fields
+
+
+BATCH_SIZE = 500
+
+
+def json_to_binary(apps, schema_editor):
+    ClothingItem = apps.get_model('chatbot', 'ClothingItem')
+    batch = []
+    for item in ClothingItem.objects.exclude(embedding=None).only('id', 'embedding').iterator(chunk_size=BATCH_SIZE):
+        try:
+            vector = np.asarray(json.loads(item.embedding), dtype='<f4').ravel()
+        except (TypeError, ValueError):
+            continue
+        item.embedding_bin = vector
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            ClothingItem.objects.bulk_update(batch, ['embedding_bin'])
+            batch = []
+    if batch:
+        ClothingItem.objects.bulk_update(batch, ['embedding_bin'])
+
+
+def binary_to_json(apps, schema_editor):
+    ClothingItem = apps.get_model('chatbot', 'ClothingItem')
+    batch = []
+    for item in ClothingItem.objects.exclude(embedding_bin=None).only('id', 'embedding_bin').iterator(chunk_size=BATCH_SIZE):
+        item.embedding = json.dumps([item.embedding_bin.tolist()])
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            ClothingItem.objects.bulk_update(batch, ['embedding'])
+            batch = []
+    if batch:
+        ClothingItem.objects.bulk_update(batch, ['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='embedding_bin',
+            field=chatbot.fields.EmbeddingField(blank=True, null=True),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+        migrations.RemoveField(
+            model_name='clothingitem',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='clothingitem',
+            old_name='embedding_bin',
+            new_name='embedding',
+        ),
+    ]
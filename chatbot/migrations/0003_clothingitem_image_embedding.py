@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:34
+
+import chatbot.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0002_binary_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='image_embedding',
+            field=chatbot.fields.EmbeddingField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0003_clothingitem_image_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='color',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='footwear_style',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='formality',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='pattern',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+    ]
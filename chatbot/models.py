@@ -2,11 +2,25 @@ from django.db import models
 
 # Create your models here.
 from django.db import models
+from .attributes import set_attributes
+from .fields import EmbeddingField
 
 class ClothingItem(models.Model):
     description = models.TextField()
     image = models.ImageField(upload_to='clothing_images/')
-    embedding = models.TextField(blank=True, null=True)
+    embedding = EmbeddingField(blank=True, null=True)  # float32 CLIP embedding
+    image_embedding = EmbeddingField(blank=True, null=True)  # float32 CLIP embedding of the image
+
+    # Derived from the description when the item is created (see chatbot.attributes)
+    color = models.CharField(max_length=20, blank=True, default='', db_index=True)
+    pattern = models.CharField(max_length=20, blank=True, default='', db_index=True)
+    formality = models.CharField(max_length=20, blank=True, default='', db_index=True)
+    footwear_style = models.CharField(max_length=20, blank=True, default='', db_index=True)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.color:
+            set_attributes(self)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.description
\ No newline at end of file
@@ -0,0 +1,245 @@
+"""Two-tier cache of LLM recommendations, in front of the Ollama backend.
+
+The exact tier is keyed on ``(context_type, normalised prompt, model,
+temperature)``. The semantic tier answers prompts whose CLIP text
+embedding is within settings.LLM_SEMANTIC_CACHE_THRESHOLD (cosine) of a
+cached one with the same context, model and temperature, so "wedding
+outfit ideas" can reuse the answer to "what to wear to a wedding". Both
+tiers are per process, LRU-bounded, expire after settings.LLM_CACHE_TTL
+seconds and count hits and misses (see ``stats``).
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+DEFAULT_EXACT_SIZE = 1000
+DEFAULT_SEMANTIC_SIZE = 500
+DEFAULT_TTL = 6 * 60 * 60
+DEFAULT_THRESHOLD = 0.93
+# Image prompts embed the identified item, where a near match is a different item
+DEFAULT_SEMANTIC_CONTEXTS = ('text',)
+
+
+def normalize_prompt(prompt):
+    """Lowercase ``prompt`` and reduce it to words separated by single spaces"""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', prompt.lower()).split())
+
+
+class TierStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def as_dict(self, size, max_entries):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'size': size,
+            'max_entries': max_entries,
+        }
+
+
+class ExactCache:
+    """LRU + TTL map from a cache key to a response"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, response), least recently used first
+        self.stats = TierStats()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self.entries[key]
+                self.stats.expirations += 1
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def put(self, key, response):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def summary(self):
+        with self.lock:
+            return self.stats.as_dict(len(self.entries), self.max_entries)
+
+
+class SemanticCache:
+    """LRU + TTL nearest-neighbour cache over unit-length prompt embeddings.
+
+    Embeddings live in one preallocated matrix so a lookup is a single
+    matrix-vector product; ``group`` (context, model, temperature) ids keep
+    answers from leaking between contexts or sampling settings.
+    """
+
+    def __init__(self, max_entries, ttl, threshold):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.embeddings = None
+        self.groups = np.full(max_entries, -1, dtype=np.int64)  # -1 marks a free slot
+        self.expires_at = np.zeros(max_entries)
+        self.responses = [None] * max_entries
+        self.slots = OrderedDict()  # key -> slot, least recently used first
+        self.keys = [None] * max_entries
+        self.group_ids = {}
+        self.stats = TierStats()
+        self.lock = threading.Lock()
+
+    def get(self, group, embedding):
+        now = time.monotonic()
+        with self.lock:
+            group_id = self.group_ids.get(group)
+            if group_id is None or self.embeddings is None:
+                self.stats.misses += 1
+                return None
+            expired = np.flatnonzero((self.groups >= 0) & (self.expires_at <= now))
+            for slot in expired:
+                self.free(slot)
+                self.stats.expirations += 1
+            candidates = np.flatnonzero(self.groups == group_id)
+            if len(candidates):
+                similarities = self.embeddings[candidates] @ embedding
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    slot = int(candidates[best])
+                    self.slots.move_to_end(self.keys[slot])
+                    self.stats.hits += 1
+                    return self.responses[slot]
+            self.stats.misses += 1
+            return None
+
+    def put(self, key, group, embedding, response):
+        if not self.max_entries:
+            return
+        with self.lock:
+            if self.embeddings is None:
+                self.embeddings = np.zeros((self.max_entries, len(embedding)), dtype=np.float32)
+            slot = self.slots.get(key)
+            if slot is None:
+                free = np.flatnonzero(self.groups < 0)
+                if len(free):
+                    slot = int(free[0])
+                else:
+                    _, slot = self.slots.popitem(last=False)
+                    self.stats.evictions += 1
+            self.slots[key] = slot
+            self.slots.move_to_end(key)
+            self.keys[slot] = key
+            self.embeddings[slot] = embedding
+            self.groups[slot] = self.group_ids.setdefault(group, len(self.group_ids))
+            self.expires_at[slot] = time.monotonic() + self.ttl
+            self.responses[slot] = response
+
+    def free(self, slot):
+        del self.slots[self.keys[slot]]
+        self.keys[slot] = None
+        self.responses[slot] = None
+        self.groups[slot] = -1
+
+    def summary(self):
+        with self.lock:
+            return self.stats.as_dict(len(self.slots), self.max_entries)
+
+
+class CacheLookup:
+    """The outcome of one lookup: ``response`` on a hit, else ``store`` the generated answer"""
+
+    def __init__(self, cache, key, group, embedding, response, tier):
+        self.cache = cache
+        self.key = key
+        self.group = group
+        self.embedding = embedding
+        self.response = response
+        self.tier = tier
+
+    def store(self, response):
+        self.cache.put(self.key, self.group, self.embedding, response)
+
+
+class ResponseCache:
+    def __init__(self, exact_size, semantic_size, ttl, threshold, semantic_contexts):
+        self.exact = ExactCache(exact_size, ttl)
+        self.semantic = SemanticCache(semantic_size, ttl, threshold)
+        self.semantic_contexts = set(semantic_contexts)
+
+    def lookup(self, prompt, context_type, model, temperature, encode=None):
+        """Check both tiers; ``encode(text)`` returns the CLIP embedding used by the semantic tier"""
+        group = (context_type, model, temperature)
+        key = (context_type, normalize_prompt(prompt), model, temperature)
+        response = self.exact.get(key)
+        if response is not None:
+            return CacheLookup(self, key, group, None, response, 'exact')
+
+        embedding = None
+        if encode is not None and context_type in self.semantic_contexts:
+            try:
+                embedding = np.asarray(encode(prompt), dtype=np.float32).reshape(-1)
+            except Exception as e:
+                print(f"⚠️ Semantic cache skipped, could not encode the prompt: {e}")
+                return CacheLookup(self, key, group, None, None, None)
+            embedding /= max(np.linalg.norm(embedding), 1e-12)
+            response = self.semantic.get(group, embedding)
+            if response is not None:
+                # Promote, so the same wording is an exact hit next time
+                self.exact.put(key, response)
+                return CacheLookup(self, key, group, embedding, response, 'semantic')
+        return CacheLookup(self, key, group, embedding, None, None)
+
+    def put(self, key, group, embedding, response):
+        self.exact.put(key, response)
+        if embedding is not None:
+            self.semantic.put(key, group, embedding, response)
+
+    def stats(self):
+        return {'exact': self.exact.summary(), 'semantic': self.semantic.summary()}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """The process-wide response cache, sized from settings on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    getattr(settings, 'LLM_CACHE_SIZE', DEFAULT_EXACT_SIZE),
+                    getattr(settings, 'LLM_SEMANTIC_CACHE_SIZE', DEFAULT_SEMANTIC_SIZE),
+                    getattr(settings, 'LLM_CACHE_TTL', DEFAULT_TTL),
+                    getattr(settings, 'LLM_SEMANTIC_CACHE_THRESHOLD', DEFAULT_THRESHOLD),
+                    getattr(settings, 'LLM_SEMANTIC_CACHE_CONTEXTS', DEFAULT_SEMANTIC_CONTEXTS),
+                )
+    return _cache
+
+
+def reset_response_cache():
+    """Drop every cached response and counter (the next use re-reads settings)"""
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -1,3 +1,768 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.core.cache import caches
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from . import catalog_index
+from .ann import IVFIndex, recall_at_k
+from .attributes import derive_attributes, set_attributes
+from .catalog_index import CURRENT_POINTER, CatalogIndex, get_catalog_index, normalize_rows, publish_bundle
+from .fields import EmbeddingField
+from .image_cache import image_digest, match_image
+from .llm import LLMConnectionError, LLMTimeout, agenerate, astream, generate, stream
+from .models import ClothingItem
+from .response_cache import ResponseCache, normalize_prompt, reset_response_cache
+from .thumbnails import delete_thumbnails, make_thumbnails, render_thumbnails, thumbnail_name, thumbnail_srcsets
+
+
+@override_settings(THUMBNAIL_SIZES=[96, 240])
+class ThumbnailTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = FileSystemStorage(location=directory.name, base_url='/media/')
+
+    def test_thumbnails_are_written_for_every_size_and_format(self):
+        image = Image.new('RGB', (800, 600), 'navy')
+        self.assertEqual(make_thumbnails(image, 'wardrobe/shirt.jpg', self.storage), [[96, 96], [240, 240]])
+
+        for size in (96, 240):
+            for fmt in ('webp', 'jpeg'):
+                with self.storage.open(thumbnail_name('wardrobe/shirt.jpg', size, fmt)) as f:
+                    self.assertEqual(max(Image.open(f).size), size)
+        self.assertEqual(image.size, (800, 600))
+
+    def test_srcsets_use_real_widths(self):
+        # Portrait: the longest side is the height, so a 240 thumbnail is 180 wide
+        thumbnails = make_thumbnails(Image.new('RGB', (600, 800), 'navy'), 'wardrobe/dress.jpg', self.storage)
+        self.assertEqual(thumbnails, [[96, 72], [240, 180]])
+        srcsets = thumbnail_srcsets('wardrobe/dress.jpg', self.storage, thumbnails)
+        self.assertEqual(srcsets['webp'], '/media/thumbnails/wardrobe/dress_96.webp 72w, /media/thumbnails/wardrobe/dress_240.webp 180w')
+
+        # A photo smaller than a size is not upscaled, so only one file per width is listed
+        thumbnails = make_thumbnails(Image.new('RGB', (120, 60), 'navy'), 'wardrobe/belt.jpg', self.storage)
+        self.assertEqual(thumbnails, [[96, 96], [240, 120]])
+        small = make_thumbnails(Image.new('RGB', (80, 60), 'navy'), 'wardrobe/pin.jpg', self.storage)
+        self.assertEqual(thumbnail_srcsets('wardrobe/pin.jpg', self.storage, small)['jpeg'], '/media/thumbnails/wardrobe/pin_96.jpg 80w')
+
+    def test_no_srcsets_without_thumbnails(self):
+        self.assertIsNone(thumbnail_srcsets('wardrobe/shirt.jpg', self.storage, []))
+        self.assertIsNone(thumbnail_srcsets('', self.storage, [[96, 96]]))
+
+    def test_existing_thumbnails_are_kept_and_measured(self):
+        make_thumbnails(Image.new('RGB', (600, 800), 'navy'), 'wardrobe/dress.jpg', self.storage)
+        self.storage.delete(thumbnail_name('wardrobe/dress.jpg', 240, 'webp'))
+
+        with mock.patch('chatbot.thumbnails.render_thumbnails', wraps=render_thumbnails) as render:
+            thumbnails = make_thumbnails(Image.new('RGB', (600, 800), 'navy'), 'wardrobe/dress.jpg', self.storage)
+        self.assertEqual(render.call_args.args[1], [240])
+        self.assertEqual(thumbnails, [[96, 72], [240, 180]])
+        self.assertTrue(self.storage.exists(thumbnail_name('wardrobe/dress.jpg', 240, 'webp')))
+
+    def test_delete_thumbnails(self):
+        thumbnails = make_thumbnails(Image.new('RGB', (800, 600), 'navy'), 'wardrobe/shirt.jpg', self.storage)
+        with override_settings(THUMBNAIL_SIZES=[96]):
+            delete_thumbnails('wardrobe/shirt.jpg', self.storage, thumbnails)
+        for size in (96, 240):
+            for fmt in ('webp', 'jpeg'):
+                self.assertFalse(self.storage.exists(thumbnail_name('wardrobe/shirt.jpg', size, fmt)))
+
+    def test_unreadable_photo(self):
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as f:
+            f.write(b'not an image')
+            f.flush()
+            self.assertIsNone(make_thumbnails(f.name, 'clothing_images/broken.jpg', self.storage))
+
+
+def encode_words(text):
+    """Stand-in for CLIP: a bag-of-words vector, so shared words mean similar prompts"""
+    vector = np.zeros(64, dtype=np.float32)
+    for word in normalize_prompt(text).split():
+        vector[zlib.crc32(word.encode()) % 64] += 1
+    return vector[None, :]
+
+
+class DeriveAttributesTest(SimpleTestCase):
+    def test_first_matching_keywords_win(self):
+        self.assertEqual(derive_attributes('Navy striped cotton shirt', 'top'), {
+            'color': 'blue', 'pattern': 'striped', 'formality': 'smart', 'footwear_style': '',
+        })
+        # 't-shirt' is casual even though it contains 'shirt'
+        self.assertEqual(derive_attributes('White graphic T-shirt', 'top')['formality'], 'casual')
+        self.assertEqual(derive_attributes('Maroon banarasi silk saree with zari border', 'saree'), {
+            'color': 'red', 'pattern': 'embroidered', 'formality': 'festive', 'footwear_style': '',
+        })
+
+    def test_defaults(self):
+        self.assertEqual(derive_attributes('Linen trousers', 'bottom'), {
+            'color': 'unknown', 'pattern': 'solid', 'formality': 'formal', 'footwear_style': '',
+        })
+        self.assertEqual(derive_attributes(None), {
+            'color': 'unknown', 'pattern': 'solid', 'formality': 'casual', 'footwear_style': '',
+        })
+
+    def test_footwear_style_only_for_shoes(self):
+        self.assertEqual(derive_attributes('Tan leather kolhapuris', 'shoes')['footwear_style'], 'indian')
+        self.assertEqual(derive_attributes('Black stiletto pumps', 'shoes')['footwear_style'], 'heels')
+        self.assertEqual(derive_attributes('Grey canvas shoes', 'shoes')['footwear_style'], 'other')
+        self.assertEqual(derive_attributes('Black ankle boot socks', 'accessories')['footwear_style'], '')
+
+    def test_uncategorised_items_look_for_footwear_words(self):
+        self.assertEqual(derive_attributes('White running sneakers')['footwear_style'], 'sneakers')
+        self.assertEqual(derive_attributes('White linen kurta')['footwear_style'], '')
+
+    def test_set_attributes(self):
+        item = set_attributes(ClothingItem(description='Green floral midi dress'))
+        self.assertEqual((item.color, item.pattern, item.formality, item.footwear_style), ('green', 'floral', 'smart', ''))
+
+
+class EmbeddingFieldTest(TestCase):
+    vector = [0.25, -1.5, 3.0]
+
+    def setUp(self):
+        self.field = EmbeddingField(null=True)
+
+    def assert_vector(self, value):
+        self.assertIsInstance(value, np.ndarray)
+        self.assertEqual(value.dtype, np.dtype('<f4'))
+        np.testing.assert_array_equal(value, np.array(self.vector, dtype='<f4'))
+
+    def test_to_python_accepts_every_representation(self):
+        raw = np.array(self.vector, dtype='<f4').tobytes()
+        for value in (
+            self.vector,
+            np.array([self.vector], dtype=np.float64),
+            raw,
+            memoryview(raw),
+            json.dumps(self.vector),
+            json.dumps([self.vector]),  # legacy TextField rows, written as a 1×d list
+        ):
+            self.assert_vector(self.field.to_python(value))
+
+    def test_none_stays_none(self):
+        self.assertIsNone(self.field.to_python(None))
+        self.assertIsNone(self.field.get_db_prep_value(None, connection))
+
+    def test_db_prep_value_is_little_endian_float32(self):
+        prepared = self.field.get_db_prep_value(json.dumps([self.vector]), connection)
+        self.assertEqual(bytes(prepared), np.array(self.vector, dtype='<f4').tobytes())
+        self.assert_vector(self.field.to_python(prepared))
+
+    def test_value_to_string_round_trips(self):
+        item = ClothingItem(description='red kurta', embedding=self.vector)
+        serialized = self.field_of(item).value_to_string(item)
+        self.assertIsInstance(serialized, str)
+        self.assert_vector(self.field.to_python(serialized))
+        self.assertIsNone(self.field_of(item).value_to_string(ClothingItem(description='red kurta')))
+
+    def test_database_round_trip(self):
+        item = ClothingItem.objects.create(description='red kurta', image='x.jpg', embedding=json.dumps([self.vector]))
+        blank = ClothingItem.objects.create(description='blue jeans', image='y.jpg')
+        self.assert_vector(ClothingItem.objects.get(id=item.id).embedding)
+        self.assertIsNone(ClothingItem.objects.get(id=blank.id).embedding)
+        self.assertEqual(list(ClothingItem.objects.filter(embedding__isnull=True).values_list('id', flat=True)), [blank.id])
+
+    @staticmethod
+    def field_of(item):
+        return item._meta.get_field('embedding')
+
+
+def synthetic_catalog(n=4000, dim=128, seed=0):
+    """Clustered unit vectors plus 100 perturbed copies as queries, like benchmark_catalog_ann"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n // 500, 1), dim))
+    vectors = normalize_rows(centers[rng.integers(len(centers), size=n)] + 0.6 * rng.standard_normal((n, dim)))
+    base = vectors[rng.choice(n, 100, replace=False)]
+    queries = normalize_rows(base + 0.5 * rng.standard_normal(base.shape) / np.sqrt(dim))
+    return vectors, queries
+
+
+class ANNIndexTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.vectors, cls.queries = synthetic_catalog()
+        cls.exact = [np.argsort(-(cls.vectors @ query))[:10] for query in cls.queries]
+        cls.ivf = IVFIndex.build(cls.vectors, n_lists=16, n_iter=10)
+        cls.pq = IVFIndex.build(cls.vectors, n_lists=16, n_iter=10, pq_subvectors=8)
+
+    def recall(self, ann, **kwargs):
+        return np.mean([
+            recall_at_k(exact, ann.search(query, self.vectors, k=10, **kwargs)[0])
+            for exact, query in zip(self.exact, self.queries)
+        ])
+
+    def test_recall_against_exact_search(self):
+        self.assertEqual(self.recall(self.ivf, nprobe=self.ivf.n_lists), 1.0)
+        self.assertGreaterEqual(self.recall(self.ivf, nprobe=4), 0.95)
+
+    def test_pq_recall_floor(self):
+        # With the default re-rank depth PQ keeps up with plain IVF; a
+        # shallow pool caps recall however many lists are probed
+        self.assertGreaterEqual(self.recall(self.pq, nprobe=4), 0.95)
+        self.assertLess(self.recall(self.pq, nprobe=self.pq.n_lists, rerank=4), 0.9)
+
+    def test_save_load_round_trip(self):
+        for ann in (self.ivf, self.pq):
+            with self.subTest(pq=ann.uses_pq), tempfile.TemporaryDirectory() as directory:
+                ann.save(directory)
+                loaded = IVFIndex.load(directory)
+                self.assertEqual(loaded.uses_pq, ann.uses_pq)
+                self.assertIsInstance(loaded.rows, np.memmap)
+                np.testing.assert_array_equal(loaded.centroids, ann.centroids)
+                np.testing.assert_array_equal(loaded.offsets, ann.offsets)
+                np.testing.assert_array_equal(loaded.rows, ann.rows)
+                if ann.uses_pq:
+                    np.testing.assert_array_equal(loaded.codebooks, ann.codebooks)
+                    np.testing.assert_array_equal(loaded.codes, ann.codes)
+                for query in self.queries[:10]:
+                    expected_rows, expected_scores = ann.search(query, self.vectors, k=10)
+                    rows, scores = loaded.search(query, self.vectors, k=10)
+                    np.testing.assert_array_equal(rows, expected_rows)
+                    np.testing.assert_array_equal(scores, expected_scores)
+
+
+class CatalogBundleTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.bundle_dir = directory.name
+        settings_override = override_settings(CATALOG_INDEX_DIR=self.bundle_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        catalog_index.invalidate_catalog_index()
+        self.addCleanup(catalog_index.invalidate_catalog_index)
+
+        vectors, self.queries = synthetic_catalog(n=600, dim=16)
+        self.index = CatalogIndex(vectors, np.arange(1, 601, dtype=np.int64),
+                                  np.array([f'item {i}' for i in range(1, 601)]))
+        self.index.ann = IVFIndex.build(vectors, n_lists=8, pq_subvectors=4)
+
+    def read_pointer(self):
+        with open(os.path.join(self.bundle_dir, CURRENT_POINTER)) as f:
+            return f.read()
+
+    def test_publish_swaps_current_pointer(self):
+        first = publish_bundle(self.index)
+        self.assertEqual(os.path.join(self.bundle_dir, self.read_pointer()), first)
+        self.assertEqual(catalog_index.current_bundle_path(), first)
+
+        second = publish_bundle(self.index)
+        self.assertNotEqual(second, first)
+        self.assertEqual(os.path.join(self.bundle_dir, self.read_pointer()), second)
+        self.assertEqual(sorted(os.listdir(self.bundle_dir)),
+                         sorted([CURRENT_POINTER, os.path.basename(first), os.path.basename(second)]))
+
+    def test_pointer_to_a_bundle_without_manifest_is_ignored(self):
+        path = publish_bundle(self.index)
+        os.remove(os.path.join(path, 'manifest.json'))
+        self.assertIsNone(catalog_index.current_bundle_path())
+
+    def test_load_memory_maps_the_bundle(self):
+        path = publish_bundle(self.index)
+        loaded = CatalogIndex.load(path)
+
+        self.assertEqual(loaded.version, self.read_pointer())
+        self.assertIsInstance(loaded.embeddings, np.memmap)
+        self.assertIsInstance(loaded.ann.codes, np.memmap)
+        self.assertIsNone(loaded.image_embeddings)
+        np.testing.assert_array_equal(loaded.ids, self.index.ids)
+        for query in self.queries[:10]:
+            self.assertEqual(loaded.search(query, k=5), self.index.search(query, k=5))
+            self.assertEqual(loaded.search(query, k=5, exact=True), self.index.search(query, k=5, exact=True))
+
+    def test_incomplete_bundle_is_rejected(self):
+        path = publish_bundle(self.index)
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        manifest['count'] += 1
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+        with self.assertRaises(ValueError):
+            CatalogIndex.load(path)
+
+    def test_get_catalog_index_prefers_the_current_bundle(self):
+        publish_bundle(self.index)
+        index = get_catalog_index()
+        self.assertEqual(index.version, self.read_pointer())
+        self.assertEqual(len(index), len(self.index))
+        self.assertIs(get_catalog_index(), index)
+
+    def test_get_catalog_index_falls_back_to_the_database(self):
+        items = [
+            ClothingItem.objects.create(description=f'Catalog linen shirt {i}', image='x.jpg', embedding=vector)
+            for i, vector in enumerate(np.eye(3, dtype=np.float32))
+        ]
+        ClothingItem.objects.create(description='Catalog item without embedding', image='y.jpg')
+
+        self.assertEqual(len(get_catalog_index()), 3)
+        self.assertTrue(get_catalog_index().version.startswith('db-'))
+
+        # A bundle that cannot be read is skipped, not served
+        catalog_index.invalidate_catalog_index()
+        path = publish_bundle(self.index)
+        os.remove(os.path.join(path, 'embeddings.npy'))
+        index = get_catalog_index()
+        self.assertTrue(index.version.startswith('db-'))
+        self.assertEqual(index.search([0, 1, 0], k=1)[0]['id'], items[1].id)
+
+
+class LoadFashionDataTest(TestCase):
+    """load_fashion_data on a small dataset, with CLIP replaced by a stub encoder"""
+
+    ROWS = 10
+    CHUNK_SIZE = 4
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dataset_dir = os.path.join(directory.name, 'dataset')
+        self.media_root = os.path.join(directory.name, 'media')
+        self.checkpoint = os.path.join(directory.name, 'load.checkpoint.json')
+        os.makedirs(os.path.join(self.dataset_dir, 'images'))
+        lines = ['id,masterCategory,subCategory,articleType,productDisplayName']
+        for i in range(self.ROWS):
+            lines.append(f'{100 + i},Apparel,Topwear,Tshirts,Catalog cotton t-shirt number {i}')
+            Image.new('RGB', (8, 8), (i * 20, 0, 0)).save(os.path.join(self.dataset_dir, 'images', f'{100 + i}.jpg'))
+        with open(os.path.join(self.dataset_dir, 'styles.csv'), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.encoded = []
+        patcher = mock.patch('chatbot.management.commands.load_fashion_data.encode_block', side_effect=self.encode_block)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def encode_block(self, descriptions, batch_size, image_paths=None, decode_threads=1):
+        self.encoded.append(list(descriptions))
+        return np.ones((len(descriptions), 4), dtype=np.float32), None
+
+    def load(self):
+        call_command(
+            'load_fashion_data', dataset_dir=self.dataset_dir, chunk_size=self.CHUNK_SIZE,
+            checkpoint=self.checkpoint, no_thumbnails=True, stdout=io.StringIO(),
+        )
+
+    def read_checkpoint(self):
+        with open(self.checkpoint) as f:
+            return json.load(f)
+
+    def stored_images(self):
+        directory = os.path.join(self.media_root, 'clothing_images')
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def assert_loaded_once(self):
+        descriptions = list(ClothingItem.objects.values_list('description', flat=True))
+        self.assertEqual(sorted(descriptions), sorted(f'Catalog cotton t-shirt number {i}' for i in range(self.ROWS)))
+        self.assertEqual(len(self.stored_images()), self.ROWS)
+        self.assertEqual(
+            sorted(ClothingItem.objects.values_list('image', flat=True)),
+            [f'clothing_images/{name}' for name in self.stored_images()],
+        )
+
+    def test_load(self):
+        self.load()
+        self.assert_loaded_once()
+        self.assertEqual([len(block) for block in self.encoded], [4, 4, 2])
+        item = ClothingItem.objects.get(description='Catalog cotton t-shirt number 0')
+        np.testing.assert_array_equal(item.embedding, np.ones(4, dtype=np.float32))
+        self.assertEqual((item.formality, item.color), ('casual', 'unknown'))
+        self.assertEqual(self.read_checkpoint(), {
+            'csv': os.path.abspath(os.path.join(self.dataset_dir, 'styles.csv')), 'rows_done': self.ROWS, 'added': self.ROWS,
+        })
+
+    def test_resume_after_interrupt(self):
+        calls = []
+
+        def interrupt_second_chunk(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return self.encode_block(*args, **kwargs)
+
+        with mock.patch('chatbot.management.commands.load_fashion_data.encode_block', side_effect=interrupt_second_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                self.load()
+        self.assertEqual(ClothingItem.objects.count(), self.CHUNK_SIZE)
+        self.assertEqual(self.read_checkpoint()['rows_done'], self.CHUNK_SIZE)
+        self.assertEqual(self.read_checkpoint()['added'], self.CHUNK_SIZE)
+
+        self.encoded.clear()
+        self.load()
+        self.assert_loaded_once()
+        # Only the rows past the checkpoint were encoded again
+        self.assertEqual(sum(len(block) for block in self.encoded), self.ROWS - self.CHUNK_SIZE)
+        self.assertEqual(self.read_checkpoint()['rows_done'], self.ROWS)
+        self.assertEqual(self.read_checkpoint()['added'], self.ROWS)
+
+    def test_rows_inserted_before_a_lost_checkpoint_are_not_loaded_twice(self):
+        with mock.patch(
+            'chatbot.management.commands.load_fashion_data.Command.write_checkpoint', side_effect=KeyboardInterrupt
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                self.load()
+        self.assertEqual(ClothingItem.objects.count(), self.CHUNK_SIZE)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+        self.load()
+        self.assert_loaded_once()
+
+    def test_failed_insert_removes_copied_images(self):
+        with mock.patch.object(ClothingItem.objects, 'bulk_create', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.load()
+        self.assertEqual(ClothingItem.objects.count(), 0)
+        self.assertEqual(self.stored_images(), [])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+        self.load()
+        self.assert_loaded_once()
+
+
+class BinaryEmbeddingMigrationTest(TransactionTestCase):
+    """0002_binary_embedding in both apps, forwards and backwards"""
+
+    before = [('chatbot', '0001_initial'), ('wardrobe', '0001_initial')]
+    after = [('chatbot', '0002_binary_embedding'), ('wardrobe', '0002_binary_embedding')]
+    vector = [[0.25, -1.5, 3.0]]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        executor.loader.build_graph()
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_forward_and_reverse(self):
+        apps = self.migrate(self.before)
+        ClothingItem = apps.get_model('chatbot', 'ClothingItem')
+        legacy = ClothingItem.objects.create(description='red kurta', image='x.jpg', embedding=json.dumps(self.vector))
+        broken = ClothingItem.objects.create(description='blue jeans', image='y.jpg', embedding='not json')
+        missing = ClothingItem.objects.create(description='white shirt', image='z.jpg', embedding=None)
+        user = apps.get_model('auth', 'User').objects.create(username='tester')
+        WardrobeItem = apps.get_model('wardrobe', 'WardrobeItem')
+        owned = WardrobeItem.objects.create(
+            user=user, image='w.jpg', description='red kurta', category='top', embedding=json.dumps(self.vector)
+        )
+        garbled = WardrobeItem.objects.create(
+            user=user, image='v.jpg', description='blue jeans', category='bottom', embedding='garbage'
+        )
+
+        apps = self.migrate(self.after)
+        ClothingItem = apps.get_model('chatbot', 'ClothingItem')
+        WardrobeItem = apps.get_model('wardrobe', 'WardrobeItem')
+        expected = np.array(self.vector[0], dtype='<f4')
+        np.testing.assert_array_equal(ClothingItem.objects.get(id=legacy.id).embedding, expected)
+        # Catalog rows that cannot be decoded are left without an embedding
+        self.assertIsNone(ClothingItem.objects.get(id=broken.id).embedding)
+        self.assertIsNone(ClothingItem.objects.get(id=missing.id).embedding)
+        np.testing.assert_array_equal(WardrobeItem.objects.get(id=owned.id).embedding, expected)
+        # Wardrobe embeddings are required, so an undecodable one becomes empty
+        self.assertEqual(WardrobeItem.objects.get(id=garbled.id).embedding.size, 0)
+
+        apps = self.migrate(self.before)
+        ClothingItem = apps.get_model('chatbot', 'ClothingItem')
+        WardrobeItem = apps.get_model('wardrobe', 'WardrobeItem')
+        self.assertEqual(json.loads(ClothingItem.objects.get(id=legacy.id).embedding), self.vector)
+        self.assertIsNone(ClothingItem.objects.get(id=missing.id).embedding)
+        self.assertEqual(json.loads(WardrobeItem.objects.get(id=owned.id).embedding), self.vector)
+
+
+class ResponseCacheTest(SimpleTestCase):
+    def make_cache(self, **kwargs):
+        options = dict(exact_size=10, semantic_size=10, ttl=60, threshold=0.8, semantic_contexts=['text'])
+        options.update(kwargs)
+        return ResponseCache(**options)
+
+    def test_exact_tier_normalises_prompts(self):
+        cache = self.make_cache()
+        lookup = cache.lookup('What to wear to a wedding?', 'text', 'gemma:2b', 0.7)
+        self.assertIsNone(lookup.response)
+        lookup.store('A silk saree.')
+
+        self.assertEqual(cache.lookup('what to wear to a  WEDDING', 'text', 'gemma:2b', 0.7).response, 'A silk saree.')
+        self.assertIsNone(cache.lookup('what to wear to a wedding', 'text', 'gemma:2b', 0.9).response)
+        self.assertIsNone(cache.lookup('what to wear to a wedding', 'image_only', 'gemma:2b', 0.7).response)
+        self.assertEqual(cache.stats()['exact']['hits'], 1)
+        self.assertEqual(cache.stats()['exact']['hit_rate'], 0.25)
+
+    def test_semantic_tier(self):
+        cache = self.make_cache()
+        cache.lookup('outfit ideas for a beach wedding', 'text', 'gemma:2b', 0.7, encode=encode_words).store('Linen.')
+
+        lookup = cache.lookup('ideas for a beach wedding outfit', 'text', 'gemma:2b', 0.7, encode=encode_words)
+        self.assertEqual((lookup.response, lookup.tier), ('Linen.', 'semantic'))
+        self.assertIsNone(cache.lookup('office party shoes', 'text', 'gemma:2b', 0.7, encode=encode_words).response)
+        # Only text prompts are matched semantically
+        cache.lookup('red kurta', 'image_only', 'gemma:2b', 0.7, encode=encode_words).store('Gold juttis.')
+        self.assertIsNone(cache.lookup('red cotton kurta', 'image_only', 'gemma:2b', 0.7, encode=encode_words).response)
+        self.assertEqual(cache.stats()['semantic']['hits'], 1)
+
+    def test_lru_eviction_and_ttl(self):
+        cache = self.make_cache(exact_size=2, semantic_size=2)
+        for prompt in ('boots', 'sandals', 'sneakers'):
+            cache.lookup(prompt, 'text', 'gemma:2b', 0.7, encode=encode_words).store(prompt.upper())
+        self.assertIsNone(cache.lookup('boots', 'text', 'gemma:2b', 0.7).response)
+        self.assertEqual(cache.lookup('sneakers', 'text', 'gemma:2b', 0.7).response, 'SNEAKERS')
+        self.assertEqual(cache.stats()['exact']['evictions'], 1)
+        self.assertEqual(cache.stats()['semantic']['evictions'], 1)
+
+        expired = self.make_cache(ttl=0)
+        expired.lookup('boots', 'text', 'gemma:2b', 0.7, encode=encode_words).store('BOOTS')
+        self.assertIsNone(expired.lookup('boots', 'text', 'gemma:2b', 0.7, encode=encode_words).response)
+        self.assertEqual(expired.stats()['exact']['expirations'], 1)
+
+
+class StubCatalogIndex:
+    def __init__(self, version):
+        self.version = version
+        self.searches = 0
+
+    def resolve_mode(self):
+        return 'exact'
+
+    def search(self, embedding, k=1):
+        self.searches += 1
+        return [{'description': 'red cotton kurta', 'similarity': 0.9}][:k]
+
+
+@override_settings(IMAGE_MATCH_CACHE_ALIAS='default')
+class ImageCacheTest(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+
+    def test_same_photo_skips_clip(self):
+        index = StubCatalogIndex('v1')
+        photo = io.BytesIO(b'the same photo bytes')
+        encode = mock.Mock(side_effect=lambda images: np.ones((len(images), 4), dtype=np.float32))
+        with mock.patch('chatbot.image_cache.encode_images', encode), \
+                mock.patch('chatbot.image_cache.get_catalog_index', return_value=index):
+            first = match_image(photo)
+            second = match_image(io.BytesIO(b'the same photo bytes'))
+            self.assertEqual(encode.call_count, 1)
+            self.assertEqual(index.searches, 1)
+            self.assertEqual(second[1], first[1])
+            np.testing.assert_array_equal(second[0], first[0])
+
+            # A new catalog export reuses the embedding and only searches again
+            index.version = 'v2'
+            match_image(photo)
+            self.assertEqual((encode.call_count, index.searches), (1, 2))
+
+            match_image(io.BytesIO(b'another photo'))
+            self.assertEqual(encode.call_count, 2)
+        self.assertEqual(image_digest(photo), image_digest(b'the same photo bytes'))
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/generate like Ollama with ``server.reply`` after ``server.delay`` seconds"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append((self.path, payload, self.client_address[1]))
+        time.sleep(self.server.delay)
+        if payload['stream']:
+            # NDJSON, a few characters per line like Ollama's token stream
+            reply = self.server.reply
+            lines = [{"response": reply[i:i + 3], "done": False} for i in range(0, len(reply), 3)]
+            lines.append({"response": "", "done": True})
+            body = ''.join(json.dumps(line) + '\n' for line in lines).encode()
+        else:
+            body = json.dumps({"model": payload['model'], "response": self.server.reply, "done": True}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson' if payload['stream'] else 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubOllamaHandler)
+        self.requests = []
+        self.reply = ''
+        self.delay = 0
+
+    def handle_error(self, request, client_address):
+        pass  # clients that time out close the socket before the reply
+
+
+class LLMClientTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubOllamaServer()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    def setUp(self):
+        self.server.requests.clear()
+        self.server.reply = 'Pair it with white sneakers.'
+        self.server.delay = 0
+        settings_override = override_settings(OLLAMA_URL=self.url, OLLAMA_MODEL='stub-model')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_response_cache()
+        self.addCleanup(reset_response_cache)
+        patcher = mock.patch('chatbot.views.encode_text', side_effect=encode_words)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_generate_reuses_one_connection(self):
+        self.assertEqual(generate('denim jacket', options={'temperature': 0.5}), 'Pair it with white sneakers.')
+        self.assertEqual(generate('linen shirt'), 'Pair it with white sneakers.')
+
+        (path, payload, port), (_, _, second_port) = self.server.requests
+        self.assertEqual(path, '/api/generate')
+        self.assertEqual(payload, {'model': 'stub-model', 'prompt': 'denim jacket', 'stream': False, 'options': {'temperature': 0.5}})
+        self.assertEqual(port, second_port)
+
+    def test_agenerate(self):
+        async def generate_many():
+            return await asyncio.gather(*(agenerate(f'prompt {i}') for i in range(3)))
+
+        self.assertEqual(asyncio.run(generate_many()), ['Pair it with white sneakers.'] * 3)
+        self.assertEqual(sorted(payload['prompt'] for _, payload, _ in self.server.requests), ['prompt 0', 'prompt 1', 'prompt 2'])
+
+    def test_read_timeout(self):
+        self.server.delay = 0.5
+        with override_settings(OLLAMA_READ_TIMEOUT=0.1):
+            with self.assertRaises(LLMTimeout):
+                generate('slow prompt')
+
+    def test_connection_error(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            closed_port = s.getsockname()[1]
+        with override_settings(OLLAMA_URL=f'http://127.0.0.1:{closed_port}'):
+            with self.assertRaises(LLMConnectionError):
+                generate('anyone there?')
+
+    def test_text_recommendation(self):
+        self.server.reply = 'Outfit 1: linen shirt with chinos.\nNote: check the weather.'
+        response = self.client.post(reverse('outfit-recommend'), {'text': 'summer wedding guest'}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'recommendation': 'Outfit 1: linen shirt with chinos.'})
+        _, payload, _ = self.server.requests[0]
+        self.assertTrue(payload['prompt'].endswith('User request: summer wedding guest'))
+
+    def test_stream(self):
+        self.assertEqual(''.join(stream('denim jacket')), 'Pair it with white sneakers.')
+        self.assertTrue(self.server.requests[0][1]['stream'])
+
+        async def collect():
+            return [piece async for piece in astream('denim jacket')]
+
+        self.assertEqual(''.join(asyncio.run(collect())), 'Pair it with white sneakers.')
+
+    def test_astream_cancelled_while_reading(self):
+        release, closed = threading.Event(), threading.Event()
+
+        def slow_stream(prompt, model=None, options=None):
+            try:
+                yield 'Pair it'
+                release.wait(5)
+                yield ' with white sneakers.'
+            finally:
+                closed.set()
+
+        async def cancel_mid_piece():
+            pieces = astream('denim jacket')
+            self.assertEqual(await pieces.__anext__(), 'Pair it')
+            reading = asyncio.ensure_future(pieces.__anext__())
+            await asyncio.sleep(0.05)  # next() is now blocked in its thread
+            reading.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await reading
+            self.assertFalse(closed.is_set())
+            release.set()
+            # The generator is closed once that next() returns
+            return await asyncio.to_thread(closed.wait, 5)
+
+        with mock.patch('chatbot.llm.httpx', None), mock.patch('chatbot.llm.stream', slow_stream):
+            self.assertTrue(asyncio.run(cancel_mid_piece()))
+
+    def read_events(self, content):
+        events = []
+        for block in content.decode().strip().split('\n\n'):
+            event, data = block.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return events
+
+    def test_streamed_recommendation(self):
+        self.server.reply = '  Outfit 1: linen shirt with chinos.\n\nRemember: check the weather.'
+        response = self.client.post(
+            reverse('outfit-recommend'), {'text': 'summer wedding guest', 'stream': True}, content_type='application/json'
+        )
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = self.read_events(b''.join(response.streaming_content))
+        tokens = [data['token'] for event, data in events if event == 'token']
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual(''.join(tokens), 'Outfit 1: linen shirt with chinos.')
+        self.assertEqual(events[-1], ('done', {'recommendation': 'Outfit 1: linen shirt with chinos.'}))
+
+    async def test_streamed_recommendation_async(self):
+        self.server.reply = 'Outfit 1: kurta with juttis.### extra'
+        response = await self.async_client.post(
+            f"{reverse('outfit-recommend')}?stream=1", {'text': 'mehendi outfit'}, content_type='application/json'
+        )
+
+        events = self.read_events(b''.join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual(events[-1], ('done', {'recommendation': 'Outfit 1: kurta with juttis.'}))
+
+    def test_streamed_recommendation_without_backend(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            closed_port = s.getsockname()[1]
+        with override_settings(OLLAMA_URL=f'http://127.0.0.1:{closed_port}'):
+            response = self.client.post(
+                reverse('outfit-recommend'), {'text': 'office look', 'stream': True}, content_type='application/json'
+            )
+            events = self.read_events(b''.join(response.streaming_content))
+        self.assertEqual([event for event, _ in events], ['token', 'done'])
+        self.assertIn('trouble connecting', events[-1][1]['recommendation'])
+
+    def test_repeated_recommendation_is_cached(self):
+        url = reverse('outfit-recommend')
+        first = self.client.post(url, {'text': 'What to wear to a beach wedding?'}, content_type='application/json')
+        second = self.client.post(url, {'text': 'what to wear to a beach wedding'}, content_type='application/json')
+        streamed = self.client.post(url, {'text': 'what to wear to a beach wedding please', 'stream': True}, content_type='application/json')
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.read_events(streamed.content)[-1], ('done', first.json()))
@@ -0,0 +1,126 @@
+"""Downscaled WebP and JPEG copies of wardrobe and catalog photos.
+
+Thumbnails sit next to each other under ``thumbnails/`` in the image's
+storage, named after the original (``wardrobe/shirt.jpg`` ->
+``thumbnails/wardrobe/shirt_240.webp``). ``make_thumbnails`` returns the
+``[size, width]`` of each one it made, which the caller stores with the
+item so srcsets only list files that exist, at their real widths. Like
+``ingest``, this module imports no models.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+
+THUMBNAIL_DIR = 'thumbnails'
+# Longest side in pixels: the 80px outfit cards and 150px grid tiles at 1x and 2x
+DEFAULT_THUMBNAIL_SIZES = (96, 240, 480)
+# format -> (extension, PIL format, save options)
+THUMBNAIL_FORMATS = {
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def get_thumbnail_sizes():
+    """Thumbnail sizes, smallest first (settings.THUMBNAIL_SIZES by default)"""
+    return sorted(getattr(settings, 'THUMBNAIL_SIZES', DEFAULT_THUMBNAIL_SIZES))
+
+
+def thumbnail_name(image_name, size, fmt):
+    extension = THUMBNAIL_FORMATS[fmt][0]
+    return f"{THUMBNAIL_DIR}/{os.path.splitext(image_name)[0]}_{size}.{extension}"
+
+
+def open_image(source, size):
+    """Decode a path or file-like ``source`` just large enough for a ``size`` thumbnail"""
+    with Image.open(source) as image:
+        # JPEG draft mode decodes at a reduced scale, far cheaper than a full decode
+        image.draft('RGB', (size, size))
+        image.load()
+        return image.copy()
+
+
+def render_thumbnails(image, sizes=None):
+    """Encode ``image`` at each size and format; returns ``({(size, fmt): bytes}, {size: width})``"""
+    sizes = sizes or get_thumbnail_sizes()
+    image = image.convert('RGB')
+    rendered = {}
+    widths = {}
+    # Largest first, each shrunk from the previous one instead of the original
+    for size in sorted(sizes, reverse=True):
+        image.thumbnail((size, size), Image.LANCZOS)
+        widths[size] = image.size[0]
+        for fmt, (_, pil_format, options) in THUMBNAIL_FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, **options)
+            rendered[(size, fmt)] = buffer.getvalue()
+    return rendered, widths
+
+
+def stored_width(storage, name):
+    with storage.open(name) as f, Image.open(f) as image:
+        return image.size[0]
+
+
+def make_thumbnails(source, image_name, storage, overwrite=False):
+    """Write every thumbnail of ``image_name``; returns their ``[size, width]`` pairs.
+
+    ``source`` is a PIL image (e.g. one already decoded for CLIP), a path or
+    a file-like object. Existing thumbnails are kept unless ``overwrite``.
+    Returns None if ``source`` could not be read.
+    """
+    sizes = get_thumbnail_sizes()
+    names = {(size, fmt): thumbnail_name(image_name, size, fmt) for size in sizes for fmt in THUMBNAIL_FORMATS}
+    # A size is kept only when every format of it exists
+    missing = sorted({size for (size, _), name in names.items() if overwrite or not storage.exists(name)})
+
+    try:
+        widths = {size: stored_width(storage, names[(size, 'jpeg')]) for size in sizes if size not in missing}
+        rendered = {}
+        if missing:
+            image = source if isinstance(source, Image.Image) else open_image(source, max(missing))
+            rendered, rendered_widths = render_thumbnails(image, missing)
+            widths.update(rendered_widths)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        print(f"⚠️ Could not make thumbnails for {image_name}: {e}")
+        return None
+
+    for (size, fmt), content in rendered.items():
+        name = names[(size, fmt)]
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(content))
+    return [[size, widths[size]] for size in sizes]
+
+
+def delete_thumbnails(image_name, storage, thumbnails=()):
+    """Remove the thumbnails of ``image_name``: the recorded ones and any at the configured sizes"""
+    sizes = set(get_thumbnail_sizes()) | {size for size, _ in thumbnails or ()}
+    for size in sizes:
+        for fmt in THUMBNAIL_FORMATS:
+            name = thumbnail_name(image_name, size, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+
+
+def thumbnail_srcsets(image_name, storage, thumbnails):
+    """``{'webp': srcset, 'jpeg': srcset}`` for ``<picture>``/``<img srcset>``.
+
+    ``thumbnails`` are the ``[size, width]`` pairs ``make_thumbnails``
+    returned; None without any, so the page falls back to the original.
+    """
+    if not image_name or not thumbnails:
+        return None
+    # A photo smaller than a size gives the same width twice; keep the smaller file
+    sizes = {}
+    for size, width in sorted(thumbnails):
+        sizes.setdefault(width, size)
+    return {
+        fmt: ', '.join(
+            f"{storage.url(thumbnail_name(image_name, size, fmt))} {width}w" for width, size in sorted(sizes.items())
+        )
+        for fmt in THUMBNAIL_FORMATS
+    }
@@ -4,4 +4,5 @@ from . import views
 urlpatterns = [
     path('recommend/', views.OutfitRecommendationView.as_view(), name='outfit-recommend'),
     path('test/', views.chat_test_page, name='chat-test'),
+    path('cache-stats/', views.llm_cache_stats, name='llm-cache-stats'),
 ]
\ No newline at end of file
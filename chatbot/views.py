@@ -1,52 +1,170 @@
+import json
+from contextlib import aclosing, closing
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render
-from rest_framework.views import APIView
-from rest_framework.response import Response
-from rest_framework.parsers import JSONParser, MultiPartParser
+from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.http import JsonResponse
-import requests
-import json
-import numpy as np
-import tempfile
-import os
-from .models import ClothingItem
-from .clip_utils import encode_image, encode_text
-from sklearn.metrics.pairwise import cosine_similarity
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from .clip_utils import encode_text
+from .image_cache import match_image
+from .llm import DEFAULT_MODEL, LLMConnectionError, LLMError, LLMTimeout, agenerate, astream, stream
+from .response_cache import get_response_cache
+
+# Sampling options for outfit recommendations
+LLM_OPTIONS = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "max_tokens": 600
+}
+
+# clean_response cuts the answer at the first of these
+STOP_MARKERS = ('###', 'Note:', 'Remember:')
+
+def read_recommendation_request(request):
+    """``(text, image, stream)`` from a JSON or multipart request; raises ValueError on bad JSON"""
+    if request.content_type == 'application/json':
+        fields = json.loads(request.body or b'{}')
+        if not isinstance(fields, dict):
+            raise ValueError("Expected a JSON object")
+        image = None
+    else:
+        fields, image = request.POST, request.FILES.get('image')
+    stream_flag = str(fields.get('stream') or request.GET.get('stream', '')).lower()
+    wants_stream = stream_flag in ('1', 'true', 'yes') or 'text/event-stream' in request.headers.get('Accept', '')
+    return fields.get('text'), image, wants_stream
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class ResponseCleaner:
+    """``clean_response`` applied to text arriving in pieces.
+
+    Text is passed on as soon as it cannot be the start of a stop marker or
+    trailing whitespace; ``done`` turns true at the first marker, after
+    which the rest of the generation can be dropped.
+    """
+    
+    def __init__(self):
+        self.pending = ''
+        self.started = False
+        self.done = False
+        self.hold = max(len(marker) for marker in STOP_MARKERS) - 1
+    
+    def feed(self, text):
+        """The part of ``pending + text`` that is safe to show now"""
+        if self.done:
+            return ''
+        self.pending += text
+        cuts = [cut for cut in (self.pending.find(marker) for marker in STOP_MARKERS) if cut >= 0]
+        if cuts:
+            self.done = True
+            return self.emit(self.pending[:min(cuts)].rstrip())
+        ready = self.pending[:max(0, len(self.pending) - self.hold)].rstrip()
+        self.pending = self.pending[len(ready):]
+        return self.emit(ready)
+    
+    def finish(self):
+        """Whatever was held back, once the generation has ended"""
+        if self.done:
+            return ''
+        self.done = True
+        return self.emit(self.pending.rstrip())
+    
+    def emit(self, text):
+        if not self.started:
+            text = text.lstrip()
+            self.started = bool(text)
+        if self.done:
+            self.pending = ''
+        return text
+
+class RecommendationEvents:
+    """Server-sent events for one streamed recommendation.
+
+    ``meta`` carries what is known before the LLM starts (e.g. the
+    identified item), each ``token`` event a cleaned piece of the answer,
+    and ``done`` the whole response as the non-streaming endpoint returns it.
+    """
+    
+    def __init__(self, data, error_message, on_complete=None):
+        self.data = data
+        self.error_message = error_message
+        self.on_complete = on_complete
+        self.cleaner = ResponseCleaner()
+        self.pieces = []
+    
+    @property
+    def done(self):
+        return self.cleaner.done
+    
+    def start(self):
+        return sse_event('meta', self.data) if self.data else ''
+    
+    def feed(self, text):
+        return self.token(self.cleaner.feed(text))
+    
+    def finish(self, error=None):
+        events = self.token(self.cleaner.finish())
+        if error is None and self.pieces and self.on_complete:
+            self.on_complete(''.join(self.pieces))
+        if error is not None and not self.pieces:
+            # Nothing was shown yet: fall back to the same advice as the JSON endpoint
+            events += self.token(self.error_message(error))
+        return events + sse_event('done', {**self.data, "recommendation": ''.join(self.pieces)})
+    
+    def token(self, piece):
+        if not piece:
+            return ''
+        self.pieces.append(piece)
+        return sse_event('token', {"token": piece})
 
 @method_decorator(csrf_exempt, name='dispatch')
-class OutfitRecommendationView(APIView):
-    parser_classes = [JSONParser, MultiPartParser]
+class OutfitRecommendationView(View):
+    """Async view: while the LLM generates, the worker serves other requests.
+
+    CLIP matching is CPU work and runs in a thread via ``sync_to_async``.
+    With ``stream`` set (form/JSON field or query parameter) or an
+    ``Accept: text/event-stream`` header, recommendations are sent as
+    server-sent events while the LLM generates them.
+    """
     
-    def post(self, request):
-        text_input = request.data.get('text')
-        image_input = request.FILES.get('image')
+    async def post(self, request):
+        try:
+            text_input, image_input, self.streaming = read_recommendation_request(request)
+        except ValueError as e:
+            return JsonResponse({"error": f"Invalid request body: {e}"}, status=400)
+        # Streaming only stays incremental end to end under an ASGI server
+        self.is_asgi = isinstance(request, ASGIRequest)
         
         # Case 1: User uploads image + text
         if image_input and text_input:
-            return self.handle_image_with_text(image_input, text_input)
+            return await self.handle_image_with_text(image_input, text_input)
         
         # Case 2: User uploads only image
         elif image_input:
-            return self.handle_image_only(image_input)
+            return await self.handle_image_only(image_input)
         
         # Case 3: User sends only text
         elif text_input:
-            return self.handle_text_only(text_input)
+            return await self.handle_text_only(text_input)
         
         else:
-            return Response({"error": "No text or image provided"}, status=400)
+            return JsonResponse({"error": "No text or image provided"}, status=400)
     
-    def handle_image_with_text(self, image_file, user_text):
+    async def handle_image_with_text(self, image_file, user_text):
         """User uploads image + text like 'recommendations for this'"""
         try:
             # Step 1: Use CLIP to identify the image
-            image_description = self.identify_image_with_clip(image_file)
+            image_description = await sync_to_async(self.identify_image_with_clip, thread_sensitive=False)(image_file)
             
             # NEW: Check if user is asking for shopping links
             if self.is_shopping_request(user_text):
                 shopping_links = self.get_shopping_links(user_text, image_description)
-                return Response({
+                return JsonResponse({
                     "identified_item": image_description,
                     "user_request": user_text,
                     "shopping_links": shopping_links
@@ -56,86 +174,95 @@ class OutfitRecommendationView(APIView):
             llm_prompt = f"Item: {image_description}. User request: '{user_text}'"
             
             # Step 3: Get LLM recommendation with specific context
-            recommendation = self.get_llm_recommendation(llm_prompt, "image_with_text")
-            
-            return Response({
+            return await self.recommend({
                 "identified_item": image_description,
                 "user_request": user_text,
-                "recommendation": recommendation
-            })
+            }, llm_prompt, "image_with_text")
             
         except Exception as e:
-            return Response({"error": f"Image processing failed: {str(e)}"}, status=500)
+            return JsonResponse({"error": f"Image processing failed: {str(e)}"}, status=500)
     
-    def handle_image_only(self, image_file):
+    async def handle_image_only(self, image_file):
         """User uploads only image"""
         try:
-            image_description = self.identify_image_with_clip(image_file)
-            recommendation = self.get_llm_recommendation(image_description, "image_only")
-            
-            return Response({
-                "identified_item": image_description,
-                "recommendation": recommendation
-            })
+            image_description = await sync_to_async(self.identify_image_with_clip, thread_sensitive=False)(image_file)
+            return await self.recommend({"identified_item": image_description}, image_description, "image_only")
             
         except Exception as e:
-            return Response({"error": f"Image processing failed: {str(e)}"}, status=500)
+            return JsonResponse({"error": f"Image processing failed: {str(e)}"}, status=500)
     
-    def handle_text_only(self, user_text):
+    async def handle_text_only(self, user_text):
         """User sends only text"""
         print(f"DEBUG: User text: '{user_text}'")
         print(f"DEBUG: Is shopping request: {self.is_shopping_request(user_text)}")
         # NEW: Check if user is asking for shopping links
         if self.is_shopping_request(user_text):
             shopping_links = self.get_shopping_links(user_text)
-            return Response({
+            return JsonResponse({
                 "user_request": user_text,
                 "shopping_links": shopping_links
             })
         
-        recommendation = self.get_llm_recommendation(user_text, "text")
-        return Response({"recommendation": recommendation})
+        return await self.recommend({}, user_text, "text")
     
-    def identify_image_with_clip(self, image_file):
-        """Use CLIP to find the closest matching item in database"""
-        # Save uploaded image to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-            for chunk in image_file.chunks():
-                tmp_file.write(chunk)
-            tmp_path = tmp_file.name
+    async def recommend(self, data, prompt, context_type):
+        """``data`` plus the LLM's recommendation, as JSON or streamed as events"""
+        lookup = await self.lookup_response(prompt, context_type)
+        if not self.streaming:
+            data["recommendation"] = await self.get_llm_recommendation(prompt, context_type, lookup)
+            return JsonResponse(data)
+        
+        if lookup.response is not None:
+            # The whole answer is ready: send all the events at once
+            events = RecommendationEvents(data, self.llm_error_message)
+            return HttpResponse(events.start() + events.token(lookup.response) + events.finish(), content_type='text/event-stream')
         
+        events = RecommendationEvents(data, self.llm_error_message, lookup.store)
+        full_prompt = self.build_llm_prompt(prompt, context_type)
+        content = self.async_events(events, full_prompt) if self.is_asgi else self.sync_events(events, full_prompt)
+        response = StreamingHttpResponse(content, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # keep nginx from buffering the stream
+        return response
+    
+    async def async_events(self, events, full_prompt):
+        yield events.start()
+        error = None
         try:
-            # Get CLIP embedding for uploaded image
-            uploaded_embedding = encode_image(tmp_path)
-            
-            # Find closest match in database
-            closest_item = self.find_closest_item(uploaded_embedding)
-            
-            return closest_item.description
-            
-        finally:
-            # Clean up temporary file
-            os.unlink(tmp_path)
-    
-    def find_closest_item(self, query_embedding):
-        """Find the database item with closest embedding to query"""
-        best_similarity = -1
-        best_item = None
+            async with aclosing(astream(full_prompt, options=LLM_OPTIONS)) as pieces:
+                async for text in pieces:
+                    event = events.feed(text)
+                    if event:
+                        yield event
+                    if events.done:
+                        break  # closing the stream stops the generation
+        except Exception as e:
+            error = e
+        yield events.finish(error)
+    
+    def sync_events(self, events, full_prompt):
+        yield events.start()
+        error = None
+        try:
+            with closing(stream(full_prompt, options=LLM_OPTIONS)) as pieces:
+                for text in pieces:
+                    event = events.feed(text)
+                    if event:
+                        yield event
+                    if events.done:
+                        break
+        except Exception as e:
+            error = e
+        yield events.finish(error)
+    
+    def identify_image_with_clip(self, image_file):
+        """Use CLIP to find the closest matching item in database"""
+        # Same photo as an earlier upload (here or in the wardrobe): no CLIP pass at all
+        _, matches = match_image(image_file)
+        if not matches:
+            raise ValueError("No catalog items available for matching")
         
-        for item in ClothingItem.objects.all():
-            # Convert stored embedding back to numpy array
-            item_embedding = np.array(json.loads(item.embedding))
-            
-            # Calculate cosine similarity
-            similarity = cosine_similarity(
-                query_embedding.reshape(1, -1), 
-                item_embedding.reshape(1, -1)
-            )[0][0]
-            
-            if similarity > best_similarity:
-                best_similarity = similarity
-                best_item = item
-        return best_item
+        return matches[0]['description']
     
     #SHOPPING LINKS PART
 
@@ -219,12 +346,51 @@ class OutfitRecommendationView(APIView):
     
         return clean
     
-    def get_llm_recommendation(self, prompt, context_type="text"):
-        """Get fashion recommendations with context-aware prompts"""
+    async def lookup_response(self, prompt, context_type):
+        """Check the response cache (the semantic tier's CLIP encoding runs in a thread)"""
+        lookup = await sync_to_async(get_response_cache().lookup, thread_sensitive=False)(
+            prompt, context_type,
+            getattr(settings, 'OLLAMA_MODEL', DEFAULT_MODEL), LLM_OPTIONS["temperature"],
+            encode=encode_text,
+        )
+        if lookup.response is not None:
+            print(f"♻️ LLM response cache hit ({lookup.tier}) for a {context_type} request")
+        return lookup
+    
+    async def get_llm_recommendation(self, prompt, context_type="text", lookup=None):
+        """Get fashion recommendations with context-aware prompts, from the response cache when possible"""
+        if lookup is None:
+            lookup = await self.lookup_response(prompt, context_type)
+        if lookup.response is not None:
+            return lookup.response
         try:
-            # Different prompts for different scenarios
-            if context_type == "image_with_text":
-                system_prompt = """You are a professional fashion stylist. Based on the clothing item described, provide 2 complete outfit suggestions.
+            result = await agenerate(self.build_llm_prompt(prompt, context_type), options=LLM_OPTIONS)
+            recommendation = self.clean_response(result)
+        except Exception as e:
+            return self.llm_error_message(e)
+        # Fallback advice is never cached, only real answers
+        if recommendation:
+            lookup.store(recommendation)
+        return recommendation
+    
+    def llm_error_message(self, error):
+        """Advice to show the user instead of a recommendation when the LLM call fails"""
+        if isinstance(error, LLMConnectionError):
+            return "I apologize, but I'm having trouble connecting to the fashion recommendation service right now. Please try again later."
+        
+        if isinstance(error, LLMTimeout):
+            return "The fashion recommendation service is taking longer than expected. Please try again in a moment."
+        
+        if isinstance(error, LLMError):
+            return "I'd recommend focusing on fit, color coordination, and occasion-appropriate styling. Pair with complementary pieces that enhance your personal style."
+        
+        return "For a stylish look, consider pairing with well-fitting complementary pieces, appropriate footwear, and accessories that match the occasion and your personal style."
+    
+    def build_llm_prompt(self, prompt, context_type="text"):
+        """The full LLM prompt for ``prompt`` in one of the three contexts"""
+        # Different prompts for different scenarios
+        if context_type == "image_with_text":
+            system_prompt = """You are a professional fashion stylist. Based on the clothing item described, provide 2 complete outfit suggestions.
 
 FORMAT:
 Outfit 1: [Occasion - e.g., Casual Day Out]
@@ -242,11 +408,11 @@ Outfit 2: [Different Occasion - e.g., Smart Casual]
 - Why it works: [brief explanation]
 
 Be specific with colors, styles, and materials."""
-                
-                full_prompt = f"{system_prompt}\n\nItem: {prompt}"
-                
-            elif context_type == "image_only":
-                system_prompt = """You are a fashion expert. For this clothing item, suggest 3 versatile ways to style it for different occasions.
+            
+            full_prompt = f"{system_prompt}\n\nItem: {prompt}"
+            
+        elif context_type == "image_only":
+            system_prompt = """You are a fashion expert. For this clothing item, suggest 3 versatile ways to style it for different occasions.
 
 Provide specific recommendations for:
 1. Casual everyday wear
@@ -254,11 +420,11 @@ Provide specific recommendations for:
 3. Evening/date night
 
 Include specific clothing items, colors, and styling tips."""
-                
-                full_prompt = f"{system_prompt}\n\nItem: {prompt}"
-                
-            else:  # text_only
-                system_prompt = """You are a fashion consultant. Create complete outfit recommendations based on the user's request.
+            
+            full_prompt = f"{system_prompt}\n\nItem: {prompt}"
+            
+        else:  # text_only
+            system_prompt = """You are a fashion consultant. Create complete outfit recommendations based on the user's request.
 
 For each suggestion, include:
 - Occasion/context
@@ -268,38 +434,10 @@ For each suggestion, include:
 - Styling notes
 
 Make it practical and fashionable."""
-                
-                full_prompt = f"{system_prompt}\n\nUser request: {prompt}"
-
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": "gemma:2b",
-                    "prompt": full_prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.7,
-                        "top_p": 0.9,
-                        "max_tokens": 600
-                    }
-                },
-                timeout=300
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return self.clean_response(result['response'])
-            else:
-                return "I'd recommend focusing on fit, color coordination, and occasion-appropriate styling. Pair with complementary pieces that enhance your personal style."
-                
-        except requests.exceptions.ConnectionError:
-            return "I apologize, but I'm having trouble connecting to the fashion recommendation service right now. Please try again later."
-        
-        except requests.exceptions.Timeout:
-            return "The fashion recommendation service is taking longer than expected. Please try again in a moment."
             
-        except Exception as e:
-            return "For a stylish look, consider pairing with well-fitting complementary pieces, appropriate footwear, and accessories that match the occasion and your personal style."
+            full_prompt = f"{system_prompt}\n\nUser request: {prompt}"
+
+        return full_prompt
 
     def clean_response(self, text):
         """Clean up the LLM response"""
@@ -309,5 +447,10 @@ Make it practical and fashionable."""
         clean_text = clean_text.split('Remember:')[0]  # Remove reminders
         return clean_text.strip()
     
+@staff_member_required
+def llm_cache_stats(request):
+    """Hit rates and sizes of this process's LLM response cache tiers"""
+    return JsonResponse(get_response_cache().stats())
+
 def chat_test_page(request):
     return render(request, "chat.html")
\ No newline at end of file
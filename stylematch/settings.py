@@ -103,6 +103,100 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Media files (uploaded images)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Longest side (px) of the WebP/JPEG thumbnails made for every wardrobe and
+# catalog photo; `manage.py backfill_thumbnails` makes them for older media
+THUMBNAIL_SIZES = [96, 240, 480]
+
+# Fashion product images dataset (styles.csv + images/) read by `load_fashion_data`
+FASHION_DATASET_DIR = os.environ.get('STYLEMATCH_DATASET_DIR')
+# Runtime data (file caches, catalog bundles) is kept out of the source tree
+DATA_DIR = os.environ.get('STYLEMATCH_DATA_DIR', os.path.join(os.path.expanduser('~'), '.stylematch'))
+
+# Memory-mapped catalog bundle written by `manage.py export_catalog_index`
+CATALOG_INDEX_DIR = os.path.join(DATA_DIR, 'catalog_index')
+# Images/texts per CLIP forward pass
+CLIP_BATCH_SIZE = 32
+# Load CLIP eagerly at startup; enable per process for inference workers
+CLIP_WARMUP = os.environ.get('STYLEMATCH_CLIP_WARMUP', '') == '1'
+# How uploaded photos are matched: 'text' (catalog descriptions), 'image'
+# (catalog photos) or 'fused'; image modes need `load_fashion_data --with-images`
+CATALOG_SEARCH_MODE = 'text'
+# Share of the image similarity in 'fused' mode
+CATALOG_FUSION_WEIGHT = 0.5
+# IVF lists scanned per query when the bundle has an ANN index (recall vs latency)
+CATALOG_ANN_NPROBE = 16
+# PQ candidates re-scored exactly, as a multiple of k; this, not nprobe, caps
+# PQ recall (about 0.8 at 16, >0.99 at 64 on a synthetic 512-d catalog)
+CATALOG_ANN_RERANK = 64
+
+# Caches: ColorMind palettes and generated outfits go to disk so they survive
+# restarts and are shared by every worker (warm the palettes with
+# `manage.py warm_colormind_palettes`)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'colormind': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(DATA_DIR, 'cache', 'colormind'),
+    },
+    # Generated outfits and wardrobe versions; must be shared by all workers
+    'outfits': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(DATA_DIR, 'cache', 'outfits'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # CLIP embeddings and catalog matches of uploaded photos, by content hash
+    # (chatbot.image_cache); MAX_ENTRIES bounds it, culling when full
+    'images': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(DATA_DIR, 'cache', 'images'),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+COLORMIND_CACHE_ALIAS = 'colormind'
+# Seconds a ColorMind palette stays valid
+COLORMIND_PALETTE_TTL = 30 * 24 * 60 * 60
+# Fetch palettes missing from the cache in a background thread (requests never
+# wait on ColorMind); `manage.py warm_colormind_palettes` fills them up front
+COLORMIND_BACKGROUND_REFRESH = True
+OUTFIT_CACHE_ALIAS = 'outfits'
+# Outfits kept per cached ranking (more survive more deletes without a full re-rank)
+OUTFIT_CACHE_DEPTH = 50
+# Seconds generated outfits and wardrobe change records are kept
+OUTFIT_CACHE_TTL = 24 * 60 * 60
+# Wardrobe changes replayed onto a cached ranking before a full re-rank instead
+OUTFIT_CACHE_MAX_REPLAY = 100
+IMAGE_MATCH_CACHE_ALIAS = 'images'
+# Catalog matches cached per uploaded photo
+IMAGE_MATCH_TOP_K = 5
+# Seconds an uploaded photo's embedding and matches are kept
+IMAGE_MATCH_CACHE_TTL = 30 * 24 * 60 * 60
+
+# Wardrobe uploads are identified in the background (wardrobe.jobs). Threads
+# per web process that drain the queue after an upload; 0 leaves it to
+# `manage.py process_uploads`
+UPLOAD_WORKER_THREADS = 2
+# Seconds before an unfinished claim is taken to be from a dead worker
+UPLOAD_JOB_TIMEOUT = 10 * 60
+UPLOAD_JOB_MAX_ATTEMPTS = 3
+
+# Ollama LLM backend (chatbot.llm). Generation waits up to the read timeout;
+# serve with an ASGI server (stylematch.asgi) so waiting requests do not
+# hold a worker each. Install httpx for the native async client.
+OLLAMA_URL = os.environ.get('STYLEMATCH_OLLAMA_URL', 'http://localhost:11434')
+OLLAMA_MODEL = 'gemma:2b'
+OLLAMA_CONNECT_TIMEOUT = 3.05
+OLLAMA_READ_TIMEOUT = 300
+# Keep-alive connections per process
+OLLAMA_POOL_SIZE = 10
+
+# Per-process LLM response cache (chatbot.response_cache): exact prompts,
+# plus prompts whose CLIP text embedding is this close to a cached one
+LLM_CACHE_SIZE = 1000
+LLM_SEMANTIC_CACHE_SIZE = 500
+LLM_SEMANTIC_CACHE_THRESHOLD = 0.93
+LLM_CACHE_TTL = 6 * 60 * 60
 
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
@@ -3,5 +3,5 @@ from .models import WardrobeItem
 
 @admin.register(WardrobeItem)
 class WardrobeItemAdmin(admin.ModelAdmin):
-    list_display = ['user', 'description', 'category', 'created_at']
-    list_filter = ['category', 'created_at']
\ No newline at end of file
+    list_display = ['user', 'description', 'category', 'status', 'created_at']
+    list_filter = ['category', 'status', 'created_at']
\ No newline at end of file
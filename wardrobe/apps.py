@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class WardrobeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'wardrobe'
+
+    def ready(self):
+        # Compile the fallback prompts and the colour matrix together with the CLIP warm-up
+        if getattr(settings, 'CLIP_WARMUP', False):
+            from .colors import get_color_matrix
+            from .fallback import get_fallback_vocabulary
+            get_fallback_vocabulary()
+            get_color_matrix()
@@ -0,0 +1,277 @@
+import threading
+import time
+
+import numpy as np
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+from chatbot.attributes import COLOR_KEYWORDS, UNKNOWN_COLOR, extract_color
+
+COLORMIND_URL = 'http://colormind.io/api/'
+PALETTE_CACHE_PREFIX = 'colormind:palette:'
+DEFAULT_PALETTE_TTL = 30 * 24 * 60 * 60
+# Failed lookups are remembered briefly so one outfit request cannot stack up timeouts
+FAILED_LOOKUP_TTL = 5 * 60
+
+COLOR_RGB = {
+    'red': [228, 59, 68],
+    'blue': [66, 133, 244],
+    'green': [52, 168, 83],
+    'yellow': [251, 188, 5],
+    'pink': [234, 128, 252],
+    'purple': [156, 39, 176],
+    'orange': [255, 152, 0],
+    'brown': [121, 85, 72],
+    'black': [0, 0, 0],
+    'white': [255, 255, 255],
+    'gray': [158, 158, 158],
+    'navy': [30, 68, 124],
+    'beige': [245, 245, 220],
+    'khaki': [195, 176, 145]
+}
+DEFAULT_RGB = [128, 128, 128]  # Unknown colours are treated as gray
+
+NEUTRAL_COLORS = ['black', 'white', 'gray', 'brown', 'beige', 'khaki', 'navy']
+
+# Contrasts that work for Indian wear
+INDIAN_CONTRASTS = {
+    'red': ['green', 'gold', 'yellow'],
+    'green': ['red', 'pink', 'orange', 'purple'],
+    'blue': ['orange', 'pink', 'gold'],
+    'pink': ['green', 'blue', 'purple'],
+    'purple': ['yellow', 'pink', 'gold'],
+    'yellow': ['purple', 'red', 'blue'],
+    'orange': ['blue', 'green', 'purple']
+}
+
+
+def palette_colors():
+    """Every colour name a palette can be requested for"""
+    return list(dict.fromkeys([*COLOR_KEYWORDS, *COLOR_RGB]))
+
+
+def color_name_to_rgb(color_name):
+    return COLOR_RGB.get(color_name, DEFAULT_RGB)
+
+
+def colors_are_similar(rgb1, rgb2, tolerance=50):
+    """Check if two RGB colors are similar within tolerance"""
+    r1, g1, b1 = rgb1
+    r2, g2, b2 = rgb2
+
+    distance = ((r1 - r2) ** 2 + (g1 - g2) ** 2 + (b1 - b2) ** 2) ** 0.5
+    return distance < tolerance
+
+
+def are_colors_highly_compatible(color1, color2, palette=None):
+    """``color2`` sits in ``color1``'s ColorMind palette, or either is neutral"""
+    if color1 == UNKNOWN_COLOR or color2 == UNKNOWN_COLOR:
+        return False
+
+    if palette:
+        color2_rgb = color_name_to_rgb(color2)
+        if any(colors_are_similar(color2_rgb, palette_color) for palette_color in palette):
+            return True
+
+    # Fallback to basic compatibility for neutral colors
+    if color1 in NEUTRAL_COLORS or color2 in NEUTRAL_COLORS:
+        return True
+
+    return color1 == color2
+
+
+def are_colors_beautiful_contrast(color1, color2):
+    """Check if colors create a beautiful contrast (for Indian wear especially)"""
+    if color1 == UNKNOWN_COLOR or color2 == UNKNOWN_COLOR:
+        return True
+    return color2 in INDIAN_CONTRASTS.get(color1, ()) or color1 in INDIAN_CONTRASTS.get(color2, ())
+
+
+def colors_match(color1, color2):
+    """Basic color matching (fallback when ColorMind fails)"""
+    if color1 == UNKNOWN_COLOR or color2 == UNKNOWN_COLOR:
+        return True
+    if color1 in NEUTRAL_COLORS or color2 in NEUTRAL_COLORS:
+        return True
+    return color1 == color2
+
+
+def get_palette_cache():
+    """The shared cache palettes persist in (settings.COLORMIND_CACHE_ALIAS)"""
+    alias = getattr(settings, 'COLORMIND_CACHE_ALIAS', 'default')
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def fetch_palette(base_color, timeout=5):
+    """Ask ColorMind for a palette around ``base_color``; None on any failure"""
+    data = {
+        "model": "default",
+        "input": [color_name_to_rgb(base_color), "N", "N", "N", "N"]
+    }
+    try:
+        response = requests.post(COLORMIND_URL, json=data, timeout=timeout)
+        if response.status_code == 200:
+            palette = response.json()['result']
+            print(f"🎨 ColorMind palette for {base_color}: {palette}")
+            return palette
+    except Exception as e:
+        print(f"⚠️ ColorMind API error: {e}")
+    return None
+
+
+# Per-process memo in front of the shared cache: name -> (expires_at, palette)
+_palettes = {}
+_palettes_lock = threading.Lock()
+
+
+def get_palette(base_color, fetch=True):
+    """Return the harmonious palette for ``base_color``, hitting ColorMind only on a cold cache.
+
+    Palettes live in this process's memo and in the shared Django cache for
+    settings.COLORMIND_PALETTE_TTL seconds, so a warm cache (see
+    ``manage.py warm_colormind_palettes``) means no network calls at all.
+    """
+    now = time.monotonic()
+    with _palettes_lock:
+        cached = _palettes.get(base_color)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    ttl = getattr(settings, 'COLORMIND_PALETTE_TTL', DEFAULT_PALETTE_TTL)
+    cache = get_palette_cache()
+    palette = cache.get(PALETTE_CACHE_PREFIX + base_color)
+    if palette is None and fetch:
+        palette = fetch_palette(base_color)
+        if palette is not None:
+            cache.set(PALETTE_CACHE_PREFIX + base_color, palette, ttl)
+
+    if palette is not None or fetch:
+        with _palettes_lock:
+            _palettes[base_color] = (now + (ttl if palette is not None else FAILED_LOOKUP_TTL), palette)
+    return palette
+
+
+def clear_palette_memo():
+    """Forget palettes held by this process (the shared cache is untouched)"""
+    with _palettes_lock:
+        _palettes.clear()
+
+
+class ColorMatrix:
+    """Every colour rule evaluated once over the colour vocabulary.
+
+    ``compatible[i, j]`` says colour ``j`` goes with base colour ``i`` (the
+    relation is not symmetric: it uses ``i``'s palette), ``match`` and
+    ``contrast`` hold the basic and Indian-wear rules, and ``score`` folds
+    them into one float so candidates can be ranked with array lookups.
+    """
+
+    COMPATIBLE_SCORE = 1.0
+    CONTRAST_SCORE = 0.6
+    MATCH_SCORE = 0.3
+
+    def __init__(self, colors, compatible, match, contrast, complete=True):
+        self.colors = list(colors)
+        self.complete = complete
+        self.built_at = time.monotonic()
+        self.index = {color: i for i, color in enumerate(self.colors)}
+        self.compatible = compatible
+        self.match = match
+        self.contrast = contrast
+        self.score = np.select(
+            [compatible, contrast, match],
+            [self.COMPATIBLE_SCORE, self.CONTRAST_SCORE, self.MATCH_SCORE],
+            0.0,
+        ).astype(np.float32)
+
+    @classmethod
+    def build(cls, colors=None, fetch=True):
+        """Evaluate the pairwise rules, reading each base colour's palette once"""
+        if colors is None:
+            colors = palette_colors() + [UNKNOWN_COLOR]
+        n = len(colors)
+        compatible = np.zeros((n, n), dtype=bool)
+        match = np.zeros((n, n), dtype=bool)
+        contrast = np.zeros((n, n), dtype=bool)
+        complete = True
+        for i, color1 in enumerate(colors):
+            palette = get_palette(color1, fetch=fetch) if color1 != UNKNOWN_COLOR else None
+            complete = complete and (palette is not None or color1 == UNKNOWN_COLOR)
+            for j, color2 in enumerate(colors):
+                compatible[i, j] = are_colors_highly_compatible(color1, color2, palette)
+                match[i, j] = colors_match(color1, color2)
+                contrast[i, j] = are_colors_beautiful_contrast(color1, color2)
+        return cls(colors, compatible, match, contrast, complete)
+
+    def color_id(self, color):
+        return self.index.get(color, self.index[UNKNOWN_COLOR])
+
+    def color_ids(self, colors):
+        """Vectorised ``color_id`` for a sequence of names"""
+        return np.fromiter((self.color_id(color) for color in colors), dtype=np.int64, count=len(colors))
+
+    def known_ids(self, colors):
+        """Rows of those ``colors`` that are in the vocabulary (no 'unknown' fallback)"""
+        return np.array([self.index[color] for color in colors if color in self.index], dtype=np.int64)
+
+    def is_compatible(self, color1, color2):
+        return bool(self.compatible[self.color_id(color1), self.color_id(color2)])
+
+    def is_match(self, color1, color2):
+        return bool(self.match[self.color_id(color1), self.color_id(color2)])
+
+    def is_contrast(self, color1, color2):
+        return bool(self.contrast[self.color_id(color1), self.color_id(color2)])
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+_refresh_thread = None
+
+
+def matrix_is_stale(matrix):
+    # A matrix missing palettes is rebuilt from the shared cache once failed lookups expire
+    return matrix is None or (not matrix.complete and time.monotonic() - matrix.built_at > FAILED_LOOKUP_TTL)
+
+
+def get_color_matrix():
+    """Return the process-wide colour matrix, building it on first use.
+
+    Built from cached palettes only, so it never waits on ColorMind; missing
+    palettes are fetched by ``manage.py warm_colormind_palettes`` or, with
+    settings.COLORMIND_BACKGROUND_REFRESH, by a background thread that swaps
+    in the completed matrix.
+    """
+    global _matrix
+    if matrix_is_stale(_matrix):
+        with _matrix_lock:
+            if matrix_is_stale(_matrix):
+                start_time = time.time()
+                _matrix = ColorMatrix.build(fetch=False)
+                print(f"🎨 Colour matrix built for {len(_matrix.colors)} colours in {time.time() - start_time:.2f}s")
+                if not _matrix.complete and getattr(settings, 'COLORMIND_BACKGROUND_REFRESH', True):
+                    start_palette_refresh()
+    return _matrix
+
+
+def start_palette_refresh():
+    """Fetch the missing palettes off the request path (one refresh at a time); returns its thread"""
+    global _refresh_thread
+    if _refresh_thread is None or not _refresh_thread.is_alive():
+        _refresh_thread = threading.Thread(target=refresh_color_matrix, name='colormind-refresh', daemon=True)
+        _refresh_thread.start()
+    return _refresh_thread
+
+
+def refresh_color_matrix():
+    """Fetch any missing palettes from ColorMind and swap in the rebuilt matrix"""
+    global _matrix
+    matrix = ColorMatrix.build(fetch=True)
+    with _matrix_lock:
+        _matrix = matrix
+    print(f"🎨 Colour matrix refreshed from ColorMind ({'complete' if matrix.complete else 'some palettes still missing'})")
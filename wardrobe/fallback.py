@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from chatbot.catalog_index import normalize_rows
+from chatbot.clip_utils import MODEL_NAME, encode_texts
+
+# Label -> CLIP prompt used when an upload has no close catalog match
+FALLBACK_ITEMS = {
+    # Western Dresses
+    "red dress": "a red dress",
+    "black dress": "a black dress",
+    "floral dress": "a floral print dress",
+    "summer dress": "a light summer dress",
+    "evening dress": "an elegant evening dress",
+    "casual dress": "a casual everyday dress",
+    
+    # Western Tops
+    "white t-shirt": "a white cotton t-shirt",
+    "black t-shirt": "a black cotton t-shirt", 
+    "blue shirt": "a blue shirt",
+    "striped shirt": "a blue and white striped shirt",
+    "blouse": "a feminine silk blouse",
+    "sweater": "a cozy knit sweater",
+    "tank top": "a simple tank top",
+    
+    # Western Bottoms
+    "blue jeans": "blue denim jeans",
+    "black jeans": "black denim jeans", 
+    "denim skirt": "a denim skirt",
+    "black skirt": "a black skirt",
+    "leggings": "black leggings",
+    "shorts": "denim shorts",
+    "wide leg pants": "wide leg trousers",
+    
+    # Western Shoes
+    "sneakers": "white athletic sneakers",
+    "high heels": "black high heel shoes",
+    "sandals": "leather sandals",
+    "boots": "ankle boots",
+    "flats": "ballet flats",
+    
+    # Western Outerwear
+    "jacket": "a denim jacket",
+    "blazer": "a formal blazer",
+    "coat": "a winter coat",
+    "cardigan": "a knit cardigan",
+    
+    # Indian Traditional - Kurtis & Tops
+    "red kurti": "a red Indian kurti",
+    "blue kurti": "a blue Indian kurti", 
+    "green kurti": "a green Indian kurti",
+    "yellow kurti": "a yellow Indian kurti",
+    "pink kurti": "a pink Indian kurti",
+    "printed kurti": "a printed Indian kurti",
+    "embroidered kurti": "an embroidered Indian kurti",
+    "anarkali kurti": "an anarkali style kurti",
+    "long kurti": "a long Indian kurti",
+    "short kurti": "a short Indian kurti",
+    "kurti": "an Indian kurti top",
+    
+    # Indian Traditional - Sarees
+    "silk saree": "a silk Indian saree",
+    "cotton saree": "a cotton Indian saree",
+    "banarasi saree": "a banarasi silk saree",
+    "kanjeevaram saree": "a kanjeevaram silk saree",
+    "printed saree": "a printed Indian saree",
+    "embroidered saree": "an embroidered Indian saree",
+    "georgette saree": "a georgette Indian saree",
+    "chiffon saree": "a chiffon Indian saree",
+    "saree": "an Indian saree",
+    
+    # Indian Traditional - Bottoms
+    "leggings": "black leggings",
+    "palazzo pants": "flowy palazzo pants",
+    "churidar": "a churidar bottom",
+    "dhoti pants": "dhoti style pants",
+    "salwar": "a salwar bottom",
+    "patiala": "a patiala salwar",
+    
+    # Indian Traditional - Dupattas & Accessories
+    "dupatta": "a matching dupatta",
+    "printed dupatta": "a printed dupatta",
+    "embroidered dupatta": "an embroidered dupatta",
+    "silver jewelry": "silver Indian jewelry",
+    "gold jewelry": "gold Indian jewelry",
+    
+    # Indian Footwear
+    "juttis": "traditional Indian juttis",
+    "mojaris": "traditional Indian mojaris",
+    "kolhapuris": "traditional Kolhapuri sandals",
+    "ethnic sandals": "ethnic Indian sandals"
+}
+
+
+class FallbackVocabulary:
+    """FALLBACK_ITEMS prompts compiled into one normalised text-embedding matrix"""
+
+    def __init__(self, labels, embeddings):
+        self.labels = labels
+        self.embeddings = embeddings
+
+    @staticmethod
+    def fingerprint(items):
+        """Changes whenever the prompts or the CLIP model change"""
+        payload = json.dumps([MODEL_NAME, sorted(items.items())])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def compile(cls, items):
+        labels = list(items)
+        return cls(labels, normalize_rows(encode_texts([items[label] for label in labels])))
+
+    @classmethod
+    def load_or_compile(cls, items, cache_dir):
+        """Reuse the on-disk matrix for these exact prompts, else encode and save it"""
+        path = os.path.join(cache_dir, f'fallback_vocab_{cls.fingerprint(items)}.npz')
+        try:
+            with np.load(path) as data:
+                labels = [str(label) for label in data['labels']]
+                if labels == list(items):
+                    return cls(labels, data['embeddings'])
+        except (OSError, KeyError, ValueError):
+            pass
+
+        vocabulary = cls.compile(items)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = path + '.tmp.npz'
+            np.savez(tmp_path, labels=np.asarray(vocabulary.labels), embeddings=vocabulary.embeddings)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not persist fallback vocabulary: {e}")
+        return vocabulary
+
+    def best_match(self, embedding):
+        """Return ``(label, similarity)`` of the closest prompt"""
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        similarities = self.embeddings @ query
+        best = int(similarities.argmax())
+        return self.labels[best], float(similarities[best])
+
+
+_vocabulary = None
+_vocabulary_lock = threading.Lock()
+
+
+def get_fallback_vocabulary():
+    """Return the process-wide fallback vocabulary, compiling it on first use"""
+    global _vocabulary
+    if _vocabulary is None:
+        with _vocabulary_lock:
+            if _vocabulary is None:
+                cache_dir = getattr(settings, 'FALLBACK_VOCAB_DIR', settings.CATALOG_INDEX_DIR)
+                _vocabulary = FallbackVocabulary.load_or_compile(FALLBACK_ITEMS, cache_dir)
+    return _vocabulary
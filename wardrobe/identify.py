@@ -0,0 +1,100 @@
+"""What an uploaded photo shows: its catalog description and wardrobe category.
+
+Used by the upload workers (``wardrobe.jobs``) once a photo's CLIP
+embedding and catalog matches are known.
+"""
+import time
+
+from chatbot.catalog_index import get_catalog_index
+from .fallback import get_fallback_vocabulary
+
+
+def identify_item(embedding, matches=None):
+    """Match against ALL items in fashion database for maximum accuracy
+
+    ``matches`` are catalog matches already found for this photo (e.g. by the image cache).
+    """
+    try:
+        if matches is None:
+            start_time = time.time()
+            matches = get_catalog_index().search(embedding, k=1)
+            processing_time = time.time() - start_time
+            print(f"✅ Database matching completed in {processing_time:.4f}s")
+
+        if not matches:
+            print("⚠️ Catalog is empty, using fallback")
+            return fallback_identify(embedding)
+
+        best_match = matches[0]['description']
+        best_similarity = matches[0]['similarity']
+        print(f"🎯 Best match: {best_match} (similarity: {best_similarity:.3f})")
+
+        # If similarity is decent, use database match
+        if best_similarity > 0.15:
+            return best_match
+        else:
+            print(f"⚠️ Low similarity ({best_similarity:.3f}), using fallback")
+            return fallback_identify(embedding)
+
+    except Exception as e:
+        print(f"❌ Database matching failed: {e}")
+        return fallback_identify(embedding)
+
+
+def fallback_identify(embedding):
+    """Improved fallback method with Indian and Western fashion items"""
+    best_match, best_similarity = get_fallback_vocabulary().best_match(embedding)
+    print(f"🎯 Fallback match: {best_match} (similarity: {best_similarity:.3f})")
+    return best_match
+
+
+def detect_category(description):
+    """Improved category detection with better priority for Indian clothing"""
+    description_lower = description.lower()
+
+    # Priority 1: Check for Indian traditional wear - Sarees (most specific)
+    saree_keywords = ['saree', 'sari', 'banarasi', 'kanjeevaram', 'georgette', 'chiffon']
+    if any(keyword in description_lower for keyword in saree_keywords):
+        return 'saree'
+
+    # Priority 2: Check for Indian traditional wear - Kurtis (before general tops)
+    kurti_keywords = ['kurti', 'kurta', 'anarkali', 'kurtis', 'kurtas']
+    if any(keyword in description_lower for keyword in kurti_keywords):
+        return 'kurti'
+
+    # Priority 3: Check for shoes/footwear 
+    shoe_keywords = ['shoe', 'sandal', 'heel', 'sneaker', 'boot', 'pump', 'loafer', 'flat', 'juttis', 'mojaris', 'kolhapuris']
+    if any(keyword in description_lower for keyword in shoe_keywords):
+        return 'shoes'
+
+    # Priority 4: Check for Indian traditional bottoms (before western bottoms)
+    indian_bottom_keywords = ['palazzo', 'churidar', 'dhoti', 'salwar', 'patiala', 'leggings']
+    if any(keyword in description_lower for keyword in indian_bottom_keywords):
+        return 'indian_bottom'
+
+    # Priority 5: Check for Western dresses
+    dress_keywords = ['dress', 'gown', 'jumpsuit', 'maxi', 'midi']
+    if any(keyword in description_lower for keyword in dress_keywords):
+        return 'dress'
+
+    # Priority 6: Check for dupattas
+    dupatta_keywords = ['dupatta', 'stole', 'scarf']
+    if any(keyword in description_lower for keyword in dupatta_keywords):
+        return 'dupatta'
+
+    # Priority 7: Check for Western bottoms
+    bottom_keywords = ['pant', 'jean', 'trouser', 'short', 'jogger', 'skirt']
+    if any(keyword in description_lower for keyword in bottom_keywords):
+        return 'bottom'
+
+    # Priority 8: Check for Western tops (last to avoid catching kurtis)
+    top_keywords = ['shirt', 'top', 'blouse', 't-shirt', 'tank', 'crop top', 'sweater', 'hoodie', 'blazer', 'jacket', 'cardigan']
+    if any(keyword in description_lower for keyword in top_keywords):
+        return 'top'
+
+    # Priority 9: Check for Indian jewelry and accessories
+    jewelry_keywords = ['jewelry', 'jewellery', 'necklace', 'earring', 'bangle', 'bracelet']
+    if any(keyword in description_lower for keyword in jewelry_keywords):
+        return 'accessories'
+
+    return 'accessories'
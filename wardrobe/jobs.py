@@ -0,0 +1,200 @@
+"""Background processing of wardrobe uploads, with the database as the queue.
+
+An upload is saved straight away as a ``processing`` item; the items
+themselves are the queue. A worker claims a batch of the oldest unclaimed
+ones (``SELECT ... FOR UPDATE SKIP LOCKED`` where the database supports
+it, a conditional UPDATE either way), then CLIP-encodes, identifies and
+categorises them outside any transaction. A claim older than
+settings.UPLOAD_JOB_TIMEOUT belongs to a dead worker and is retried,
+until an item has been tried settings.UPLOAD_JOB_MAX_ATTEMPTS times.
+
+Workers run as threads of the web process (``start_workers``, after an
+upload commits) and/or as ``manage.py process_uploads``; both can share
+one queue, and no broker is needed.
+"""
+import threading
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from chatbot.attributes import derive_attributes
+from chatbot.clip_utils import load_image
+from chatbot.image_cache import image_digest, match_images
+from chatbot.thumbnails import make_thumbnails
+from .identify import detect_category, identify_item
+from .models import WardrobeItem
+from .outfit_cache import record_wardrobe_change
+
+# Photos per claim, CLIP-encoded in one batch
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_TIMEOUT = 10 * 60
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_WORKER_THREADS = 2
+
+
+def get_max_attempts():
+    return getattr(settings, 'UPLOAD_JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+
+
+def stale_before(now):
+    return now - timedelta(seconds=getattr(settings, 'UPLOAD_JOB_TIMEOUT', DEFAULT_TIMEOUT))
+
+
+def claimable(now):
+    """Processing items no live worker holds"""
+    return WardrobeItem.objects.filter(
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale_before(now)),
+        status=WardrobeItem.PROCESSING,
+        attempts__lt=get_max_attempts(),
+    )
+
+
+def fail(items, error):
+    """Mark ``items`` failed, unless they were deleted or finished meanwhile"""
+    WardrobeItem.objects.filter(id__in=[item.id for item in items], status=WardrobeItem.PROCESSING).update(
+        status=WardrobeItem.FAILED, error=error[:255], updated_at=timezone.now()
+    )
+
+
+def retry_or_fail(items, error):
+    """Give ``items`` back to the queue, failing those out of attempts"""
+    retry = [item for item in items if item.attempts < get_max_attempts()]
+    fail([item for item in items if item.attempts >= get_max_attempts()], error)
+    WardrobeItem.objects.filter(id__in=[item.id for item in retry], status=WardrobeItem.PROCESSING).update(claimed_at=None)
+
+
+def claim_batch(batch_size=None):
+    """Claim up to ``batch_size`` queued items for this worker; returns them"""
+    now = timezone.now()
+    # Items whose last attempt died with its worker
+    WardrobeItem.objects.filter(
+        status=WardrobeItem.PROCESSING, attempts__gte=get_max_attempts(), claimed_at__lt=stale_before(now)
+    ).update(status=WardrobeItem.FAILED, error='Processing was interrupted too many times', updated_at=now)
+
+    # Without row locks (SQLite) a transaction only adds lock upgrade failures
+    locking = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic() if locking else nullcontext():
+        pending = claimable(now).order_by('id')
+        if locking:
+            pending = pending.select_for_update(skip_locked=True)
+        ids = list(pending.values_list('id', flat=True)[:batch_size or DEFAULT_BATCH_SIZE])
+        if not ids:
+            return []
+        # The conditional update is what makes the claim exclusive without row locks
+        claimable(now).filter(id__in=ids).update(claimed_at=now, attempts=F('attempts') + 1)
+    return list(WardrobeItem.objects.filter(id__in=ids, claimed_at=now, status=WardrobeItem.PROCESSING))
+
+
+def process_batch(items):
+    """Embed, identify and categorise claimed ``items``; returns how many became ready"""
+    decoded_images = []
+    digests = []
+    loaded = []
+    for item in items:
+        try:
+            with item.image.storage.open(item.image.name) as f:
+                digests.append(image_digest(f))
+                decoded_images.append(load_image(f))
+            loaded.append(item)
+        except Exception as e:
+            print(f"❌ Could not read {item.image.name}: {e}")
+            fail([item], f"Could not read the photo: {e}")
+    if not loaded:
+        return 0
+
+    try:
+        results = match_images(decoded_images, digests)
+        print(f"🎯 CLIP encoding successful for {len(loaded)} images")
+    except Exception as e:
+        print(f"❌ CLIP encoding failed: {e}")
+        retry_or_fail(loaded, f"CLIP encoding failed: {e}")
+        return 0
+
+    ready = defaultdict(list)
+    for item, decoded_image, (embedding, matches) in zip(loaded, decoded_images, results):
+        try:
+            description = identify_item(embedding, matches)
+            category = detect_category(description)
+            print(f"🎯 Identified: {description} → {category}")
+            # Reuses the decoded photo, so no second decode
+            thumbnails = make_thumbnails(decoded_image, item.image.name, item.image.storage)
+
+            # update() rather than save(), so an item deleted meanwhile is not written back
+            updated = WardrobeItem.objects.filter(id=item.id, status=WardrobeItem.PROCESSING).update(
+                description=description,
+                category=category,
+                embedding=embedding,
+                status=WardrobeItem.READY,
+                error='',
+                thumbnails=thumbnails or [],
+                updated_at=timezone.now(),
+                **derive_attributes(description, category),
+            )
+            if updated:
+                item.category = category
+                ready[item.user_id].append(item)
+                print(f"✅ Successfully saved: {description}")
+        except Exception as e:
+            print(f"❌ Failed to process {item.image.name}: {e}")
+            retry_or_fail([item], str(e))
+
+    # Cached outfits pick up the new items incrementally
+    for user_id, user_items in ready.items():
+        record_wardrobe_change(user_id, 'add', user_items)
+    return sum(len(user_items) for user_items in ready.values())
+
+
+def drain(batch_size=None):
+    """Process batches until the queue is empty; returns how many items were handled"""
+    handled = 0
+    while True:
+        items = claim_batch(batch_size)
+        if not items:
+            return handled
+        process_batch(items)
+        handled += len(items)
+
+
+_workers = set()
+_workers_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+def start_workers():
+    """Have settings.UPLOAD_WORKER_THREADS threads of this process drain the queue.
+
+    Threads exit once the queue is empty; a call racing that exit is not
+    lost, because a thread only exits if nothing woke it during its last drain.
+    """
+    wanted = getattr(settings, 'UPLOAD_WORKER_THREADS', DEFAULT_WORKER_THREADS)
+    with _workers_lock:
+        _wakeup.set()
+        for _ in range(wanted - len(_workers)):
+            thread = threading.Thread(target=run_worker, name='wardrobe-upload-worker', daemon=True)
+            _workers.add(thread)
+            thread.start()
+
+
+def run_worker():
+    current = threading.current_thread()
+    try:
+        while True:
+            _wakeup.clear()
+            try:
+                drain()
+            except Exception as e:
+                print(f"❌ Upload worker stopped: {e}")
+                break
+            with _workers_lock:
+                if not _wakeup.is_set():
+                    _workers.discard(current)
+                    return
+        with _workers_lock:
+            _workers.discard(current)
+    finally:
+        connection.close()
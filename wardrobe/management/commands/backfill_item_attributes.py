@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from chatbot.models import ClothingItem
+from chatbot.attributes import ATTRIBUTE_FIELDS, set_attributes
+from wardrobe.models import WardrobeItem
+
+class Command(BaseCommand):
+    help = 'Derives colour, pattern, formality and footwear style for wardrobe and catalog items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', nargs='+', choices=['wardrobe', 'catalog'], default=['wardrobe', 'catalog'],
+                            help='Which tables to backfill')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows read and updated per batch')
+        parser.add_argument('--force', action='store_true',
+                            help='Recompute every row, not only rows without attributes')
+
+    def handle(self, *args, **options):
+        if 'wardrobe' in options['models']:
+            self.backfill(WardrobeItem, ['id', 'description', 'category'], options, use_category=True)
+        if 'catalog' in options['models']:
+            self.backfill(ClothingItem, ['id', 'description'], options, use_category=False)
+
+    def backfill(self, model, fields, options, use_category):
+        queryset = model.objects.all() if options['force'] else model.objects.filter(color='')
+        total = queryset.count()
+        self.stdout.write(f"🏷️ {total} {model.__name__} rows to update")
+
+        done = 0
+        last_id = 0
+        start_time = time.time()
+        while True:
+            items = list(queryset.filter(id__gt=last_id).order_by('id').only(*fields)[:options['batch_size']])
+            if not items:
+                break
+            last_id = items[-1].id
+            for item in items:
+                set_attributes(item, item.category if use_category else None)
+            with transaction.atomic():
+                model.objects.bulk_update(items, ATTRIBUTE_FIELDS, batch_size=500)
+            done += len(items)
+            elapsed = time.time() - start_time
+            self.stdout.write(f"[{done}/{total}] {model.__name__} ({done / elapsed if elapsed else 0:.0f} rows/s)")
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {model.__name__}: {done} rows updated'))
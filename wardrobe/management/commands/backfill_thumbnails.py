@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from chatbot.models import ClothingItem
+from chatbot.thumbnails import make_thumbnails
+from wardrobe.models import WardrobeItem
+
+class Command(BaseCommand):
+    help = 'Makes the WebP/JPEG thumbnails of wardrobe and catalog photos that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', nargs='+', choices=['wardrobe', 'catalog'], default=['wardrobe', 'catalog'],
+                            help='Which tables to backfill')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows read per batch')
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Threads decoding and encoding photos')
+        parser.add_argument('--force', action='store_true',
+                            help='Remake thumbnails that already exist (e.g. after changing THUMBNAIL_SIZES)')
+
+    def handle(self, *args, **options):
+        if 'wardrobe' in options['models']:
+            self.backfill(WardrobeItem, options, record=True)
+        if 'catalog' in options['models']:
+            # Catalog photos are never shown through srcsets, so nothing is recorded
+            self.backfill(ClothingItem, options)
+
+    def backfill(self, model, options, record=False):
+        queryset = model.objects.exclude(image='')
+        storage = model._meta.get_field('image').storage
+        total = queryset.count()
+        self.stdout.write(f"🖼️ {total} {model.__name__} photos to check")
+
+        def thumbnail(image_name):
+            try:
+                with storage.open(image_name) as f:
+                    return make_thumbnails(f, image_name, storage, overwrite=options['force'])
+            except OSError as e:
+                print(f"⚠️ Could not open {image_name}: {e}")
+                return None
+
+        done = failed = 0
+        last_id = 0
+        start_time = time.time()
+        with ThreadPoolExecutor(max(1, options['threads'])) as pool:
+            while True:
+                rows = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', 'image')[:options['batch_size']])
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                results = list(pool.map(thumbnail, [image_name for _, image_name in rows]))
+                if record:
+                    for (item_id, _), thumbnails in zip(rows, results):
+                        if thumbnails is not None:
+                            model.objects.filter(id=item_id).update(thumbnails=thumbnails)
+                failed += results.count(None)
+                done += len(results) - results.count(None)
+                elapsed = time.time() - start_time
+                self.stdout.write(f"[{done + failed}/{total}] {model.__name__} ({(done + failed) / elapsed if elapsed else 0:.0f} photos/s)")
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {model.__name__}: {done} photos have thumbnails, {failed} failed'))
@@ -0,0 +1,58 @@
+import threading
+from django.core.management.base import BaseCommand
+from django.db import connection
+from wardrobe.jobs import DEFAULT_BATCH_SIZE, claim_batch, process_batch
+
+class Command(BaseCommand):
+    help = 'Runs a pool of workers identifying queued wardrobe uploads (alongside or instead of the web process threads)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2,
+                            help='Worker threads, each claiming its own batches')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Photos claimed and CLIP-encoded together')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds an idle worker waits before checking the queue again')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of waiting for more uploads')
+
+    def handle(self, *args, **options):
+        self.processed = 0
+        self.lock = threading.Lock()
+        stop = threading.Event()
+        workers = [
+            threading.Thread(target=self.work, args=(options, stop), name=f'process-uploads-{i}', daemon=True)
+            for i in range(max(1, options['threads']))
+        ]
+        self.stdout.write(f"🎯 Processing wardrobe uploads with {len(workers)} workers")
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(0.5)
+        except KeyboardInterrupt:
+            # Batches being processed are claimed, and retried after UPLOAD_JOB_TIMEOUT
+            stop.set()
+        self.stdout.write(self.style.SUCCESS(f'✅ {self.processed} uploads processed'))
+
+    def work(self, options, stop):
+        try:
+            while not stop.is_set():
+                try:
+                    items = claim_batch(options['batch_size'])
+                except Exception as e:
+                    self.stderr.write(f"❌ Could not claim uploads: {e}")
+                    stop.wait(options['poll_interval'])
+                    continue
+                if not items:
+                    if options['once']:
+                        return
+                    stop.wait(options['poll_interval'])
+                    continue
+                ready = process_batch(items)
+                with self.lock:
+                    self.processed += len(items)
+                    self.stdout.write(f"[{self.processed}] {ready} of {len(items)} uploads ready")
+        finally:
+            connection.close()
@@ -0,0 +1,43 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from wardrobe.colors import DEFAULT_PALETTE_TTL, PALETTE_CACHE_PREFIX, fetch_palette, get_palette_cache, palette_colors
+
+class Command(BaseCommand):
+    help = 'Fetches a ColorMind palette for every wardrobe colour into the shared palette cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--colors', nargs='+', default=None,
+                            help='Only warm these colour names (default: the whole colour vocabulary)')
+        parser.add_argument('--force', action='store_true',
+                            help='Refetch palettes that are already cached')
+        parser.add_argument('--delay', type=float, default=0.5,
+                            help='Seconds to wait between ColorMind requests')
+
+    def handle(self, *args, **options):
+        cache = get_palette_cache()
+        ttl = getattr(settings, 'COLORMIND_PALETTE_TTL', DEFAULT_PALETTE_TTL)
+        colors = options['colors'] or palette_colors()
+
+        fetched = skipped = failed = 0
+        for color in colors:
+            key = PALETTE_CACHE_PREFIX + color
+            if not options['force'] and cache.get(key) is not None:
+                skipped += 1
+                continue
+
+            if fetched or failed:
+                time.sleep(options['delay'])
+            palette = fetch_palette(color)
+            if palette is None:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"Could not fetch a palette for {color}"))
+                continue
+            cache.set(key, palette, ttl)
+            fetched += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Palette cache warm: {fetched} fetched, {skipped} already cached, {failed} failed"
+        ))
+        if failed:
+            self.stdout.write("ℹ️ Run the command again to retry the failed colours")
@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+from django.db import migrations, models
+
+import chatbot.fields
+
+
+BATCH_SIZE = 500
+
+
+def json_to_binary(apps, schema_editor):
+    WardrobeItem = apps.get_model('wardrobe', 'WardrobeItem')
+    batch = []
+    for item in WardrobeItem.objects.only('id', 'embedding').iterator(chunk_size=BATCH_SIZE):
+        try:
+            vector = np.asarray(json.loads(item.embedding), dtype='<f4').ravel()
+        except (TypeError, ValueError):
+            vector = np.zeros(0, dtype='<f4')
+        item.embedding_bin = vector
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            WardrobeItem.objects.bulk_update(batch, ['embedding_bin'])
+            batch = []
+    if batch:
+        WardrobeItem.objects.bulk_update(batch, ['embedding_bin'])
+
+
+def binary_to_json(apps, schema_editor):
+    WardrobeItem = apps.get_model('wardrobe', 'WardrobeItem')
+    batch = []
+    for item in WardrobeItem.objects.only('id', 'embedding_bin').iterator(chunk_size=BATCH_SIZE):
+        item.embedding = json.dumps([item.embedding_bin.tolist()])
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            WardrobeItem.objects.bulk_update(batch, ['embedding'])
+            batch = []
+    if batch:
+        WardrobeItem.objects.bulk_update(batch, ['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='embedding_bin',
+            field=chatbot.fields.EmbeddingField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='wardrobeitem',
+            name='embedding',
+            field=models.TextField(null=True),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+        migrations.RemoveField(
+            model_name='wardrobeitem',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='wardrobeitem',
+            old_name='embedding_bin',
+            new_name='embedding',
+        ),
+        migrations.AlterField(
+            model_name='wardrobeitem',
+            name='embedding',
+            field=chatbot.fields.EmbeddingField(),
+        ),
+    ]
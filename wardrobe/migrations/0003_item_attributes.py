@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0002_binary_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='color',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='footwear_style',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='formality',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='pattern',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:41
+
+import chatbot.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0004_wardrobeitem_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='error',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='ready', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='wardrobeitem',
+            name='embedding',
+            field=chatbot.fields.EmbeddingField(null=True),
+        ),
+    ]
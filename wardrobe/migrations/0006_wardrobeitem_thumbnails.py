@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0005_upload_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
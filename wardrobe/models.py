@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
-import json
+from chatbot.fields import EmbeddingField
+from chatbot.attributes import set_attributes
 
 class WardrobeItem(models.Model):
     CATEGORY_CHOICES = [
@@ -10,13 +11,41 @@ class WardrobeItem(models.Model):
         ('shoes', 'Shoes'),
         ('accessories', 'Accessories'),
     ]
+    PROCESSING = 'processing'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PROCESSING, 'Processing'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     image = models.ImageField(upload_to='wardrobe/')
     description = models.CharField(max_length=255)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
-    embedding = models.TextField()  # CLIP embedding stored as JSON
+    embedding = EmbeddingField(null=True)  # float32 CLIP embedding, None until processed
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # drives list deltas and ETags
+    
+    # Derived from the description when the item is created (see chatbot.attributes)
+    color = models.CharField(max_length=20, blank=True, default='', db_index=True)
+    pattern = models.CharField(max_length=20, blank=True, default='', db_index=True)
+    formality = models.CharField(max_length=20, blank=True, default='', db_index=True)
+    footwear_style = models.CharField(max_length=20, blank=True, default='', db_index=True)
+    
+    # Uploads are saved as 'processing' and identified by a worker (see wardrobe.jobs)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=READY, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True, default='')
+    # [size, width] of each thumbnail made (see chatbot.thumbnails)
+    thumbnails = models.JSONField(default=list, blank=True)
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.description and not self.color:
+            set_attributes(self, self.category)
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.user.username}'s {self.description}"
\ No newline at end of file
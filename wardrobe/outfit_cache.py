@@ -0,0 +1,184 @@
+"""Per-user cache of generated outfits, kept current incrementally.
+
+Every upload or delete bumps the user's wardrobe version and records what
+changed under that version. A cached ranking from an older version is
+brought up to date by rescoring only the outfits that touch the changed
+items; it falls back to a full ranking when the change log is incomplete
+or the cached ranking runs too thin.
+
+A ranking holds the best ``OUTFIT_CACHE_DEPTH`` outfits plus a threshold
+no uncached outfit scores above, which is what makes the update exact:
+adding an item can only raise scores (and every raised outfit touches
+it), deleting one can only lower them.
+"""
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+from .outfits import Outfit
+
+OUTFIT_CACHE_PREFIX = 'outfits:'
+DEFAULT_DEPTH = 50
+DEFAULT_TTL = 24 * 60 * 60
+# Changes replayed onto a cached ranking at most; past this a full ranking is
+# cheaper, and a reseeded version counter (see get_wardrobe_version) opens a
+# gap of millions that must not be read key by key
+DEFAULT_MAX_REPLAY = 100
+# Outfits whose items' categories decide validity for others (the western
+# pants fallback for kurtis) are re-ranked from scratch
+FULL_RERANK_CATEGORIES = {'indian_bottom'}
+
+
+def get_outfit_cache():
+    """The shared cache outfits live in (settings.OUTFIT_CACHE_ALIAS)"""
+    alias = getattr(settings, 'OUTFIT_CACHE_ALIAS', 'default')
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def version_key(user_id):
+    return f'{OUTFIT_CACHE_PREFIX}{user_id}:version'
+
+
+def change_key(user_id, version):
+    return f'{OUTFIT_CACHE_PREFIX}{user_id}:change:{version}'
+
+
+def get_wardrobe_version(user_id):
+    cache = get_outfit_cache()
+    # Versions start from the clock so an evicted counter never repeats an old version
+    cache.add(version_key(user_id), int(time.time() * 1000), None)
+    return cache.get(version_key(user_id))
+
+
+def record_wardrobe_change(user_id, op, items):
+    """Bump the user's wardrobe version after ``op`` ('add' or 'delete') of ``items``"""
+    cache = get_outfit_cache()
+    ttl = getattr(settings, 'OUTFIT_CACHE_TTL', DEFAULT_TTL)
+    change = (op, [(item.id, item.category) for item in items])
+    get_wardrobe_version(user_id)
+    while True:
+        try:
+            version = cache.incr(version_key(user_id))
+        except ValueError:
+            cache.add(version_key(user_id), int(time.time() * 1000), None)
+            continue
+        # add() refuses a version a concurrent change already claimed
+        if cache.add(change_key(user_id, version), change, ttl):
+            return version
+
+
+class OutfitCache:
+    """Cached outfits for one (user, selected item) at the current wardrobe version"""
+
+    def __init__(self, user_id, selected_item_id=None):
+        self.cache = get_outfit_cache()
+        self.user_id = user_id
+        self.selected_item_id = selected_item_id
+        self.key = f'{OUTFIT_CACHE_PREFIX}{user_id}:{selected_item_id or "all"}'
+        # Read before the wardrobe is fetched, so a change racing the fetch is replayed next time
+        self.version = get_wardrobe_version(user_id)
+        self.state = self.cache.get(self.key)
+        self.entries = None
+        self.threshold = -np.inf
+
+    def get(self):
+        """The rendered response if it was cached for the current version, else None"""
+        if self.state and self.state['version'] == self.version:
+            return self.state.get('payload')
+        return None
+
+    def rank(self, engine, selected_item=None, k=10):
+        """Top-k outfits, updated incrementally from a stale ranking where possible"""
+        depth = max(k, getattr(settings, 'OUTFIT_CACHE_DEPTH', DEFAULT_DEPTH))
+        outfits = None
+        if selected_item is None and self.state:
+            outfits = self.update(engine, depth, k)
+            if outfits is not None:
+                print(f"♻️ Outfits updated incrementally to wardrobe version {self.version}")
+        if outfits is None:
+            outfits, self.threshold = engine.rank(depth, selected_item)
+        self.entries = outfits
+        return outfits[:k]
+
+    def changes_since(self, version):
+        """Changes after ``version`` in order, or None if they are not all logged"""
+        max_replay = getattr(settings, 'OUTFIT_CACHE_MAX_REPLAY', DEFAULT_MAX_REPLAY)
+        if not 0 <= self.version - version <= max_replay:
+            return None
+        keys = [change_key(self.user_id, v) for v in range(version + 1, self.version + 1)]
+        changes = self.cache.get_many(keys)
+        if len(changes) != len(keys):
+            return None
+        return [changes[key] for key in keys]
+
+    def update(self, engine, depth, k):
+        """Replay the change log onto the cached ranking; None if a full ranking is needed"""
+        changes = self.changes_since(self.state['version'])
+        if changes is None:
+            return None
+        if any(category in FULL_RERANK_CATEGORIES for _, changed in changes for _, category in changed):
+            return None
+
+        items = {item.id: item for partition in engine.partitions.values() for item in partition.items}
+        entries = {}
+        for outfit_type, item_ids, score, core_size in self.state['entries']:
+            if any(item_id not in items for item_id in item_ids[:core_size]):
+                continue
+            pieces = tuple(items.get(item_id) for item_id in item_ids)
+            entries[(outfit_type,) + tuple(item_ids[:core_size])] = (outfit_type, pieces, score, core_size)
+        threshold = self.state['threshold']
+
+        for op, changed in changes:
+            for item_id, _ in changed:
+                if op == 'delete':
+                    for key, (outfit_type, pieces, score, core_size) in list(entries.items()):
+                        if item_id in key[1:]:
+                            del entries[key]
+                        elif any(item is None or item.id == item_id for item in pieces):
+                            # Only an optional slot changed: re-pick it for this core
+                            outfit = engine.rescore(engine_outfit(outfit_type, pieces, score, core_size))
+                            if outfit is None:
+                                del entries[key]
+                            else:
+                                entries[key] = (outfit.type, outfit.items, outfit.score, len(outfit.core))
+                elif item_id in items:
+                    touching, touching_threshold = engine.rank(depth, items[item_id])
+                    threshold = max(threshold, touching_threshold)
+                    for outfit in touching:
+                        key = (outfit.type,) + tuple(item.id for item in outfit.core)
+                        if key not in entries or entries[key][2] < outfit.score:
+                            entries[key] = (outfit.type, outfit.items, outfit.score, len(outfit.core))
+
+        ranked = sorted(entries.values(), key=lambda entry: -entry[2])
+        ranked = [entry for entry in ranked if entry[2] >= threshold]
+        if len(ranked) > depth:
+            threshold = max(threshold, ranked[depth][2])
+            ranked = ranked[:depth]
+        if len(ranked) < k and threshold > -np.inf:
+            return None
+
+        self.threshold = threshold
+        return [engine_outfit(*entry) for entry in ranked]
+
+    def put(self, payload):
+        """Store the ranking behind ``payload`` (the rendered response) for this version"""
+        ttl = getattr(settings, 'OUTFIT_CACHE_TTL', DEFAULT_TTL)
+        self.cache.set(self.key, {
+            'version': self.version,
+            'payload': payload,
+            'entries': [
+                (outfit.type, [item.id for item in outfit.items], outfit.score, len(outfit.core))
+                for outfit in self.entries or []
+            ],
+            'threshold': self.threshold,
+        }, ttl)
+
+
+def engine_outfit(outfit_type, pieces, score, core_size):
+    return Outfit(outfit_type, tuple(pieces), score, tuple(pieces[:core_size]))
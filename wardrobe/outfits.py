@@ -0,0 +1,369 @@
+"""Exhaustive outfit scoring over a whole wardrobe.
+
+Each category becomes a partition of parallel arrays (colour ids and
+normalised embeddings), so scoring every top x bottom x shoe (or kurti x
+pants x dupatta x shoe, ...) combination is a handful of broadcast lookups
+into the colour matrix instead of nested loops over truncated lists.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from chatbot.attributes import FOOTWEAR_KEYWORDS
+from .colors import extract_color, get_color_matrix
+
+# Weight of CLIP embedding similarity next to the 0..1 colour score of a pair
+EMBEDDING_WEIGHT = 0.1
+# Shoe colours that go with anything
+NEUTRAL_SHOE_COLORS = ['black', 'white', 'brown', 'nude']
+INDIAN_FOOTWEAR_KEYWORDS = FOOTWEAR_KEYWORDS['indian']
+SKIRT_KEYWORDS = ['skirt', 'ghagra', 'lehenga', 'gown', 'dress']
+# Cells of the top x bottom x shoe array scored at once; larger wardrobes
+# are scored a block of tops at a time to keep memory flat
+MAX_BROADCAST_CELLS = 2_000_000
+
+# Outfit type reported when generating around a selected item of this category
+SELECTED_TYPES = {'indian_bottom': 'bottom'}
+
+# ``core`` is the leading items that identify an outfit; the rest fill
+# optional slots (shoes, dupatta, blouse) with the best valid choice
+Outfit = namedtuple('Outfit', ['type', 'items', 'score', 'core'])
+
+
+def label_selected(outfits, selected):
+    """Report outfits generated around ``selected`` under its own type"""
+    if selected is None:
+        return outfits
+    outfit_type = f"selected_{SELECTED_TYPES.get(selected.category, selected.category)}_outfit"
+    return [outfit._replace(type=outfit_type) for outfit in outfits]
+
+
+def is_indian_footwear(description):
+    """Check if footwear is Indian style"""
+    return any(keyword in description.lower() for keyword in INDIAN_FOOTWEAR_KEYWORDS)
+
+
+def item_color(item):
+    # Stored at creation; rows not yet backfilled fall back to the description
+    return getattr(item, 'color', '') or extract_color(item.description)
+
+
+def item_is_indian_footwear(item):
+    footwear_style = getattr(item, 'footwear_style', '')
+    if footwear_style:
+        return footwear_style == 'indian'
+    return is_indian_footwear(item.description)
+
+
+def is_skirt(description, keywords=SKIRT_KEYWORDS):
+    return any(skirt_word in description.lower() for skirt_word in keywords)
+
+
+class Partition:
+    """The wardrobe items of one category as parallel arrays"""
+
+    def __init__(self, items, color_ids, embeddings):
+        self.items = items
+        self.color_ids = color_ids
+        self.embeddings = embeddings
+
+    @classmethod
+    def from_items(cls, items, matrix, dim):
+        items = list(items)
+        color_ids = matrix.color_ids([item_color(item) for item in items])
+        embeddings = np.zeros((len(items), dim), dtype=np.float32)
+        for row, item in enumerate(items):
+            embedding = item.embedding
+            if embedding is not None and embedding.size == dim:
+                norm = np.linalg.norm(embedding)
+                if norm:
+                    embeddings[row] = embedding / norm
+        return cls(items, color_ids, embeddings)
+
+    def __len__(self):
+        return len(self.items)
+
+    def subset(self, mask):
+        rows = np.flatnonzero(mask)
+        return Partition([self.items[row] for row in rows], self.color_ids[rows], self.embeddings[rows])
+
+    def where(self, predicate):
+        return self.subset(np.array([bool(predicate(item)) for item in self.items], dtype=bool))
+
+    def concat(self, other):
+        return Partition(
+            self.items + other.items,
+            np.concatenate([self.color_ids, other.color_ids]),
+            np.vstack([self.embeddings, other.embeddings]),
+        )
+
+
+class OutfitEngine:
+    """Scores every valid outfit in a wardrobe and returns the global top-k.
+
+    An outfit's score is the mean over its colour links (e.g. top-bottom,
+    top-shoe, bottom-shoe) of the colour-matrix score plus a small CLIP
+    embedding similarity term; optional slots that cannot be filled count
+    as zero, so complete outfits rank first.
+    """
+
+    def __init__(self, items, matrix=None):
+        self.matrix = matrix or get_color_matrix()
+        items = list(items)
+        dims = [item.embedding.size for item in items if item.embedding is not None and item.embedding.size]
+        self.dim = max(set(dims), key=dims.count) if dims else 1
+
+        self.partitions = {}
+        for item in items:
+            self.partitions.setdefault(item.category, []).append(item)
+        self.partitions = {
+            category: Partition.from_items(category_items, self.matrix, self.dim)
+            for category, category_items in self.partitions.items()
+        }
+        shoes = self.get('shoes')
+        self.neutral_shoe_ids = self.matrix.known_ids(NEUTRAL_SHOE_COLORS)
+        self.indian_shoes = shoes.where(item_is_indian_footwear)
+
+    def get(self, category):
+        return self.partitions.get(category) or self.empty()
+
+    def empty(self):
+        return Partition([], np.zeros(0, dtype=np.int64), np.zeros((0, self.dim), dtype=np.float32))
+
+    def single(self, item):
+        return Partition.from_items([item], self.matrix, self.dim)
+
+    # Pairwise building blocks, all (len(a), len(b)) arrays
+
+    def link_scores(self, a, b):
+        colour = self.matrix.score[a.color_ids[:, None], b.color_ids[None, :]]
+        return colour + EMBEDDING_WEIGHT * (a.embeddings @ b.embeddings.T)
+
+    def compatible(self, a, b):
+        return self.matrix.compatible[a.color_ids[:, None], b.color_ids[None, :]]
+
+    def matches(self, a, b):
+        """Highly compatible, or at least a basic colour match"""
+        return self.compatible(a, b) | self.matrix.match[a.color_ids[:, None], b.color_ids[None, :]]
+
+    def complements(self, a, b):
+        """Highly compatible or a beautiful contrast (dupattas, blouses)"""
+        return self.compatible(a, b) | self.matrix.contrast[a.color_ids[:, None], b.color_ids[None, :]]
+
+    def shoe_ok(self, a, shoes):
+        return self.compatible(a, shoes) | np.isin(shoes.color_ids, self.neutral_shoe_ids)[None, :]
+
+    @staticmethod
+    def best(scores, valid):
+        """Best valid option along the last axis: ``(index, score)``, score -inf when none"""
+        masked = np.where(valid, scores, -np.inf)
+        if masked.shape[-1] == 0:
+            return np.zeros(masked.shape[:-1], dtype=np.int64), np.full(masked.shape[:-1], -np.inf)
+        index = masked.argmax(axis=-1)
+        return index, np.take_along_axis(masked, index[..., None], axis=-1)[..., 0]
+
+    # Templates: each returns ``(scores, make)`` for its valid outfits, where
+    # ``make(i)`` builds candidate ``i`` as ``(type, items, core size)`` only when needed
+
+    def dress_outfits(self, dresses, shoes):
+        valid = self.shoe_ok(dresses, shoes)
+        scores = self.link_scores(dresses, shoes)
+        rows, cols = np.nonzero(valid)
+
+        def make(n):
+            return 'western_dress_outfit', (dresses.items[rows[n]], shoes.items[cols[n]]), 2
+        return scores[rows, cols], make
+
+    def top_bottom_outfits(self, tops, bottoms, shoes, require_shoe=False):
+        pair_valid = self.matches(tops, bottoms)
+        pair_scores = self.link_scores(tops, bottoms)
+
+        shoe_index, shoe_best = self.best_shoes(tops, bottoms, shoes)
+        has_shoe = np.isfinite(shoe_best)
+
+        # Without a shoe the pair itself must be highly compatible
+        valid = pair_valid & (has_shoe if require_shoe else has_shoe | self.compatible(tops, bottoms))
+        scores = (pair_scores + np.where(has_shoe, shoe_best, 0.0)) / 3
+
+        rows, cols = np.nonzero(valid)
+
+        def make(n):
+            i, j = rows[n], cols[n]
+            pieces = (tops.items[i], bottoms.items[j])
+            if has_shoe[i, j]:
+                pieces += (shoes.items[shoe_index[i, j]],)
+            return 'western_top_bottom_outfit', pieces, 2
+        return scores[rows, cols], make
+
+    def best_shoes(self, tops, bottoms, shoes):
+        """Best shoe per (top, bottom) pair: ``(index, score)`` arrays, score -inf when none"""
+        shoe_index = np.zeros((len(tops), len(bottoms)), dtype=np.int64)
+        shoe_best = np.full((len(tops), len(bottoms)), -np.inf)
+        top_valid, top_scores = self.compatible(tops, shoes), self.link_scores(tops, shoes)
+        bottom_valid, bottom_scores = self.compatible(bottoms, shoes)[None], self.link_scores(bottoms, shoes)[None]
+        neutral = np.isin(shoes.color_ids, self.neutral_shoe_ids)[None, None, :]
+
+        # (tops, bottoms, shoes): the shoe has to suit both pieces, or be neutral
+        step = max(1, MAX_BROADCAST_CELLS // max(1, len(bottoms) * len(shoes)))
+        for start in range(0, len(tops), step):
+            block = slice(start, start + step)
+            valid = (top_valid[block, None, :] & bottom_valid) | neutral
+            scores = top_scores[block, None, :] + bottom_scores
+            shoe_index[block], shoe_best[block] = self.best(scores, valid)
+        return shoe_index, shoe_best
+
+    def kurti_outfits(self, kurtis, indian_pants, western_pants, dupattas, shoes, require=()):
+        # Western pants are only a fallback for kurtis no Indian pants go with
+        indian_valid = self.matches(kurtis, indian_pants)
+        western_valid = self.matches(kurtis, western_pants) & ~indian_valid.any(axis=1, keepdims=True)
+        pants = indian_pants.concat(western_pants)
+        pants_valid = np.hstack([indian_valid, western_valid])
+        pants_scores = self.link_scores(kurtis, pants)
+
+        dupatta_index, dupatta_best = self.best(self.link_scores(kurtis, dupattas), self.complements(kurtis, dupattas))
+        shoe_index, shoe_best = self.best(self.link_scores(kurtis, shoes), self.shoe_ok(kurtis, shoes))
+        has_dupatta, has_shoe = np.isfinite(dupatta_best), np.isfinite(shoe_best)
+
+        kurti_valid = np.ones(len(kurtis), dtype=bool)
+        if 'dupatta' in require:
+            kurti_valid &= has_dupatta
+        if 'shoes' in require:
+            kurti_valid &= has_shoe
+        valid = pants_valid & kurti_valid[:, None]
+        extras = np.where(has_dupatta, dupatta_best, 0.0) + np.where(has_shoe, shoe_best, 0.0)
+        scores = (pants_scores + extras[:, None]) / 3
+
+        rows, cols = np.nonzero(valid)
+
+        def make(n):
+            i, j = rows[n], cols[n]
+            pieces = (kurtis.items[i], pants.items[j])
+            if has_dupatta[i]:
+                pieces += (dupattas.items[dupatta_index[i]],)
+            if has_shoe[i]:
+                pieces += (shoes.items[shoe_index[i]],)
+            return 'indian_kurti_outfit', pieces, 2
+        return scores[rows, cols], make
+
+    def saree_outfits(self, sarees, blouses, shoes, require=()):
+        blouse_index, blouse_best = self.best(self.link_scores(sarees, blouses), self.complements(sarees, blouses))
+        shoe_index, shoe_best = self.best(self.link_scores(sarees, shoes), self.shoe_ok(sarees, shoes))
+        has_blouse, has_shoe = np.isfinite(blouse_best), np.isfinite(shoe_best)
+
+        valid = np.ones(len(sarees), dtype=bool)
+        if 'blouse' in require:
+            valid &= has_blouse
+        if 'shoes' in require:
+            valid &= has_shoe
+        scores = (np.where(has_blouse, blouse_best, 0.0) + np.where(has_shoe, shoe_best, 0.0)) / 2
+
+        rows = np.flatnonzero(valid)
+
+        def make(n):
+            i = rows[n]
+            pieces = (sarees.items[i],)
+            if has_blouse[i]:
+                pieces += (blouses.items[blouse_index[i]],)
+            if has_shoe[i]:
+                pieces += (shoes.items[shoe_index[i]],)
+            return 'saree_outfit', pieces, 1
+        return scores[rows], make
+
+    def candidates(self, selected=None):
+        """Yield ``(scores, make)`` per template; with ``selected``, only templates that can hold it"""
+        tops, bottoms, dresses = self.get('top'), self.get('bottom'), self.get('dress')
+        kurtis, sarees, dupattas = self.get('kurti'), self.get('saree'), self.get('dupatta')
+        shoes, indian_shoes = self.get('shoes'), self.indian_shoes
+        indian_pants = self.get('indian_bottom').where(lambda item: not is_skirt(item.description))
+        western_pants = bottoms.where(lambda item: not is_skirt(item.description, ['skirt']))
+
+        if selected is None:
+            yield self.dress_outfits(dresses, shoes)
+            yield self.top_bottom_outfits(tops, bottoms, shoes)
+            yield self.kurti_outfits(kurtis, indian_pants, western_pants, dupattas, indian_shoes)
+            yield self.saree_outfits(sarees, tops, indian_shoes)
+            return
+
+        only = self.single(selected)
+        category = selected.category
+        if category == 'top':
+            yield self.top_bottom_outfits(only, bottoms, shoes)
+            yield self.saree_outfits(sarees, only, indian_shoes, require=('blouse',))
+        elif category == 'dress':
+            yield self.dress_outfits(only, shoes)
+        elif category == 'kurti':
+            yield self.kurti_outfits(only, indian_pants, western_pants, dupattas, indian_shoes)
+        elif category == 'saree':
+            yield self.saree_outfits(only, tops, indian_shoes)
+        elif category == 'dupatta':
+            yield self.kurti_outfits(kurtis, indian_pants, western_pants, only, indian_shoes, require=('dupatta',))
+        elif category == 'bottom':
+            yield self.top_bottom_outfits(tops, only, shoes)
+            if not is_skirt(selected.description, ['skirt']):
+                # Still only a fallback for kurtis without matching Indian pants
+                yield self.kurti_outfits(kurtis, indian_pants, only, dupattas, indian_shoes)
+        elif category == 'indian_bottom':
+            yield self.top_bottom_outfits(tops, only, shoes)
+            if not is_skirt(selected.description):
+                yield self.kurti_outfits(kurtis, only, self.empty(), dupattas, indian_shoes)
+        elif category == 'shoes':
+            yield self.dress_outfits(dresses, only)
+            yield self.top_bottom_outfits(tops, bottoms, only, require_shoe=True)
+            if item_is_indian_footwear(selected):
+                yield self.kurti_outfits(kurtis, indian_pants, western_pants, dupattas, only, require=('shoes',))
+                yield self.saree_outfits(sarees, tops, only, require=('shoes',))
+
+    def rank(self, limit=None, selected=None):
+        """The ``limit`` best outfits (every one if None) and a bound on the rest.
+
+        Returns ``(outfits, threshold)``: no outfit left out scores above
+        ``threshold`` (-inf when nothing was left out). With ``selected``
+        only outfits that contain that item are ranked.
+        """
+        scores, makers, offsets = [], [], []
+        total = 0
+        for template_scores, make in self.candidates(selected):
+            scores.append(np.asarray(template_scores, dtype=np.float64))
+            makers.append(make)
+            offsets.append(total)
+            total += len(template_scores)
+        if not total:
+            return [], -np.inf
+
+        scores = np.concatenate(scores)
+        offsets = np.asarray(offsets)
+        results, seen = [], set()
+        for position in np.argsort(-scores, kind='stable'):
+            template = int(np.searchsorted(offsets, position, side='right')) - 1
+            outfit_type, pieces, core_size = makers[template](position - offsets[template])
+            if selected is not None and all(item.id != selected.id for item in pieces):
+                continue
+            key = (outfit_type,) + tuple(item.id for item in pieces[:core_size])
+            if key in seen:
+                continue
+            if limit is not None and len(results) == limit:
+                return results, float(scores[position])
+            seen.add(key)
+            results.append(Outfit(outfit_type, pieces, float(scores[position]), pieces[:core_size]))
+        return results, -np.inf
+
+    def rescore(self, outfit):
+        """Re-pick the optional slots of ``outfit``'s core against the current wardrobe; None if invalid"""
+        core = [self.single(item) for item in outfit.core]
+        if outfit.type == 'western_top_bottom_outfit':
+            scores, make = self.top_bottom_outfits(core[0], core[1], self.get('shoes'))
+        elif outfit.type == 'indian_kurti_outfit':
+            scores, make = self.kurti_outfits(core[0], core[1], self.empty(), self.get('dupatta'), self.indian_shoes)
+        elif outfit.type == 'saree_outfit':
+            scores, make = self.saree_outfits(core[0], self.get('top'), self.indian_shoes)
+        else:
+            scores, make = self.dress_outfits(core[0], core[1])
+        if not len(scores):
+            return None
+        outfit_type, pieces, core_size = make(0)
+        return Outfit(outfit_type, pieces, float(scores[0]), pieces[:core_size])
+
+    def top_k(self, k=10, selected=None):
+        """The ``k`` best-scoring distinct outfits, best first"""
+        outfits, _ = self.rank(k, selected)
+        return label_selected(outfits, selected)
@@ -1,3 +1,739 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+
+from chatbot.thumbnails import thumbnail_name
+
+from . import colors, jobs, outfits
+from .colors import ColorMatrix, extract_color
+from .fallback import FallbackVocabulary
+from .models import WardrobeItem
+from .outfit_cache import OutfitCache, record_wardrobe_change, version_key
+from .outfits import OutfitEngine
+from .renderers import FastJSONRenderer
+
+
+@override_settings(OUTFIT_CACHE_ALIAS='default', COLORMIND_CACHE_ALIAS='default', COLORMIND_BACKGROUND_REFRESH=False)
+class GenerateOutfitsQueryCountTest(TestCase):
+    """Outfit generation runs a fixed number of queries however big the wardrobe is"""
+
+    # Session and user lookups for the logged-in request, then the wardrobe fetch
+    MAX_QUERIES = 3
+
+    def setUp(self):
+        caches['default'].clear()
+        patcher = mock.patch('wardrobe.colors.fetch_palette', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user('tester', password='secret')
+        self.client.force_login(self.user)
+        self.url = reverse('generate_outfits')
+
+    def add_items(self, descriptions):
+        rng = np.random.default_rng(0)
+        for description, category in descriptions:
+            WardrobeItem.objects.create(
+                user=self.user,
+                image=f'wardrobe/{category}.jpg',
+                description=description,
+                category=category,
+                embedding=rng.standard_normal(512).astype(np.float32),
+            )
+
+    def test_generate_outfits_query_count(self):
+        self.add_items([
+            ('white cotton shirt', 'top'),
+            ('black tshirt', 'top'),
+            ('blue denim jeans', 'bottom'),
+            ('beige chinos', 'bottom'),
+            ('red floral dress', 'dress'),
+            ('black leather boots', 'shoes'),
+            ('white sneakers', 'shoes'),
+        ])
+
+        with self.assertNumQueries(self.MAX_QUERIES):
+            response = self.client.post(self.url, {}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['outfits'])
+
+        # Served from the outfit cache: no wardrobe fetch at all
+        with self.assertNumQueries(self.MAX_QUERIES - 1):
+            cached = self.client.post(self.url, {}, content_type='application/json')
+        self.assertEqual(cached.json(), response.json())
+
+    def test_selected_item_query_count(self):
+        self.add_items([
+            ('white cotton shirt', 'top'),
+            ('blue denim jeans', 'bottom'),
+            ('white sneakers', 'shoes'),
+        ])
+        selected = WardrobeItem.objects.get(description='white cotton shirt')
+
+        with self.assertNumQueries(self.MAX_QUERIES):
+            response = self.client.post(self.url, {'selected_item_id': selected.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        for outfit in response.json()['outfits']:
+            self.assertIn(selected.id, outfit['items'])
+
+    def test_outfit_items_are_listed_once(self):
+        self.add_items([
+            ('white cotton shirt', 'top'),
+            ('black tshirt', 'top'),
+            ('blue denim jeans', 'bottom'),
+            ('white sneakers', 'shoes'),
+        ])
+
+        payload = self.client.post(self.url, {}, content_type='application/json').json()
+        used = {item_id for outfit in payload['outfits'] for item_id in outfit['items']}
+        self.assertEqual({int(item_id) for item_id in payload['items']}, used)
+        self.assertEqual(set(payload['items'][str(used.pop())]), {'description', 'category', 'image', 'thumbnails'})
+
+        trimmed = self.client.post(f'{self.url}?fields=image', {}, content_type='application/json').json()
+        self.assertEqual(trimmed['outfits'], payload['outfits'])
+        for item_id, item in trimmed['items'].items():
+            self.assertEqual(item, {'image': payload['items'][item_id]['image']})
+
+        response = self.client.post(self.url, {'fields': 'image,colour'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        for fields in ([1], ['image', 2], {'image': True}, 3):
+            response = self.client.post(self.url, {'fields': fields}, content_type='application/json')
+            self.assertEqual(response.status_code, 400, fields)
+
+    def test_no_outfits_query_count(self):
+        self.add_items([
+            ('white cotton shirt', 'top'),
+            ('black tshirt', 'top'),
+        ])
+
+        with self.assertNumQueries(self.MAX_QUERIES):
+            response = self.client.post(self.url, {}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['debug_info']['categories']['western_tops'], 2)
+
+
+class WardrobeListViewTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret')
+        self.client.force_login(self.user)
+        self.url = reverse('wardrobe_list')
+        self.items = [
+            WardrobeItem.objects.create(
+                user=self.user,
+                image=f'wardrobe/item{i}.jpg',
+                description=f'item {i}',
+                category='top',
+                embedding=np.zeros(512, dtype=np.float32),
+            )
+            for i in range(5)
+        ]
+
+    def test_cursor_pages_cover_the_wardrobe(self):
+        ids = []
+        params = {'limit': 2}
+        while True:
+            page = self.client.get(self.url, params).json()
+            ids += [item['id'] for item in page['items']]
+            if page['next_cursor'] is None:
+                break
+            params['cursor'] = page['next_cursor']
+        self.assertEqual(ids, [item.id for item in self.items])
+
+    def test_unchanged_wardrobe_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        unchanged = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(unchanged.status_code, 304)
+
+        self.items[0].delete()
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()['items']), 4)
+
+    def test_delete_is_never_answered_not_modified_by_date(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+
+        self.items[0].delete()
+        # Nothing to validate a date against, so this is a full response without the deleted item
+        changed = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotIn(self.items[0].id, [item['id'] for item in changed.json()['items']])
+
+    def test_since_lists_only_changes(self):
+        as_of = self.client.get(self.url).json()['as_of']
+
+        self.items[1].description = 'item 1 renamed'
+        self.items[1].save()
+        self.items[2].delete()
+
+        delta = self.client.get(self.url, {'since': as_of}).json()
+        self.assertEqual([item['description'] for item in delta['items']], ['item 1 renamed'])
+        self.assertEqual(delta['ids'], [self.items[i].id for i in (0, 1, 3, 4)])
+
+
+def jpeg_upload(name, color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), color).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+def fake_matches(images, digests):
+    return [
+        (np.ones(512, dtype=np.float32), [{'description': 'blue denim jeans', 'similarity': 0.8}])
+        for _ in images
+    ]
+
+
+@override_settings(UPLOAD_WORKER_THREADS=0, THUMBNAIL_SIZES=[96],
+                   OUTFIT_CACHE_ALIAS='default', IMAGE_MATCH_CACHE_ALIAS='default')
+class UploadQueueTest(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        caches['default'].clear()
+
+        self.user = User.objects.create_user('tester', password='secret')
+        self.client.force_login(self.user)
+
+    def upload(self):
+        broken = SimpleUploadedFile('broken.jpg', b'not an image', content_type='image/jpeg')
+        response = self.client.post(reverse('wardrobe_upload'), {
+            'images': [jpeg_upload('jeans.jpg', 'navy'), broken, jpeg_upload('denim.jpg', 'blue')],
+        })
+        self.assertEqual(response.status_code, 202)
+        return [item['id'] for item in response.json()['items']]
+
+    def test_upload_returns_processing_items(self):
+        ids = self.upload()
+        self.assertEqual(len(ids), 2)
+
+        status = self.client.get(reverse('wardrobe_upload_status'), {'ids': ','.join(map(str, ids))}).json()
+        self.assertEqual([item['status'] for item in status['items']], ['processing', 'processing'])
+        self.assertEqual(status['pending'], 2)
+        # Not identified yet, so not outfit material
+        outfits = self.client.post(reverse('generate_outfits'), {}, content_type='application/json')
+        self.assertEqual(outfits.status_code, 400)
+
+    def test_worker_identifies_queued_uploads(self):
+        ids = self.upload()
+        with mock.patch('wardrobe.jobs.match_images', side_effect=fake_matches) as match:
+            self.assertEqual(jobs.drain(), 2)
+        self.assertEqual(match.call_count, 1)
+
+        status = self.client.get(reverse('wardrobe_upload_status'), {'ids': ','.join(map(str, ids))}).json()
+        self.assertEqual(status['pending'], 0)
+        for item in status['items']:
+            self.assertEqual((item['status'], item['description'], item['category']), ('ready', 'blue denim jeans', 'bottom'))
+            self.assertIn('_96.webp', item['thumbnails']['webp'])
+        self.assertEqual(WardrobeItem.objects.get(id=ids[0]).color, 'blue')
+
+    def test_delete_removes_photo_and_thumbnails(self):
+        ids = self.upload()
+        with mock.patch('wardrobe.jobs.match_images', side_effect=fake_matches):
+            jobs.drain()
+        item = WardrobeItem.objects.get(id=ids[0])
+        self.assertEqual(item.thumbnails, [[96, 64]])  # 64px photos are not upscaled
+        files = [item.image.name] + [thumbnail_name(item.image.name, 96, fmt) for fmt in ('webp', 'jpeg')]
+        storage = item.image.storage
+        self.assertTrue(all(storage.exists(name) for name in files))
+
+        response = self.client.post(reverse('delete_item'), {'item_id': item.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(storage.exists(name) for name in files))
+
+    def test_claims_are_exclusive_until_stale(self):
+        self.upload()
+        self.assertEqual(len(jobs.claim_batch()), 2)
+        self.assertEqual(jobs.claim_batch(), [])
+
+        with override_settings(UPLOAD_JOB_TIMEOUT=-1, UPLOAD_JOB_MAX_ATTEMPTS=2):
+            self.assertEqual(len(jobs.claim_batch()), 2)
+            # A third interrupted attempt would exceed UPLOAD_JOB_MAX_ATTEMPTS
+            self.assertEqual(jobs.claim_batch(), [])
+        self.assertEqual(set(WardrobeItem.objects.values_list('status', flat=True)), {'failed'})
+
+
+
+@override_settings(COLORMIND_CACHE_ALIAS='default')
+class ColorMatrixTest(SimpleTestCase):
+    PALETTES = {
+        'red': [[228, 59, 68], [52, 168, 83], [250, 190, 10]],
+        'blue': [[255, 152, 0], [30, 68, 124]],
+    }
+
+    def setUp(self):
+        caches['default'].clear()
+        colors.clear_palette_memo()
+        self.addCleanup(colors.clear_palette_memo)
+
+    def test_build_matches_scalar_rules(self):
+        with mock.patch('wardrobe.colors.get_palette', side_effect=lambda color, fetch=True: self.PALETTES.get(color)):
+            matrix = ColorMatrix.build()
+        self.assertFalse(matrix.complete)
+        for color1 in matrix.colors:
+            for color2 in matrix.colors:
+                pair = (color1, color2)
+                compatible = colors.are_colors_highly_compatible(color1, color2, self.PALETTES.get(color1))
+                match = colors.colors_match(color1, color2)
+                contrast = colors.are_colors_beautiful_contrast(color1, color2)
+                self.assertEqual(matrix.is_compatible(color1, color2), compatible, pair)
+                self.assertEqual(matrix.is_match(color1, color2), match, pair)
+                self.assertEqual(matrix.is_contrast(color1, color2), contrast, pair)
+                expected_score = (
+                    ColorMatrix.COMPATIBLE_SCORE if compatible else
+                    ColorMatrix.CONTRAST_SCORE if contrast else
+                    ColorMatrix.MATCH_SCORE if match else 0.0
+                )
+                self.assertAlmostEqual(float(matrix.score[matrix.color_id(color1), matrix.color_id(color2)]), expected_score)
+        # Red's palette holds green, so green goes with red but not the other way round
+        self.assertTrue(matrix.is_compatible('red', 'green'))
+        self.assertFalse(matrix.is_compatible('green', 'red'))
+        self.assertEqual(matrix.color_id('chartreuse'), matrix.color_id(colors.UNKNOWN_COLOR))
+
+        with mock.patch('wardrobe.colors.get_palette', return_value=[[0, 0, 0]]):
+            self.assertTrue(ColorMatrix.build().complete)
+
+    @override_settings(COLORMIND_BACKGROUND_REFRESH=True)
+    def test_requests_never_wait_on_colormind(self):
+        fetch = mock.Mock(return_value=[[0, 0, 0]])
+        with mock.patch.object(colors, '_matrix', None), mock.patch.object(colors, '_refresh_thread', None), \
+                mock.patch('wardrobe.colors.fetch_palette', fetch):
+            with mock.patch('wardrobe.colors.start_palette_refresh') as refresh:
+                matrix = colors.get_color_matrix()
+            self.assertFalse(matrix.complete)
+            fetch.assert_not_called()
+            refresh.assert_called_once()
+
+            # The refresh fetches off the request path and swaps in the complete matrix
+            colors.start_palette_refresh().join(timeout=10)
+            self.assertEqual(fetch.call_count, len(colors.palette_colors()))
+            self.assertTrue(colors.get_color_matrix().complete)
+            self.assertEqual(caches['default'].get(colors.PALETTE_CACHE_PREFIX + 'red'), [[0, 0, 0]])
+
+
+def make_items(descriptions, start_id=1):
+    rng = np.random.default_rng(len(descriptions))
+    return [
+        SimpleNamespace(id=start_id + i, description=description, category=category, color='', footwear_style='',
+                        embedding=rng.standard_normal(8).astype(np.float32))
+        for i, (description, category) in enumerate(descriptions)
+    ]
+
+
+def cores(outfits):
+    return {(outfit.type,) + tuple(item.description for item in outfit.core) for outfit in outfits}
+
+
+def baseline_cores(items, matrix):
+    """Outfits the rule-based generator (before OutfitEngine) accepted, minus its [:n] truncation"""
+    wardrobe = defaultdict(list)
+    for item in items:
+        wardrobe[item.category].append(item)
+
+    def compatible(a, b):
+        return matrix.is_compatible(extract_color(a.description), extract_color(b.description))
+
+    def matches(a, b):
+        return compatible(a, b) or matrix.is_match(extract_color(a.description), extract_color(b.description))
+
+    def neutral(shoe):
+        return extract_color(shoe.description) in outfits.NEUTRAL_SHOE_COLORS
+
+    found = set()
+    for dress in wardrobe['dress']:
+        for shoe in wardrobe['shoes']:
+            if compatible(dress, shoe) or neutral(shoe):
+                found.add(('western_dress_outfit', dress.description, shoe.description))
+    for top in wardrobe['top']:
+        for bottom in wardrobe['bottom']:
+            has_shoe = any(compatible(top, shoe) and compatible(bottom, shoe) or neutral(shoe) for shoe in wardrobe['shoes'])
+            if matches(top, bottom) and (has_shoe or compatible(top, bottom)):
+                found.add(('western_top_bottom_outfit', top.description, bottom.description))
+    skirt_words = ['skirt', 'ghagra', 'lehenga', 'gown', 'dress']
+    for kurti in wardrobe['kurti']:
+        pants = [
+            bottom for bottom in wardrobe['indian_bottom']
+            if not any(word in bottom.description for word in skirt_words) and matches(kurti, bottom)
+        ]
+        if not pants:
+            pants = [bottom for bottom in wardrobe['bottom'] if 'skirt' not in bottom.description and matches(kurti, bottom)]
+        found.update(('indian_kurti_outfit', kurti.description, bottom.description) for bottom in pants)
+    for saree in wardrobe['saree']:
+        found.add(('saree_outfit', saree.description))
+    return found
+
+
+WARDROBE = [
+    ('white cotton shirt', 'top'),
+    ('red silk blouse', 'top'),
+    ('silk tunic top', 'top'),
+    ('blue denim jeans', 'bottom'),
+    ('black pencil skirt', 'bottom'),
+    ('yellow summer dress', 'dress'),
+    ('green maxi dress', 'dress'),
+    ('black heels', 'shoes'),
+    ('gold juttis', 'shoes'),
+    ('pink cotton kurti', 'kurti'),
+    ('green cotton kurti', 'kurti'),
+    ('pink palazzo', 'indian_bottom'),
+    ('red lehenga', 'indian_bottom'),
+    ('green chiffon dupatta', 'dupatta'),
+    ('red banarasi saree', 'saree'),
+]
+
+
+class OutfitEngineTest(SimpleTestCase):
+    """OutfitEngine against the rule-based generator it replaced"""
+
+    def setUp(self):
+        # The rules without ColorMind palettes: neutrals and same colours go together
+        with mock.patch('wardrobe.colors.get_palette', return_value=None):
+            self.matrix = ColorMatrix.build()
+
+    def engine(self, descriptions):
+        self.items = make_items(descriptions)
+        return OutfitEngine(self.items, self.matrix)
+
+    def item(self, description):
+        return next(item for item in self.items if item.description == description)
+
+    def test_matches_baseline_rules(self):
+        engine = self.engine(WARDROBE)
+        ranked, threshold = engine.rank()
+        self.assertEqual(cores(ranked), baseline_cores(self.items, self.matrix))
+        self.assertEqual(threshold, -np.inf)
+        scores = [outfit.score for outfit in ranked]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_dress_outfits(self):
+        engine = self.engine([
+            ('yellow summer dress', 'dress'), ('green maxi dress', 'dress'),
+            ('black heels', 'shoes'), ('gold juttis', 'shoes'),
+        ])
+        self.assertEqual(cores(engine.rank()[0]), {
+            ('western_dress_outfit', 'yellow summer dress', 'black heels'),
+            ('western_dress_outfit', 'yellow summer dress', 'gold juttis'),
+            ('western_dress_outfit', 'green maxi dress', 'black heels'),
+        })
+
+    def test_top_bottom_outfits(self):
+        engine = self.engine([
+            ('white cotton shirt', 'top'), ('red silk blouse', 'top'), ('silk tunic top', 'top'),
+            ('blue denim jeans', 'bottom'), ('red midi skirt', 'bottom'),
+        ])
+        ranked = engine.rank()[0]
+        # Without shoes only highly compatible pairs count; an unknown colour only "matches"
+        self.assertEqual(cores(ranked), {
+            ('western_top_bottom_outfit', 'white cotton shirt', 'blue denim jeans'),
+            ('western_top_bottom_outfit', 'white cotton shirt', 'red midi skirt'),
+            ('western_top_bottom_outfit', 'red silk blouse', 'red midi skirt'),
+        })
+        self.assertTrue(all(len(outfit.items) == 2 for outfit in ranked))
+
+        engine = self.engine(self.items_as_descriptions() + [('green sneakers', 'shoes'), ('black loafers', 'shoes')])
+        ranked = engine.rank()[0]
+        self.assertIn(('western_top_bottom_outfit', 'silk tunic top', 'blue denim jeans'), cores(ranked))
+        # Green suits neither piece, so the neutral pair of shoes completes every outfit
+        self.assertTrue(all(outfit.items[2].description == 'black loafers' for outfit in ranked))
+
+    def items_as_descriptions(self):
+        return [(item.description, item.category) for item in self.items]
+
+    def test_kurti_outfits_and_western_pants_fallback(self):
+        kurti_wardrobe = [
+            ('pink cotton kurti', 'kurti'), ('red palazzo', 'indian_bottom'), ('pink lehenga', 'indian_bottom'),
+            ('pink cotton trousers', 'bottom'), ('pink mini skirt', 'bottom'),
+            ('green chiffon dupatta', 'dupatta'), ('pink juttis', 'shoes'), ('pink sneakers', 'shoes'),
+        ]
+        engine = self.engine(kurti_wardrobe)
+        ranked = [outfit for outfit in engine.rank()[0] if outfit.type == 'indian_kurti_outfit']
+        # No Indian pants go with the kurti (the lehenga is a skirt), so western trousers stand in
+        self.assertEqual(cores(ranked), {('indian_kurti_outfit', 'pink cotton kurti', 'pink cotton trousers')})
+        self.assertEqual([item.description for item in ranked[0].items[2:]], ['green chiffon dupatta', 'pink juttis'])
+
+        engine = self.engine(kurti_wardrobe + [('pink palazzo', 'indian_bottom')])
+        ranked = [outfit for outfit in engine.rank()[0] if outfit.type == 'indian_kurti_outfit']
+        self.assertEqual(cores(ranked), {('indian_kurti_outfit', 'pink cotton kurti', 'pink palazzo')})
+
+    def test_saree_outfits(self):
+        engine = self.engine([
+            ('red banarasi saree', 'saree'), ('blue silk saree', 'saree'),
+            ('red silk blouse', 'top'), ('red juttis', 'shoes'), ('red heels', 'shoes'),
+        ])
+        by_saree = {outfit.core[0].description: outfit for outfit in engine.rank()[0]}
+        self.assertEqual(
+            [item.description for item in by_saree['red banarasi saree'].items],
+            ['red banarasi saree', 'red silk blouse', 'red juttis'],
+        )
+        # Optional slots: a saree with nothing to pair still makes an outfit, ranked last
+        self.assertEqual([item.description for item in by_saree['blue silk saree'].items], ['blue silk saree'])
+        self.assertEqual(by_saree['blue silk saree'].score, 0.0)
+
+    def test_selected_item_outfits_contain_it(self):
+        engine = self.engine(WARDROBE)
+        all_cores = cores(engine.rank()[0])
+        for item in self.items:
+            ranked, _ = engine.rank(selected=item)
+            for outfit in ranked:
+                self.assertIn(item.id, [piece.id for piece in outfit.items], item.description)
+                if item.category != 'indian_bottom':
+                    self.assertIn(cores([outfit]).pop(), all_cores, item.description)
+        # As before, a selected Indian bottom is also offered with western tops
+        self.assertIn(
+            ('western_top_bottom_outfit', 'white cotton shirt', 'pink palazzo'),
+            cores(engine.rank(selected=self.item('pink palazzo'))[0]),
+        )
+
+        selected = engine.top_k(selected=self.item('black heels'))
+        self.assertTrue(selected)
+        self.assertTrue(all(outfit.type == 'selected_shoes_outfit' for outfit in selected))
+        # A selected blouse only appears in saree outfits that take it as the blouse
+        blouse_sarees = [outfit for outfit in engine.rank(selected=self.item('red silk blouse'))[0] if outfit.type == 'saree_outfit']
+        self.assertEqual([item.description for item in blouse_sarees[0].items[:2]], ['red banarasi saree', 'red silk blouse'])
+
+    def test_selected_bottom_is_only_a_kurti_fallback(self):
+        engine = self.engine([
+            ('pink cotton kurti', 'kurti'), ('green cotton kurti', 'kurti'),
+            ('green palazzo', 'indian_bottom'), ('black trousers', 'bottom'),
+        ])
+        ranked, _ = engine.rank(selected=self.item('black trousers'))
+        self.assertEqual(
+            {outfit.core[0].description for outfit in ranked if outfit.type == 'indian_kurti_outfit'},
+            {'pink cotton kurti'},
+        )
+
+    def test_rank_limit_and_threshold(self):
+        engine = self.engine(WARDROBE)
+        everything, _ = engine.rank()
+        top, threshold = engine.rank(limit=3)
+        self.assertEqual(top, everything[:3])
+        self.assertEqual(threshold, everything[3].score)
+        keys = [(outfit.type,) + tuple(item.id for item in outfit.core) for outfit in everything]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertEqual(engine.top_k(k=len(everything) + 5), everything)
+
+    def test_large_wardrobes_are_scored_in_blocks(self):
+        engine = self.engine(WARDROBE + [
+            (f'{color} {piece}', category)
+            for color in ('white', 'black', 'blue', 'red')
+            for piece, category in (('shirt', 'top'), ('chinos', 'bottom'), ('loafers', 'shoes'))
+        ])
+        expected = engine.rank()
+        with mock.patch.object(outfits, 'MAX_BROADCAST_CELLS', 1):
+            self.assertEqual(engine.rank(), expected)
+
+
+@override_settings(OUTFIT_CACHE_ALIAS='default')
+class OutfitCacheReplayTest(SimpleTestCase):
+    """Replaying the change log onto a cached ranking gives what a fresh ranking would"""
+
+    user_id = 7
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        with mock.patch('wardrobe.colors.get_palette', return_value=None):
+            self.matrix = ColorMatrix.build()
+        self.wardrobe = make_items(WARDROBE)
+
+    def add(self, description, category):
+        item = make_items([(description, category)], start_id=len(self.wardrobe) + 100)[0]
+        self.wardrobe.append(item)
+        record_wardrobe_change(self.user_id, 'add', [item])
+
+    def delete(self, description):
+        item = next(item for item in self.wardrobe if item.description == description)
+        self.wardrobe.remove(item)
+        record_wardrobe_change(self.user_id, 'delete', [item])
+
+    def assert_matches_fresh_ranking(self, incremental=None):
+        """Rank through the cache; ``incremental`` (if given) says whether the change log was replayed"""
+        cache = OutfitCache(self.user_id)
+        engine = OutfitEngine(self.wardrobe, self.matrix)
+        replayed = []
+        real_update = OutfitCache.update
+
+        def update(outfit_cache, *args):
+            result = real_update(outfit_cache, *args)
+            replayed.append(result is not None)
+            return result
+
+        with mock.patch.object(OutfitCache, 'update', autospec=True, side_effect=update):
+            ranked = cache.rank(engine, k=5)
+        cache.put({'outfits': []})
+
+        fresh, _ = engine.rank(5)
+        self.assertEqual(
+            [(outfit.type, [item.id for item in outfit.items]) for outfit in ranked],
+            [(outfit.type, [item.id for item in outfit.items]) for outfit in fresh],
+        )
+        np.testing.assert_allclose([outfit.score for outfit in ranked], [outfit.score for outfit in fresh], rtol=1e-6)
+        if incremental is not None:
+            self.assertEqual(replayed == [True], incremental)
+
+    def replay_changes(self, check_path):
+        """A run of adds and deletes; ``check_path`` also asserts which ones were replayed"""
+        def expect(incremental):
+            return incremental if check_path else None
+
+        self.assert_matches_fresh_ranking(expect(False))
+
+        self.add('black trousers', 'bottom')
+        self.assert_matches_fresh_ranking(expect(True))
+
+        # Shoes fill an optional slot: outfits keep their core and re-pick the shoe
+        self.delete('black heels')
+        self.assert_matches_fresh_ranking(expect(True))
+
+        # Two changes replayed at once
+        self.delete('white cotton shirt')
+        self.add('white linen shirt', 'top')
+        self.assert_matches_fresh_ranking(expect(True))
+
+        # Indian bottoms decide whether western pants are a kurti fallback
+        self.add('white palazzo', 'indian_bottom')
+        self.assert_matches_fresh_ranking(expect(False))
+        self.delete('pink palazzo')
+        self.assert_matches_fresh_ranking(expect(False))
+
+        self.delete('black trousers')
+        self.add('black heels', 'shoes')
+        self.assert_matches_fresh_ranking(expect(True))
+
+    @override_settings(OUTFIT_CACHE_DEPTH=50)
+    def test_replay_with_every_outfit_cached(self):
+        self.replay_changes(check_path=True)
+
+    @override_settings(OUTFIT_CACHE_DEPTH=6)
+    def test_replay_with_a_shallow_ranking(self):
+        # Outfits beyond the depth are bounded by the threshold; thin rankings are rebuilt
+        self.replay_changes(check_path=False)
+
+    def test_reseeded_version_is_not_replayed(self):
+        self.assert_matches_fresh_ranking(False)
+        self.add('black trousers', 'bottom')
+        # An evicted counter restarts from the clock, far past the cached version
+        cache = caches['default']
+        cache.delete(version_key(self.user_id))
+        with mock.patch('wardrobe.outfit_cache.time.time', return_value=time.time() + 24 * 60 * 60):
+            self.delete('black heels')
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            self.assert_matches_fresh_ranking(False)
+        get_many.assert_not_called()
+
+    @override_settings(OUTFIT_CACHE_MAX_REPLAY=2)
+    def test_long_change_log_is_not_replayed(self):
+        self.assert_matches_fresh_ranking(False)
+        self.add('black trousers', 'bottom')
+        self.add('white linen shirt', 'top')
+        self.assert_matches_fresh_ranking(True)
+        self.delete('black trousers')
+        self.delete('white linen shirt')
+        self.add('black trousers', 'bottom')
+        self.assert_matches_fresh_ranking(False)
+
+
+class FallbackVocabularyTest(SimpleTestCase):
+    ITEMS = {'red kurti': 'a red Indian kurti', 'blue jeans': 'blue denim jeans', 'sneakers': 'white athletic sneakers'}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_dir = directory.name
+        self.encoded = []
+        patcher = mock.patch('wardrobe.fallback.encode_texts', side_effect=self.encode_texts)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def encode_texts(self, texts):
+        self.encoded.append(list(texts))
+        # Prompt length and word count, enough to tell these prompts apart
+        return np.array([[len(text), len(text.split()), 1.0, 0.0] for text in texts], dtype=np.float32)
+
+    def cached_files(self):
+        return sorted(os.listdir(self.cache_dir))
+
+    def test_unchanged_vocabulary_reuses_the_file(self):
+        compiled = FallbackVocabulary.load_or_compile(self.ITEMS, self.cache_dir)
+        self.assertEqual(len(self.encoded), 1)
+        self.assertEqual(self.cached_files(), [f'fallback_vocab_{FallbackVocabulary.fingerprint(self.ITEMS)}.npz'])
+
+        loaded = FallbackVocabulary.load_or_compile(dict(self.ITEMS), self.cache_dir)
+        self.assertEqual(len(self.encoded), 1)
+        self.assertEqual(loaded.labels, list(self.ITEMS))
+        np.testing.assert_array_equal(loaded.embeddings, compiled.embeddings)
+        self.assertEqual(loaded.best_match(compiled.embeddings[1])[0], 'blue jeans')
+
+    def test_changed_vocabulary_rebuilds_the_file(self):
+        FallbackVocabulary.load_or_compile(self.ITEMS, self.cache_dir)
+        changed = {**self.ITEMS, 'sneakers': 'white canvas sneakers'}
+        self.assertNotEqual(FallbackVocabulary.fingerprint(changed), FallbackVocabulary.fingerprint(self.ITEMS))
+
+        vocabulary = FallbackVocabulary.load_or_compile(changed, self.cache_dir)
+        self.assertEqual(len(self.encoded), 2)
+        self.assertEqual(self.encoded[-1], list(changed.values()))
+        self.assertEqual(len(self.cached_files()), 2)
+        self.assertEqual(vocabulary.labels, list(changed))
+
+        added = {**self.ITEMS, 'saree': 'an Indian saree'}
+        FallbackVocabulary.load_or_compile(added, self.cache_dir)
+        self.assertEqual(self.encoded[-1], list(added.values()))
+
+    def test_new_clip_model_rebuilds_the_file(self):
+        FallbackVocabulary.load_or_compile(self.ITEMS, self.cache_dir)
+        with mock.patch('wardrobe.fallback.MODEL_NAME', 'ViT-L/14'):
+            FallbackVocabulary.load_or_compile(self.ITEMS, self.cache_dir)
+        self.assertEqual(len(self.encoded), 2)
+        self.assertEqual(len(self.cached_files()), 2)
+
+    def test_unreadable_file_is_rebuilt(self):
+        path = os.path.join(self.cache_dir, f'fallback_vocab_{FallbackVocabulary.fingerprint(self.ITEMS)}.npz')
+        with open(path, 'wb') as f:
+            f.write(b'not a numpy archive')
+
+        vocabulary = FallbackVocabulary.load_or_compile(self.ITEMS, self.cache_dir)
+        self.assertEqual(len(self.encoded), 1)
+        self.assertEqual(vocabulary.labels, list(self.ITEMS))
+        FallbackVocabulary.load_or_compile(self.ITEMS, self.cache_dir)
+        self.assertEqual(len(self.encoded), 1)
+
+
+class FastJSONRendererTest(SimpleTestCase):
+    def test_renders_like_drf(self):
+        data = {
+            'label': gettext_lazy('Outfits'),
+            'when': datetime(2026, 10, 17, 9, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'day': date(2026, 10, 17),
+            'price': Decimal('12.50'),
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'items': {1: {'score': 0.5, 'tags': ('blue', 'denim')}},
+            'big': 2 ** 70,
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_numpy_values(self):
+        data = {'score': np.float64(0.25), 'ids': np.arange(3)}
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), {'score': 0.25, 'ids': [0, 1, 2]})
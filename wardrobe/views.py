@@ -5,17 +5,29 @@ from rest_framework.parsers import MultiPartParser, JSONParser
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.http import HttpResponse
-import json
-import tempfile
-import os
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timezone as dt_timezone
 from .models import WardrobeItem
-from chatbot.clip_utils import encode_image, encode_text
-from chatbot.models import ClothingItem
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import time
-import re
-import requests
+from chatbot.thumbnails import delete_thumbnails, thumbnail_srcsets
+from .jobs import start_workers
+from .outfit_cache import OutfitCache, record_wardrobe_change
+from .outfits import OutfitEngine, label_selected
+from .renderers import FastJSONRenderer
+from collections import Counter
+from PIL import Image
+
+# Columns outfit generation reads from each WardrobeItem
+OUTFIT_ITEM_FIELDS = ['id', 'description', 'category', 'image', 'thumbnails', 'embedding', 'color', 'footwear_style']
+# Item fields an outfit response can carry (trimmed with ?fields=)
+OUTFIT_RESPONSE_FIELDS = ['description', 'category', 'image', 'thumbnails']
+LIST_PAGE_SIZE = 100
+LIST_MAX_PAGE_SIZE = 500
 
 @method_decorator(login_required, name='dispatch')
 class WardrobeUploadView(APIView):
@@ -32,325 +44,174 @@ class WardrobeUploadView(APIView):
             print("❌ No images found in request")
             return Response({"error": "No images provided"}, status=400)
         
-        uploaded_items = []
-        
+        # Only the header is checked here; CLIP and identification run in a
+        # background worker (wardrobe.jobs) so large batches return at once
+        valid_uploads = []
         for i, image in enumerate(images):
-            try:
-                print(f"🎯 Processing image {i+1}: {image.name}")
-                
-                # Save image to temporary file for CLIP processing
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-                    for chunk in image.chunks():
-                        tmp_file.write(chunk)
-                    tmp_path = tmp_file.name
-                
-                print(f"🎯 Temporary file created: {tmp_path}")
-                
-                # Get CLIP embedding and description
-                try:
-                    embedding = encode_image(tmp_path)
-                    print("🎯 CLIP encoding successful")
-                except Exception as e:
-                    print(f"❌ CLIP encoding failed: {e}")
-                    continue
-                
-                description = self.identify_item(embedding)
-                category = self.detect_category(description)
-                
-                print(f"🎯 Identified: {description} → {category}")
-                
-                # Create wardrobe item
-                item = WardrobeItem.objects.create(
-                    user=request.user,
-                    image=image,
-                    description=description,
-                    category=category,
-                    embedding=json.dumps(embedding.tolist())
-                )
-                
-                uploaded_items.append({
-                    'id': item.id,
-                    'description': description,
-                    'category': category,
-                    'image_url': item.image.url
-                })
-                
-                print(f"✅ Successfully saved: {description}")
-                
-                # Cleanup
-                os.unlink(tmp_path)
-                
-            except Exception as e:
-                print(f"❌ Failed to process {image.name}: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                return Response({"error": f"Failed to process {image.name}: {str(e)}"}, status=500)
-        
-        print(f"✅ Upload completed: {len(uploaded_items)} items saved")
-        return Response({
-            "status": "success", 
-            "uploaded_count": len(uploaded_items),
-            "items": uploaded_items
-        })
-    
-    def identify_item(self, embedding):
-        """Match against ALL items in fashion database for maximum accuracy"""
-        try:
-            best_match = "fashion item"
-            best_similarity = -1
-            
-            # Get ALL items from your fashion database - NO LIMIT
-            print("🎯 Loading ALL database items for matching...")
-            database_items = ClothingItem.objects.all()  # REMOVED LIMIT FOR MORE ITEMS
-            total_items = database_items.count()
-            print(f"🎯 Processing {total_items} database items")
-            
-            start_time = time.time()
-            
-            for i, db_item in enumerate(database_items):
-                try:
-                    # Convert stored embedding back to numpy
-                    db_embedding = np.array(json.loads(db_item.embedding))
-                    
-                    similarity = cosine_similarity(
-                        embedding.reshape(1, -1),
-                        db_embedding.reshape(1, -1)
-                    )[0][0]
-                    
-                    if similarity > best_similarity:
-                        best_similarity = similarity
-                        best_match = db_item.description
-                        
-                    # Progress logging for large datasets
-                    if (i + 1) % 200 == 0:
-                        print(f"🎯 Processed {i+1}/{total_items} items...")
-                        
-                except Exception as e:
-                    if i < 10:  # Only log first few errors to avoid spam
-                        print(f"⚠️ Error processing database item {db_item.id}: {e}")
-                    continue
-            
-            processing_time = time.time() - start_time
-            print(f"✅ Database matching completed in {processing_time:.2f}s")
-            print(f"🎯 Best match: {best_match} (similarity: {best_similarity:.3f})")
-            
-            # If similarity is decent, use database match
-            if best_similarity > 0.15:
-                return best_match
+            print(f"🎯 Queueing image {i+1}: {image.name}")
+            if is_readable_image(image):
+                valid_uploads.append(image)
             else:
-                print(f"⚠️ Low similarity ({best_similarity:.3f}), using fallback")
-                return self.fallback_identify(embedding)
-            
-        except Exception as e:
-            print(f"❌ Database matching failed: {e}")
-            return self.fallback_identify(embedding)
-    
-    def fallback_identify(self, embedding):
-        """Improved fallback method with Indian and Western fashion items"""
-        fashion_items = {
-            # Western Dresses
-            "red dress": "a red dress",
-            "black dress": "a black dress",
-            "floral dress": "a floral print dress",
-            "summer dress": "a light summer dress",
-            "evening dress": "an elegant evening dress",
-            "casual dress": "a casual everyday dress",
-            
-            # Western Tops
-            "white t-shirt": "a white cotton t-shirt",
-            "black t-shirt": "a black cotton t-shirt", 
-            "blue shirt": "a blue shirt",
-            "striped shirt": "a blue and white striped shirt",
-            "blouse": "a feminine silk blouse",
-            "sweater": "a cozy knit sweater",
-            "tank top": "a simple tank top",
-            
-            # Western Bottoms
-            "blue jeans": "blue denim jeans",
-            "black jeans": "black denim jeans", 
-            "denim skirt": "a denim skirt",
-            "black skirt": "a black skirt",
-            "leggings": "black leggings",
-            "shorts": "denim shorts",
-            "wide leg pants": "wide leg trousers",
-            
-            # Western Shoes
-            "sneakers": "white athletic sneakers",
-            "high heels": "black high heel shoes",
-            "sandals": "leather sandals",
-            "boots": "ankle boots",
-            "flats": "ballet flats",
-            
-            # Western Outerwear
-            "jacket": "a denim jacket",
-            "blazer": "a formal blazer",
-            "coat": "a winter coat",
-            "cardigan": "a knit cardigan",
-            
-            # Indian Traditional - Kurtis & Tops
-            "red kurti": "a red Indian kurti",
-            "blue kurti": "a blue Indian kurti", 
-            "green kurti": "a green Indian kurti",
-            "yellow kurti": "a yellow Indian kurti",
-            "pink kurti": "a pink Indian kurti",
-            "printed kurti": "a printed Indian kurti",
-            "embroidered kurti": "an embroidered Indian kurti",
-            "anarkali kurti": "an anarkali style kurti",
-            "long kurti": "a long Indian kurti",
-            "short kurti": "a short Indian kurti",
-            "kurti": "an Indian kurti top",
-            
-            # Indian Traditional - Sarees
-            "silk saree": "a silk Indian saree",
-            "cotton saree": "a cotton Indian saree",
-            "banarasi saree": "a banarasi silk saree",
-            "kanjeevaram saree": "a kanjeevaram silk saree",
-            "printed saree": "a printed Indian saree",
-            "embroidered saree": "an embroidered Indian saree",
-            "georgette saree": "a georgette Indian saree",
-            "chiffon saree": "a chiffon Indian saree",
-            "saree": "an Indian saree",
-            
-            # Indian Traditional - Bottoms
-            "leggings": "black leggings",
-            "palazzo pants": "flowy palazzo pants",
-            "churidar": "a churidar bottom",
-            "dhoti pants": "dhoti style pants",
-            "salwar": "a salwar bottom",
-            "patiala": "a patiala salwar",
-            
-            # Indian Traditional - Dupattas & Accessories
-            "dupatta": "a matching dupatta",
-            "printed dupatta": "a printed dupatta",
-            "embroidered dupatta": "an embroidered dupatta",
-            "silver jewelry": "silver Indian jewelry",
-            "gold jewelry": "gold Indian jewelry",
-            
-            # Indian Footwear
-            "juttis": "traditional Indian juttis",
-            "mojaris": "traditional Indian mojaris",
-            "kolhapuris": "traditional Kolhapuri sandals",
-            "ethnic sandals": "ethnic Indian sandals"
-        }
+                print(f"❌ Could not read {image.name}")
         
-        best_match = "clothing item"
-        best_similarity = -1
+        if not valid_uploads:
+            return Response({"error": "None of the uploaded files is a readable image"}, status=400)
         
-        for desc, prompt in fashion_items.items():
-            try:
-                text_embed = encode_text(prompt)
-                similarity = cosine_similarity(
-                    embedding.reshape(1, -1), 
-                    text_embed.reshape(1, -1)
-                )[0][0]
-                
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = desc
-            except Exception as e:
-                continue
+        with transaction.atomic():
+            created_items = [
+                WardrobeItem.objects.create(user=request.user, image=image, status=WardrobeItem.PROCESSING)
+                for image in valid_uploads
+            ]
+            transaction.on_commit(start_workers)
         
-        print(f"🎯 Fallback match: {best_match} (similarity: {best_similarity:.3f})")
-        return best_match
+        print(f"✅ Upload queued: {len(created_items)} items processing")
+        return Response({
+            "status": "processing",
+            "uploaded_count": len(created_items),
+            "items": [
+                {
+                    'id': item.id,
+                    'status': item.status,
+                    'image_url': item.image.url,
+                }
+                for item in created_items
+            ],
+            "status_url": reverse('wardrobe_upload_status'),
+        }, status=202)
+
+
+def is_readable_image(upload):
+    """Whether PIL recognises ``upload``'s header (its pixels are decoded by the worker)"""
+    try:
+        with Image.open(upload):
+            return True
+    except Exception:
+        return False
+    finally:
+        upload.seek(0)
 
-    def detect_category(self, description):
-        """Improved category detection with better priority for Indian clothing"""
-        description_lower = description.lower()
-        
-        # Priority 1: Check for Indian traditional wear - Sarees (most specific)
-        saree_keywords = ['saree', 'sari', 'banarasi', 'kanjeevaram', 'georgette', 'chiffon']
-        if any(keyword in description_lower for keyword in saree_keywords):
-            return 'saree'
-        
-        # Priority 2: Check for Indian traditional wear - Kurtis (before general tops)
-        kurti_keywords = ['kurti', 'kurta', 'anarkali', 'kurtis', 'kurtas']
-        if any(keyword in description_lower for keyword in kurti_keywords):
-            return 'kurti'
-        
-        # Priority 3: Check for shoes/footwear 
-        shoe_keywords = ['shoe', 'sandal', 'heel', 'sneaker', 'boot', 'pump', 'loafer', 'flat', 'juttis', 'mojaris', 'kolhapuris']
-        if any(keyword in description_lower for keyword in shoe_keywords):
-            return 'shoes'
-        
-        # Priority 4: Check for Indian traditional bottoms (before western bottoms)
-        indian_bottom_keywords = ['palazzo', 'churidar', 'dhoti', 'salwar', 'patiala', 'leggings']
-        if any(keyword in description_lower for keyword in indian_bottom_keywords):
-            return 'indian_bottom'
-        
-        # Priority 5: Check for Western dresses
-        dress_keywords = ['dress', 'gown', 'jumpsuit', 'maxi', 'midi']
-        if any(keyword in description_lower for keyword in dress_keywords):
-            return 'dress'
-        
-        # Priority 6: Check for dupattas
-        dupatta_keywords = ['dupatta', 'stole', 'scarf']
-        if any(keyword in description_lower for keyword in dupatta_keywords):
-            return 'dupatta'
-        
-        # Priority 7: Check for Western bottoms
-        bottom_keywords = ['pant', 'jean', 'trouser', 'short', 'jogger', 'skirt']
-        if any(keyword in description_lower for keyword in bottom_keywords):
-            return 'bottom'
-        
-        # Priority 8: Check for Western tops (last to avoid catching kurtis)
-        top_keywords = ['shirt', 'top', 'blouse', 't-shirt', 'tank', 'crop top', 'sweater', 'hoodie', 'blazer', 'jacket', 'cardigan']
-        if any(keyword in description_lower for keyword in top_keywords):
-            return 'top'
-        
-        # Priority 9: Check for Indian jewelry and accessories
-        jewelry_keywords = ['jewelry', 'jewellery', 'necklace', 'earring', 'bangle', 'bracelet']
-        if any(keyword in description_lower for keyword in jewelry_keywords):
-            return 'accessories'
-        
-        return 'accessories'
+
+@method_decorator(login_required, name='dispatch')
+class UploadStatusView(APIView):
+    """Progress of the user's uploads.
+
+    ``ids`` (comma separated) are the items returned by the upload; without
+    them every item still processing or failed is listed. ``pending`` counts
+    the user's items still processing.
+    """
+    renderer_classes = [FastJSONRenderer]
+    
+    def get(self, request):
+        items = WardrobeItem.objects.filter(user=request.user)
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                ids = [int(item_id) for item_id in ids.split(',') if item_id.strip()]
+            except ValueError:
+                return Response({"error": "ids must be comma separated integers"}, status=400)
+            listed = items.filter(id__in=ids)
+        else:
+            listed = items.exclude(status=WardrobeItem.READY)
+        
+        storage = WardrobeItem._meta.get_field('image').storage
+        rows = listed.order_by('id').values('id', 'status', 'description', 'category', 'image', 'thumbnails', 'error', 'created_at')
+        response = Response({
+            "items": [
+                {
+                    'id': row['id'],
+                    'status': row['status'],
+                    'description': row['description'],
+                    'category': row['category'],
+                    'image_url': storage.url(row['image']),
+                    'thumbnails': thumbnail_srcsets(row['image'], storage, row['thumbnails']),
+                    'error': row['error'],
+                    'created_at': row['created_at'].date().isoformat(),
+                }
+                for row in rows
+            ],
+            "pending": items.filter(status=WardrobeItem.PROCESSING).count(),
+        })
+        patch_cache_control(response, private=True, no_store=True)
+        return response
 
 @method_decorator(login_required, name='dispatch')
 class GenerateOutfitsView(APIView):
+    """Best outfits for the user's wardrobe.
+
+    The response lists every item once in an ``items`` table keyed by id, and
+    each outfit as ``{"type", "items": [ids], "score"}``. ``fields`` (query
+    or body, comma separated) limits the item data to some of
+    ``OUTFIT_RESPONSE_FIELDS``.
+    """
+    renderer_classes = [FastJSONRenderer]
+    
     def post(self, request):
         try:
-            user_items = WardrobeItem.objects.filter(user=request.user)
             selected_item_id = request.data.get('selected_item_id')
+            fields = request.data.get('fields') or request.query_params.get('fields') or []
+            if isinstance(fields, str):
+                fields = [field.strip() for field in fields.split(',') if field.strip()]
+            if not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+                return Response({"error": "fields must be a comma separated string or a list of strings"}, status=400)
+            if fields:
+                unknown = [field for field in fields if field not in OUTFIT_RESPONSE_FIELDS]
+                if unknown:
+                    return Response({
+                        "error": f"Unknown fields: {', '.join(unknown)}. Choose from {', '.join(OUTFIT_RESPONSE_FIELDS)}"
+                    }, status=400)
+            
+            outfit_cache = OutfitCache(request.user.id, selected_item_id)
+            cached_payload = outfit_cache.get()
+            if cached_payload is not None:
+                print(f"🎯 Serving {len(cached_payload['outfits'])} cached outfits (wardrobe version {outfit_cache.version})")
+                return Response(trim_item_fields(cached_payload, fields))
+            
+            # One query for everything below; the column list skips user/created_at
+            user_items = list(
+                WardrobeItem.objects.filter(user=request.user, status=WardrobeItem.READY).only(*OUTFIT_ITEM_FIELDS)
+            )
             
-            print(f"🎯 Generating outfits for {user_items.count()} items")
+            print(f"🎯 Generating outfits for {len(user_items)} items")
             if selected_item_id:
                 print(f"🎯 Using selected item: {selected_item_id}")
             
-            if user_items.count() < 2:
+            if len(user_items) < 2:
                 return Response({"error": "Need at least 2 items to generate outfits"}, status=400)
             
             # Debug: print all items and their categories/colors
             for item in user_items:
-                color = self.extract_color_from_description(item.description)
-                print(f"🎯 Item: {item.description} → Category: {item.category} → Color: {color}")
+                print(f"🎯 Item: {item.description} → Category: {item.category} → Color: {item.color or 'not derived'}")
             
-            outfits = self.generate_combinations(user_items, selected_item_id)
-            print(f"🎯 Generated {len(outfits)} outfit combinations")
+            payload = self.generate_combinations(user_items, selected_item_id, outfit_cache)
+            print(f"🎯 Generated {len(payload['outfits'])} outfit combinations")
             
-            if not outfits:
+            if not payload['outfits']:
                 if selected_item_id:
                     error_msg = f"Could not generate outfits with the selected item. Try adding more compatible clothing items."
                 else:
                     error_msg = "Could not generate complete outfits. Try adding more diverse clothing items."
                 
+                category_counts = Counter(item.category for item in user_items)
                 return Response({
                     "error": error_msg,
                     "debug_info": {
-                        "total_items": user_items.count(),
+                        "total_items": len(user_items),
                         "categories": {
-                            'western_tops': user_items.filter(category='top').count(),
-                            'western_bottoms': user_items.filter(category='bottom').count(),
-                            'western_dresses': user_items.filter(category='dress').count(),
-                            'kurtis': user_items.filter(category='kurti').count(),
-                            'sarees': user_items.filter(category='saree').count(),
-                            'indian_bottoms': user_items.filter(category='indian_bottom').count(),
-                            'dupattas': user_items.filter(category='dupatta').count(),
-                            'shoes': user_items.filter(category='shoes').count(),
-                            'accessories': user_items.filter(category='accessories').count()
+                            'western_tops': category_counts['top'],
+                            'western_bottoms': category_counts['bottom'],
+                            'western_dresses': category_counts['dress'],
+                            'kurtis': category_counts['kurti'],
+                            'sarees': category_counts['saree'],
+                            'indian_bottoms': category_counts['indian_bottom'],
+                            'dupattas': category_counts['dupatta'],
+                            'shoes': category_counts['shoes'],
+                            'accessories': category_counts['accessories']
                         }
                     }
                 }, status=400)
             
-            return Response({"outfits": outfits})
+            outfit_cache.put(payload)
+            return Response(trim_item_fields(payload, fields))
         
         except Exception as e:
             print(f"❌ Error in GenerateOutfitsView: {str(e)}")
@@ -358,735 +219,133 @@ class GenerateOutfitsView(APIView):
             traceback.print_exc()
             return Response({"error": f"Internal server error: {str(e)}"}, status=500)
     
-    def generate_combinations(self, items, selected_item_id=None):
-        """Generate valid outfit combinations with ColorMind API color theory"""
+    def generate_combinations(self, items, selected_item_id=None, outfit_cache=None):
+        """Score every outfit the wardrobe allows and return the best ten"""
         # Categorize items
-        western_tops = [item for item in items if item.category == 'top']
-        western_bottoms = [item for item in items if item.category == 'bottom']
-        western_dresses = [item for item in items if item.category == 'dress']
-        kurtis = [item for item in items if item.category == 'kurti']
-        sarees = [item for item in items if item.category == 'saree']
-        indian_bottoms = [item for item in items if item.category == 'indian_bottom']
-        dupattas = [item for item in items if item.category == 'dupatta']
-        shoes = [item for item in items if item.category == 'shoes']
-        accessories = [item for item in items if item.category == 'accessories']
+        engine = OutfitEngine(items)
+        counts = {category: len(partition) for category, partition in engine.partitions.items()}
+        print(f"🎯 Categorized: {counts}")
         
-        print(f"🎯 Categorized: {len(western_tops)} western_tops, {len(western_bottoms)} western_bottoms, {len(western_dresses)} western_dresses")
-        print(f"🎯 Indian wear: {len(kurtis)} kurtis, {len(sarees)} sarees, {len(indian_bottoms)} indian_bottoms, {len(dupattas)} dupattas")
-        
-        # If selected_item_id is provided, find the selected item
+        # If selected_item_id is provided, find the selected item among the fetched ones
         selected_item = None
         if selected_item_id:
-            try:
-                selected_item = WardrobeItem.objects.get(id=selected_item_id, user=items[0].user)
+            selected_item = next((item for item in items if str(item.id) == str(selected_item_id)), None)
+            if selected_item:
                 print(f"🎯 Selected item: {selected_item.description} ({selected_item.category})")
-            except WardrobeItem.DoesNotExist:
+            else:
                 print(f"❌ Selected item {selected_item_id} not found")
         
-        combinations = []
-        
-        # If we have a selected item, only generate combinations with that item
-        if selected_item:
-            combinations = self.generate_combinations_with_selected_item(
-                selected_item, 
-                western_tops, western_bottoms, western_dresses,
-                kurtis, sarees, indian_bottoms, dupattas, shoes, accessories
-            )
+        if outfit_cache is not None:
+            outfits = label_selected(outfit_cache.rank(engine, selected_item, k=10), selected_item)
         else:
-            # Original logic for all combinations
-            combinations = self.generate_all_combinations(
-                western_tops, western_bottoms, western_dresses,
-                kurtis, sarees, indian_bottoms, dupattas, shoes, accessories
-            )
-        
-        # Remove duplicates and return
-        unique_combinations = []
-        seen_combinations = set()
+            outfits = engine.top_k(k=10, selected=selected_item)
         
-        for combo in combinations:
-            combo_key = tuple(sorted(item['id'] for item in combo['items']))
-            if combo_key not in seen_combinations:
-                seen_combinations.add(combo_key)
-                unique_combinations.append(combo)
-        
-        return unique_combinations[:10]
-
-    def generate_combinations_with_selected_item(self, selected_item, western_tops, western_bottoms, western_dresses, kurtis, sarees, indian_bottoms, dupattas, shoes, accessories):
-        """Generate combinations only including the selected item"""
+        # Each item is rendered once, however many outfits it appears in
+        items = {}
         combinations = []
-        selected_color = self.extract_color_from_description(selected_item.description)
-        
-        print(f"🎯 Generating combinations with selected item: {selected_item.description} (Category: {selected_item.category})")
-        
-        # Handle based on selected item category
-        if selected_item.category == 'top':
-            # Western top - pair with bottoms and shoes
-            highly_matching_bottoms = self.get_highly_matching_bottoms(selected_color, western_bottoms)
-            for bottom in highly_matching_bottoms[:3]:
-                bottom_color = self.extract_color_from_description(bottom.description)
-                highly_matching_shoes = self.get_highly_matching_shoes_for_outfit(selected_color, bottom_color, shoes)
-                
-                combo_items = [
-                    {
-                        'id': selected_item.id,
-                        'description': selected_item.description,
-                        'category': selected_item.category,
-                        'image': selected_item.image.url
-                    },
-                    {
-                        'id': bottom.id,
-                        'description': bottom.description,
-                        'category': bottom.category,
-                        'image': bottom.image.url
+        for outfit in outfits:
+            for item in outfit.items:
+                if item.id not in items:
+                    items[item.id] = {
+                        'description': item.description,
+                        'category': item.category,
+                        'image': item.image.url,
+                        'thumbnails': thumbnail_srcsets(item.image.name, item.image.storage, item.thumbnails)
                     }
-                ]
-                
-                if highly_matching_shoes:
-                    shoe = highly_matching_shoes[0]
-                    combo_items.append({
-                        'id': shoe.id,
-                        'description': shoe.description,
-                        'category': shoe.category,
-                        'image': shoe.image.url
-                    })
-                
-                combo = {
-                    'type': 'selected_top_outfit',
-                    'items': combo_items,
-                    'description': f"{selected_item.description} with {bottom.description}" + (f" and {shoe.description}" if highly_matching_shoes else "")
-                }
-                combinations.append(combo)
-                
-        elif selected_item.category == 'kurti':
-            # Kurti - pair with pants (no skirts) and dupatta
-            highly_matching_pants = self.get_highly_matching_indian_bottoms(selected_color, indian_bottoms)
-            if not highly_matching_pants:
-                western_pants_only = [b for b in western_bottoms if 'skirt' not in b.description.lower()]
-                highly_matching_pants = self.get_highly_matching_bottoms(selected_color, western_pants_only)
-            
-            for pants in highly_matching_pants[:3]:
-                highly_matching_dupattas = self.get_highly_matching_dupattas(selected_color, dupattas)
-                
-                combo_items = [
-                    {
-                        'id': selected_item.id,
-                        'description': selected_item.description,
-                        'category': selected_item.category,
-                        'image': selected_item.image.url
-                    },
-                    {
-                        'id': pants.id,
-                        'description': pants.description,
-                        'category': pants.category,
-                        'image': pants.image.url
-                    }
-                ]
-                
-                if highly_matching_dupattas:
-                    dupatta = highly_matching_dupattas[0]
-                    combo_items.append({
-                        'id': dupatta.id,
-                        'description': dupatta.description,
-                        'category': dupatta.category,
-                        'image': dupatta.image.url
-                    })
-                
-                # Add Indian footwear
-                indian_shoes = [s for s in shoes if self.is_indian_footwear(s.description)]
-                highly_matching_indian_shoes = self.get_highly_matching_shoes(selected_color, indian_shoes)
-                
-                if highly_matching_indian_shoes:
-                    shoe = highly_matching_indian_shoes[0]
-                    combo_items.append({
-                        'id': shoe.id,
-                        'description': shoe.description,
-                        'category': shoe.category,
-                        'image': shoe.image.url
-                    })
-                
-                combo = {
-                    'type': 'selected_kurti_outfit',
-                    'items': combo_items,
-                    'description': f"{selected_item.description} with {pants.description}" + (f" and {dupatta.description}" if highly_matching_dupattas else "")
-                }
-                combinations.append(combo)
-                
-        elif selected_item.category == 'dress':
-            # Dress - pair with shoes
-            highly_matching_shoes = self.get_highly_matching_shoes(selected_color, shoes)
-            for shoe in highly_matching_shoes[:3]:
-                combo = {
-                    'type': 'selected_dress_outfit',
-                    'items': [
-                        {
-                            'id': selected_item.id,
-                            'description': selected_item.description,
-                            'category': selected_item.category,
-                            'image': selected_item.image.url
-                        },
-                        {
-                            'id': shoe.id,
-                            'description': shoe.description,
-                            'category': shoe.category,
-                            'image': shoe.image.url
-                        }
-                    ],
-                    'description': f"{selected_item.description} with {shoe.description}"
-                }
-                combinations.append(combo)
-                
-        elif selected_item.category == 'bottom' or selected_item.category == 'indian_bottom':
-            # Check if the selected bottom is a skirt
-            is_skirt = any(skirt_word in selected_item.description.lower() for skirt_word in ['skirt', 'ghagra', 'lehenga'])
-            
-            if is_skirt:
-                # Skirt - only pair with Western tops (not kurtis)
-                highly_matching_tops = self.get_highly_matching_bottoms(selected_color, western_tops)
-            else:
-                # Pants - can pair with both Western tops and kurtis
-                highly_matching_tops = self.get_highly_matching_bottoms(selected_color, western_tops + kurtis)
-            
-            for top in highly_matching_tops[:3]:
-                combo = {
-                    'type': 'selected_bottom_outfit',
-                    'items': [
-                        {
-                            'id': top.id,
-                            'description': top.description,
-                            'category': top.category,
-                            'image': top.image.url
-                        },
-                        {
-                            'id': selected_item.id,
-                            'description': selected_item.description,
-                            'category': selected_item.category,
-                            'image': selected_item.image.url
-                        }
-                    ],
-                    'description': f"{top.description} with {selected_item.description}"
-                }
-                combinations.append(combo)
-                
-        elif selected_item.category == 'shoes':
-            # Shoes - pair with dresses or top+bottom combinations
-            # Try with dresses first
-            for dress in western_dresses[:2]:
-                dress_color = self.extract_color_from_description(dress.description)
-                if self.are_colors_highly_compatible(dress_color, selected_color):
-                    combo = {
-                        'type': 'selected_shoes_outfit',
-                        'items': [
-                            {
-                                'id': dress.id,
-                                'description': dress.description,
-                                'category': dress.category,
-                                'image': dress.image.url
-                            },
-                            {
-                                'id': selected_item.id,
-                                'description': selected_item.description,
-                                'category': selected_item.category,
-                                'image': selected_item.image.url
-                            }
-                        ],
-                        'description': f"{dress.description} with {selected_item.description}"
-                    }
-                    combinations.append(combo)
-            
-            # Try with top+bottom combinations
-            for top in western_tops[:2]:
-                for bottom in western_bottoms[:2]:
-                    top_color = self.extract_color_from_description(top.description)
-                    bottom_color = self.extract_color_from_description(bottom.description)
-                    if (self.are_colors_highly_compatible(top_color, selected_color) or 
-                        self.are_colors_highly_compatible(bottom_color, selected_color)):
-                        combo = {
-                            'type': 'selected_shoes_outfit',
-                            'items': [
-                                {
-                                    'id': top.id,
-                                    'description': top.description,
-                                    'category': top.category,
-                                    'image': top.image.url
-                                },
-                                {
-                                    'id': bottom.id,
-                                    'description': bottom.description,
-                                    'category': bottom.category,
-                                    'image': bottom.image.url
-                                },
-                                {
-                                    'id': selected_item.id,
-                                    'description': selected_item.description,
-                                    'category': selected_item.category,
-                                    'image': selected_item.image.url
-                                }
-                            ],
-                            'description': f"{top.description} with {bottom.description} and {selected_item.description}"
-                        }
-                        combinations.append(combo)
-                        break
+            combinations.append({
+                'type': outfit.type,
+                'items': [item.id for item in outfit.items],
+                'score': round(outfit.score, 4)
+            })
         
-        return combinations
+        return {'items': items, 'outfits': combinations}
 
-    def generate_all_combinations(self, western_tops, western_bottoms, western_dresses, kurtis, sarees, indian_bottoms, dupattas, shoes, accessories):
-        """Original logic for generating all combinations"""
-        combinations = []
-        
-        # Strategy 1: Western Dress outfits with color-coordinated shoes
-        if western_dresses:
-            for dress in western_dresses[:3]:
-                dress_color = self.extract_color_from_description(dress.description)
-                matching_shoes = self.get_highly_matching_shoes(dress_color, shoes)
-                
-                if matching_shoes:
-                    for shoe in matching_shoes[:2]:
-                        combo = {
-                            'type': 'western_dress_outfit',
-                            'items': [
-                                {
-                                    'id': dress.id,
-                                    'description': dress.description,
-                                    'category': dress.category,
-                                    'image': dress.image.url
-                                },
-                                {
-                                    'id': shoe.id,
-                                    'description': shoe.description,
-                                    'category': shoe.category,
-                                    'image': shoe.image.url
-                                }
-                            ],
-                            'description': f"{dress.description} with {shoe.description}"
-                        }
-                        combinations.append(combo)
-        
-        # Strategy 2: Western Top + Bottom combinations with extensive color theory
-        if western_tops and western_bottoms:
-            for top in western_tops[:5]:
-                top_color = self.extract_color_from_description(top.description)
-                # Get highly matching bottoms only
-                highly_matching_bottoms = self.get_highly_matching_bottoms(top_color, western_bottoms)
-                
-                for bottom in highly_matching_bottoms[:2]:
-                    bottom_color = self.extract_color_from_description(bottom.description)
-                    # Get shoes that match both top and bottom
-                    highly_matching_shoes = self.get_highly_matching_shoes_for_outfit(top_color, bottom_color, shoes)
-                    
-                    if highly_matching_shoes:
-                        for shoe in highly_matching_shoes[:1]:
-                            combo = {
-                                'type': 'western_top_bottom_outfit',
-                                'items': [
-                                    {
-                                        'id': top.id,
-                                        'description': top.description,
-                                        'category': top.category,
-                                        'image': top.image.url
-                                    },
-                                    {
-                                        'id': bottom.id,
-                                        'description': bottom.description,
-                                        'category': bottom.category,
-                                        'image': bottom.image.url
-                                    },
-                                    {
-                                        'id': shoe.id,
-                                        'description': shoe.description,
-                                        'category': shoe.category,
-                                        'image': shoe.image.url
-                                    }
-                                ],
-                                'description': f"{top.description} with {bottom.description} and {shoe.description}"
-                            }
-                            combinations.append(combo)
-                    else:
-                        # Only create outfit if colors are highly compatible
-                        if self.are_colors_highly_compatible(top_color, bottom_color):
-                            combo = {
-                                'type': 'western_top_bottom_outfit',
-                                'items': [
-                                    {
-                                        'id': top.id,
-                                        'description': top.description,
-                                        'category': top.category,
-                                        'image': top.image.url
-                                    },
-                                    {
-                                        'id': bottom.id,
-                                        'description': bottom.description,
-                                        'category': bottom.category,
-                                        'image': bottom.image.url
-                                    }
-                                ],
-                                'description': f"{top.description} with {bottom.description}"
-                            }
-                            combinations.append(combo)
-        
-        # Strategy 3: Indian Kurti + Pants combinations (NO SKIRTS)
-        if kurtis:
-            for kurti in kurtis[:4]:
-                kurti_color = self.extract_color_from_description(kurti.description)
-                
-                # Try Indian pants first (excluding skirts)
-                highly_matching_pants = self.get_highly_matching_indian_bottoms(kurti_color, indian_bottoms)
-                
-                # If no Indian pants, try Western pants as fallback (also excluding skirts)
-                if not highly_matching_pants:
-                    western_pants_only = [b for b in western_bottoms if 'skirt' not in b.description.lower()]
-                    highly_matching_pants = self.get_highly_matching_bottoms(kurti_color, western_pants_only)
-                
-                # Only create outfits if we have matching PANTS (no skirts)
-                for pants in highly_matching_pants[:2]:
-                    # Add dupatta if available and color-coordinated
-                    highly_matching_dupattas = self.get_highly_matching_dupattas(kurti_color, dupattas)
-                    
-                    combo_items = [
-                        {
-                            'id': kurti.id,
-                            'description': kurti.description,
-                            'category': kurti.category,
-                            'image': kurti.image.url
-                        },
-                        {
-                            'id': pants.id,
-                            'description': pants.description,
-                            'category': pants.category,
-                            'image': pants.image.url
-                        }
-                    ]
-                    
-                    if highly_matching_dupattas:
-                        dupatta = highly_matching_dupattas[0]
-                        combo_items.append({
-                            'id': dupatta.id,
-                            'description': dupatta.description,
-                            'category': dupatta.category,
-                            'image': dupatta.image.url
-                        })
-                    
-                    # Add Indian footwear
-                    indian_shoes = [s for s in shoes if self.is_indian_footwear(s.description)]
-                    highly_matching_indian_shoes = self.get_highly_matching_shoes(kurti_color, indian_shoes)
-                    
-                    if highly_matching_indian_shoes:
-                        shoe = highly_matching_indian_shoes[0]
-                        combo_items.append({
-                            'id': shoe.id,
-                            'description': shoe.description,
-                            'category': shoe.category,
-                            'image': shoe.image.url
-                        })
-                    
-                    combo = {
-                        'type': 'indian_kurti_outfit',
-                        'items': combo_items,
-                        'description': f"{kurti.description} with {pants.description}" + (f" and {dupatta.description}" if highly_matching_dupattas else "")
-                    }
-                    combinations.append(combo)
-        
-        # Strategy 4: Saree outfits with color-coordinated blouses
-        if sarees:
-            for saree in sarees[:3]:
-                saree_color = self.extract_color_from_description(saree.description)
-                # Get highly matching blouses
-                highly_matching_blouses = self.get_highly_matching_blouses(saree_color, western_tops)
-                
-                combo_items = [
-                    {
-                        'id': saree.id,
-                        'description': saree.description,
-                        'category': saree.category,
-                        'image': saree.image.url
-                    }
-                ]
-                
-                if highly_matching_blouses:
-                    blouse = highly_matching_blouses[0]
-                    combo_items.append({
-                        'id': blouse.id,
-                        'description': blouse.description,
-                        'category': blouse.category,
-                        'image': blouse.image.url
-                    })
-                
-                # Add Indian footwear
-                indian_shoes = [s for s in shoes if self.is_indian_footwear(s.description)]
-                highly_matching_indian_shoes = self.get_highly_matching_shoes(saree_color, indian_shoes)
-                
-                if highly_matching_indian_shoes:
-                    shoe = highly_matching_indian_shoes[0]
-                    combo_items.append({
-                        'id': shoe.id,
-                        'description': shoe.description,
-                        'category': shoe.category,
-                        'image': shoe.image.url
-                    })
-                
-                combo = {
-                    'type': 'saree_outfit',
-                    'items': combo_items,
-                    'description': f"{saree.description}" + (f" with {blouse.description}" if highly_matching_blouses else "")
-                }
-                combinations.append(combo)
-        
-        return combinations
 
-    def extract_color_from_description(self, description):
-        """Extract color from description"""
-        description_lower = description.lower()
-        
-        # Common colors mapping
-        color_keywords = {
-            'red': ['red', 'crimson', 'scarlet', 'burgundy', 'maroon'],
-            'blue': ['blue', 'navy', 'denim', 'sky blue', 'royal blue', 'light blue'],
-            'green': ['green', 'emerald', 'olive', 'forest', 'mint'],
-            'yellow': ['yellow', 'gold', 'mustard', 'lemon'],
-            'pink': ['pink', 'rose', 'fuchsia', 'hot pink'],
-            'purple': ['purple', 'violet', 'lavender', 'lilac'],
-            'orange': ['orange', 'coral', 'peach'],
-            'brown': ['brown', 'tan', 'beige', 'khaki', 'taupe'],
-            'black': ['black', 'ebony', 'onyx'],
-            'white': ['white', 'ivory', 'cream', 'off-white'],
-            'gray': ['gray', 'grey', 'charcoal', 'silver'],
-            'multicolor': ['floral', 'print', 'pattern', 'striped', 'checkered', 'polka dot']
-        }
-        
-        for color, keywords in color_keywords.items():
-            if any(keyword in description_lower for keyword in keywords):
-                return color
-        
-        return 'unknown'
+def trim_item_fields(payload, fields=None):
+    """``payload`` with only ``fields`` of each item (all of them when ``fields`` is empty)"""
+    if not fields or set(fields) >= set(OUTFIT_RESPONSE_FIELDS):
+        return payload
+    return {
+        'items': {item_id: {field: item[field] for field in fields} for item_id, item in payload['items'].items()},
+        'outfits': payload['outfits'],
+    }
 
-    def color_name_to_rgb(self, color_name):
-        """Convert color name to RGB values"""
-        color_map = {
-            'red': [228, 59, 68],
-            'blue': [66, 133, 244],
-            'green': [52, 168, 83],
-            'yellow': [251, 188, 5],
-            'pink': [234, 128, 252],
-            'purple': [156, 39, 176],
-            'orange': [255, 152, 0],
-            'brown': [121, 85, 72],
-            'black': [0, 0, 0],
-            'white': [255, 255, 255],
-            'gray': [158, 158, 158],
-            'navy': [30, 68, 124],
-            'beige': [245, 245, 220],
-            'khaki': [195, 176, 145]
-        }
-        return color_map.get(color_name, [128, 128, 128])  # Default to gray
+@method_decorator(login_required, name='dispatch')
+class WardrobeListView(APIView):
+    """The user's wardrobe, a page at a time.
 
-    def get_colormind_palette(self, base_color):
-        """Get harmonious color palette from ColorMind API"""
-        base_rgb = self.color_name_to_rgb(base_color)
-        
-        # ColorMind API format
-        data = {
-            "model": "default",
-            "input": [base_rgb, "N", "N", "N", "N"]
-        }
-        
+    ``cursor`` continues from the ``next_cursor`` of the previous page and
+    ``limit`` sets the page size. With ``since`` (the ``as_of`` of an earlier
+    response) only items changed after that time are listed, along with the
+    ids of every current item so the client can drop deleted ones. Responses
+    carry an ETag, so an unchanged wardrobe answers 304. There is no
+    Last-Modified: deletes leave the latest ``updated_at`` where it was.
+    """
+    renderer_classes = [FastJSONRenderer]
+    
+    def get(self, request):
         try:
-            response = requests.post('http://colormind.io/api/', json=data, timeout=5)
-            if response.status_code == 200:
-                palette = response.json()['result']
-                print(f"🎨 ColorMind palette for {base_color}: {palette}")
-                return palette
-        except Exception as e:
-            print(f"⚠️ ColorMind API error: {e}")
-        
-        return None
-
-    def are_colors_highly_compatible(self, color1, color2):
-        """Check if colors are highly compatible using ColorMind API"""
-        if color1 == 'unknown' or color2 == 'unknown':
-            return False
-        
-        # Get ColorMind palette for the base color
-        palette = self.get_colormind_palette(color1)
-        if palette:
-            color2_rgb = self.color_name_to_rgb(color2)
-            # Check if color2 is in the harmonious palette (with some tolerance)
-            for palette_color in palette:
-                if self.colors_are_similar(color2_rgb, palette_color):
-                    return True
-        
-        # Fallback to basic compatibility for neutral colors
-        neutral_colors = ['black', 'white', 'gray', 'brown', 'beige', 'khaki', 'navy']
-        if color1 in neutral_colors or color2 in neutral_colors:
-            return True
-        
-        return color1 == color2
-
-    def colors_are_similar(self, rgb1, rgb2, tolerance=50):
-        """Check if two RGB colors are similar within tolerance"""
-        r1, g1, b1 = rgb1
-        r2, g2, b2 = rgb2
+            limit = min(int(request.query_params.get('limit', LIST_PAGE_SIZE)), LIST_MAX_PAGE_SIZE)
+            cursor = int(request.query_params.get('cursor', 0))
+        except ValueError:
+            return Response({"error": "cursor and limit must be integers"}, status=400)
+        if limit < 1:
+            return Response({"error": "limit must be positive"}, status=400)
+        
+        since = request.query_params.get('since')
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return Response({"error": "since must be an ISO 8601 timestamp"}, status=400)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since, dt_timezone.utc)
         
-        distance = ((r1 - r2) ** 2 + (g1 - g2) ** 2 + (b1 - b2) ** 2) ** 0.5
-        return distance < tolerance
-
-    def get_highly_matching_bottoms(self, top_color, bottoms):
-        """Return only bottoms that HIGHLY match with the top using ColorMind"""
-        highly_matching = []
-        moderately_matching = []
-        
-        for bottom in bottoms:
-            bottom_color = self.extract_color_from_description(bottom.description)
-            
-            # Check for high compatibility with ColorMind
-            if self.are_colors_highly_compatible(top_color, bottom_color):
-                highly_matching.append(bottom)
-            # Fallback to basic matching for neutral colors
-            elif self.colors_match(top_color, bottom_color):
-                moderately_matching.append(bottom)
-        
-        # Return highly matching first, then moderately matching
-        return highly_matching + moderately_matching[:2]
-
-    def get_highly_matching_indian_bottoms(self, kurti_color, bottoms):
-        """Return Indian pants (not skirts) that HIGHLY match with kurti"""
-        highly_matching = []
-        moderately_matching = []
-        
-        for bottom in bottoms:
-            bottom_description = bottom.description.lower()
-            
-            # EXCLUDE skirts - only include pants-like items
-            skirt_keywords = ['skirt', 'ghagra', 'lehenga', 'gown', 'dress']
-            if any(skirt_word in bottom_description for skirt_word in skirt_keywords):
-                continue  # Skip skirts completely
-                
-            bottom_color = self.extract_color_from_description(bottom.description)
-            
-            # For Indian wear, check for high compatibility
-            if self.are_colors_highly_compatible(kurti_color, bottom_color):
-                highly_matching.append(bottom)
-            # Fallback to basic matching
-            elif self.colors_match(kurti_color, bottom_color):
-                moderately_matching.append(bottom)
-        
-        return highly_matching + moderately_matching[:2]
-
-    def get_highly_matching_shoes(self, item_color, shoes):
-        """Return shoes that HIGHLY match with the item"""
-        highly_matching = []
-        neutral_matching = []
-        
-        for shoe in shoes:
-            shoe_color = self.extract_color_from_description(shoe.description)
-            
-            # High compatibility with ColorMind
-            if self.are_colors_highly_compatible(item_color, shoe_color):
-                highly_matching.append(shoe)
-            # Neutral shoes that always work
-            elif shoe_color in ['black', 'white', 'brown', 'nude']:
-                neutral_matching.append(shoe)
-        
-        return highly_matching + neutral_matching[:2]
-
-    def get_highly_matching_shoes_for_outfit(self, top_color, bottom_color, shoes):
-        """Return shoes that HIGHLY match with both top and bottom"""
-        highly_matching = []
-        neutral_matching = []
-        
-        for shoe in shoes:
-            shoe_color = self.extract_color_from_description(shoe.description)
-            
-            # Check if shoe color works well with both top and bottom
-            if (self.are_colors_highly_compatible(top_color, shoe_color) and 
-                self.are_colors_highly_compatible(bottom_color, shoe_color)):
-                highly_matching.append(shoe)
-            # Neutral shoes
-            elif shoe_color in ['black', 'white', 'brown', 'nude']:
-                neutral_matching.append(shoe)
-        
-        return highly_matching + neutral_matching[:2]
-
-    def get_highly_matching_dupattas(self, kurti_color, dupattas):
-        """Return dupattas that HIGHLY match with kurti"""
-        highly_matching = []
-        
-        for dupatta in dupattas:
-            dupatta_color = self.extract_color_from_description(dupatta.description)
-            
-            # Dupattas should either match or beautifully contrast
-            if (self.are_colors_highly_compatible(kurti_color, dupatta_color) or
-                self.are_colors_beautiful_contrast(kurti_color, dupatta_color)):
-                highly_matching.append(dupatta)
-        
-        return highly_matching[:2]
-
-    def get_highly_matching_blouses(self, saree_color, tops):
-        """Return blouses that HIGHLY match with saree"""
-        highly_matching = []
-        
-        for top in tops:
-            top_color = self.extract_color_from_description(top.description)
-            
-            # Blouse should either match or complement the saree
-            if (self.are_colors_highly_compatible(saree_color, top_color) or
-                self.are_colors_beautiful_contrast(saree_color, top_color)):
-                highly_matching.append(top)
-        
-        return highly_matching[:2]
-
-    def are_colors_beautiful_contrast(self, color1, color2):
-        """Check if colors create a beautiful contrast (for Indian wear especially)"""
-        # Use ColorMind for contrast checking too
-        if color1 == 'unknown' or color2 == 'unknown':
-            return True
+        items = WardrobeItem.objects.filter(user=request.user)
         
-        # For Indian wear, allow more flexible contrasts
-        indian_contrasts = {
-            'red': ['green', 'gold', 'yellow'],
-            'green': ['red', 'pink', 'orange', 'purple'],
-            'blue': ['orange', 'pink', 'gold'],
-            'pink': ['green', 'blue', 'purple'],
-            'purple': ['yellow', 'pink', 'gold'],
-            'yellow': ['purple', 'red', 'blue'],
-            'orange': ['blue', 'green', 'purple']
+        # Count catches deletes, the latest update catches uploads and edits
+        state = items.aggregate(last_modified=Max('updated_at'), total=Count('id'))
+        last_modified = state['last_modified']
+        as_of = last_modified.isoformat() if last_modified else None
+        etag = quote_etag(f"{state['total']}-{as_of}-{request.GET.urlencode()}")
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return self.with_validators(not_modified, etag)
+        
+        changed = items.filter(updated_at__gt=since) if since else items
+        rows = list(
+            changed.filter(id__gt=cursor)
+            .order_by('id')
+            .values('id', 'status', 'description', 'category', 'image', 'thumbnails', 'created_at')[:limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        storage = WardrobeItem._meta.get_field('image').storage
+        data = {
+            "items": [
+                {
+                    'id': row['id'],
+                    'status': row['status'],
+                    'description': row['description'],
+                    'category': row['category'],
+                    'image_url': storage.url(row['image']),
+                    'thumbnails': thumbnail_srcsets(row['image'], storage, row['thumbnails']),
+                    'created_at': row['created_at'].date().isoformat()
+                }
+                for row in rows
+            ],
+            "next_cursor": rows[-1]['id'] if has_more else None,
+            "as_of": as_of,
         }
-        
-        if color1 in indian_contrasts and color2 in indian_contrasts[color1]:
-            return True
-        if color2 in indian_contrasts and color1 in indian_contrasts[color2]:
-            return True
-        
-        return False
-
-    def colors_match(self, color1, color2):
-        """Basic color matching (fallback when ColorMind fails)"""
-        if color1 == 'unknown' or color2 == 'unknown':
-            return True
-        
-        neutral_colors = ['black', 'white', 'gray', 'brown', 'beige', 'khaki', 'navy']
-        if color1 in neutral_colors or color2 in neutral_colors:
-            return True
-        
-        return color1 == color2
-
-    def is_indian_footwear(self, description):
-        """Check if footwear is Indian style"""
-        indian_footwear_keywords = ['juttis', 'mojaris', 'kolhapuris', 'ethnic']
-        return any(keyword in description.lower() for keyword in indian_footwear_keywords)
-
-@method_decorator(login_required, name='dispatch')
-class WardrobeListView(APIView):
-    def get(self, request):
-        items = WardrobeItem.objects.filter(user=request.user)
-        item_data = []
-        for item in items:
-            item_data.append({
-                'id': item.id,
-                'description': item.description,
-                'category': item.category,
-                'image_url': item.image.url,
-                'created_at': item.created_at.strftime('%Y-%m-%d')
-            })
-        return Response({"items": item_data})
+        if since:
+            data["ids"] = list(items.values_list('id', flat=True))
+        return self.with_validators(Response(data), etag)
+    
+    def with_validators(self, response, etag):
+        response['ETag'] = etag
+        # Let the browser keep the list, but revalidate it on every request
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 @method_decorator(login_required, name='dispatch')
 class DeleteWardrobeItemView(APIView):
@@ -1094,7 +353,13 @@ class DeleteWardrobeItemView(APIView):
         item_id = request.data.get('item_id')
         try:
             item = WardrobeItem.objects.get(id=item_id, user=request.user)
+            item_id = item.id
             item.delete()
+            item.id = item_id
+            record_wardrobe_change(request.user.id, 'delete', [item])
+            if item.image:
+                delete_thumbnails(item.image.name, item.image.storage, item.thumbnails)
+                item.image.delete(save=False)
             return Response({"status": "success", "message": "Item deleted successfully"})
         except WardrobeItem.DoesNotExist:
             return Response({"error": "Item not found"}, status=404)